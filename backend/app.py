@@ -1,15 +1,32 @@
+import gzip
+import hashlib
 import os
-import io
+import time
 from datetime import timedelta
 
-from flask import Flask, request, session, jsonify, send_file
+from flask import Flask, request, session, jsonify, stream_with_context
 from flask_cors import CORS
-from flask_session import Session
 from dotenv import load_dotenv
 
 load_dotenv()  # loads backend/.env
 
-import sheets  # uses env inside
+import storage  # selects sheets/sqlite from env
+from csvstream import CSV_SOURCES, gzip_chunks
+from events import Broadcaster
+import instrument
+import sessions
+from prefetch import LRUCache
+from ratelimit import RateLimited
+
+store = storage.get_storage()
+# Each open /api/events stream holds a gunicorn thread; cap them below
+# --threads so regular API requests always have threads left.
+broadcaster = Broadcaster(
+    store,
+    poll=float(os.environ.get("EVENTS_POLL_SECONDS", "10")),
+    max_streams=int(os.environ.get("EVENTS_MAX_STREAMS", "8")),
+)
+store.add_change_listener(broadcaster.notify)
 
 app = Flask(__name__)
 
@@ -24,19 +41,20 @@ COOKIE_SECURE = os.environ.get("COOKIE_SECURE", "false").lower() == "true"  # Tr
 
 app.config.update(
     SECRET_KEY=os.environ.get("FLASK_SECRET", "change_me"),
-    SESSION_TYPE="filesystem",
     PERMANENT_SESSION_LIFETIME=timedelta(days=14),
     SESSION_COOKIE_SAMESITE=COOKIE_SAMESITE,
     SESSION_COOKIE_SECURE=COOKIE_SECURE,
 )
 
-Session(app)
+# SESSION_BACKEND: cookie (default), sqlite or filesystem; see sessions.py
+sessions.init_app(app)
 
 # CORS for API
 CORS(
     app,
     resources={r"/api/*": {"origins": ALLOWED_ORIGINS}},
     supports_credentials=True,
+    expose_headers=["ETag"],  # lets the frontend send If-None-Match itself
 )
 
 @app.after_request
@@ -58,6 +76,29 @@ def add_cors_headers(resp):
             resp.headers["Vary"] = "Origin"
     return resp
 
+if instrument.ENABLED:
+    @app.before_request
+    def instrument_begin():
+        instrument.begin()
+
+    @app.after_request
+    def instrument_end(resp):
+        # Streamed bodies (csv, events) are generated later and not included.
+        done = instrument.end(request.endpoint or "unknown")
+        if done:
+            timing = instrument.server_timing(*done)
+            prev = resp.headers.get("Server-Timing")
+            resp.headers["Server-Timing"] = f"{prev}, {timing}" if prev else timing
+        return resp
+
+@app.errorhandler(RateLimited)
+def rate_limited(e):
+    # Sheets quota exhausted even after retries: ask the client to come back.
+    resp = jsonify(ok=False, error="Google Sheets is busy, please retry shortly")
+    resp.status_code = 503
+    resp.headers["Retry-After"] = str(max(1, int(e.retry_after)))
+    return resp
+
 # ---------- landing ----------
 @app.get("/")
 def landing():
@@ -65,7 +106,7 @@ def landing():
         ok=True,
         service="expert-survey-backend",
         message="Backend is live. Use the /api/* endpoints.",
-        endpoints=["/api/health", "/api/get_user", "/api/user_progress", "/api/next_patient", "/api/patients", "/api/patient", "/api/claim", "/api/release", "/api/submit_prediction", "/api/update_prediction", "/api/csv", "/api/metrics"]
+        endpoints=["/api/health", "/api/warmup", "/api/get_user", "/api/user_progress", "/api/next_patient", "/api/workspace", "/api/patients", "/api/patient", "/api/claim", "/api/release", "/api/submit_prediction", "/api/submit_batch", "/api/update_prediction", "/api/csv", "/api/metrics", "/api/events"]
     )
 
 # ---------- basic ----------
@@ -73,6 +114,24 @@ def landing():
 def health():
     return jsonify(ok=True)
 
+@app.get("/api/warmup")
+def warmup():
+    """For the host's warmup/readiness hook: returns once the store can answer without waiting."""
+    return jsonify(ok=True, timings_ms=store.warmup())
+
+@app.get("/api/debug/stats")
+def debug_stats():
+    if not instrument.ENABLED:
+        return jsonify(ok=False, error="set INSTRUMENTATION=true"), 404
+    return jsonify(ok=True, **instrument.stats())
+
+@app.get("/api/debug/metrics")
+def debug_metrics():
+    """Prometheus text exposition of the same histograms."""
+    if not instrument.ENABLED:
+        return jsonify(ok=False, error="set INSTRUMENTATION=true"), 404
+    return app.response_class(instrument.prometheus_text(), mimetype="text/plain; version=0.0.4")
+
 @app.post("/api/set_user")
 def set_user():
     data = request.get_json(silent=True) or {}
@@ -94,11 +153,32 @@ def user_progress():
     user = session.get("user")
     if not user:
         return jsonify(ok=False, error="no user"), 401
-    email = user.get("email")
-    total = sheets.count_patients()
-    completed = len(sheets.list_user_submission_rows(email))
-    next_row = sheets.next_unsubmitted_row(email)
-    return jsonify(ok=True, completed=completed, total=total, next_row=next_row)
+    return jsonify(ok=True, **store.user_progress(user.get("email")))
+
+@app.get("/api/events")
+def events_stream():
+    """
+    SSE stream of `progress` (this reviewer) and `metrics` (study-wide)
+    events, sent on connect and whenever either changes. Replaces polling
+    /api/user_progress and /api/metrics.
+    """
+    user = session.get("user")
+    if not user:
+        return jsonify(ok=False, error="no user"), 401
+    if not broadcaster.acquire():
+        # all stream slots busy: the client keeps polling and tries again later
+        resp = app.response_class("retry: 30000\n\n", status=503, mimetype="text/event-stream")
+        resp.headers["Retry-After"] = "30"
+        resp.headers["Cache-Control"] = "no-cache"
+        return resp
+    resp = app.response_class(
+        stream_with_context(broadcaster.stream(user.get("email"))),
+        mimetype="text/event-stream",
+    )
+    resp.call_on_close(broadcaster.release)
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
 
 @app.get("/api/next_patient")
 def next_patient_route():
@@ -110,18 +190,53 @@ def next_patient_route():
         after = request.args.get("after", default=None, type=int)
     except Exception:
         after = None
-    nxt = sheets.next_unsubmitted_row(email, after=after)
+    nxt = store.next_unsubmitted_row(email, after=after)
     if nxt is None:
         return jsonify(ok=True, complete=True)
-    rec = sheets.get_patient(nxt)
-    my = sheets.get_submission(email, nxt)
+    rec = store.get_patient(nxt)
+    my = store.get_submission(email, nxt)
+    store.prefetch_after(email, nxt)
     return jsonify(ok=True, row=nxt, record=rec, my_submission=my)
 
+@app.get("/api/workspace")
+def workspace():
+    """
+    One round trip for the reviewer screen: next patient after `after`, its
+    record, my submission, my progress and study metrics, all from the same
+    data version. Server-Timing reports where the time went.
+    """
+    user = session.get("user")
+    if not user:
+        return jsonify(ok=False, error="no user"), 401
+    after = request.args.get("after", default=None, type=int)
+    t0 = time.perf_counter()
+    timings = {}
+    data = store.workspace(user.get("email"), after=after, timings=timings)
+    data["metrics"] = storage.public_metrics(data["metrics"], user.get("email"))
+    store.prefetch_after(user.get("email"), data["row"])
+    timings["total"] = (time.perf_counter() - t0) * 1000
+    resp = jsonify(ok=True, **data)
+    resp.headers["Server-Timing"] = ", ".join(
+        f"{name};dur={ms:.1f}" for name, ms in timings.items()
+    )
+    return resp
+
 @app.get("/api/metrics")
 def metrics():
     try:
-        data = sheets.progress_metrics()
-        return jsonify(ok=True, **data)
+        # Polled by the UI: answer unchanged polls with 304 before building anything.
+        # Per-reviewer detail is for signed-in reviewers only (public_metrics).
+        email = (session.get("user") or {}).get("email")
+        etag = "metrics-" + store.data_version()
+        if email:
+            etag += "-" + _digest(email)
+        if request.if_none_match.contains(etag):
+            resp = app.response_class(status=304)
+        else:
+            resp = jsonify(ok=True, **storage.public_metrics(store.progress_metrics(), email))
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = "private, no-cache" if email else "no-cache"
+        return resp
     except Exception as e:
         # Log to Render logs and return safe defaults so the UI doesn't break
         try:
@@ -132,13 +247,80 @@ def metrics():
             pass
         return jsonify(ok=False, users_started=0, users_completed=0, total_patients=0), 200
 
+# ---------- cached JSON bodies ----------
+# /api/patient and /api/patients answer If-None-Match with 304, and keep
+# their serialized (and, past RESPONSE_GZIP_MIN_BYTES, gzipped) bodies per
+# ETag, so repeat requests for unchanged data skip building the payload.
+# Large bodies are kept gzipped only.
+RESPONSE_CACHE_ROWS = int(os.environ.get("RESPONSE_CACHE_ROWS", "2048"))
+RESPONSE_CACHE_LISTS = int(os.environ.get("RESPONSE_CACHE_LISTS", "32"))
+RESPONSE_GZIP_MIN_BYTES = int(os.environ.get("RESPONSE_GZIP_MIN_BYTES", "1024"))
+_GZIP_ONLY_BYTES = 64 * 1024
+
+_ROW_BODIES = LRUCache(RESPONSE_CACHE_ROWS)
+_LIST_BODIES = LRUCache(RESPONSE_CACHE_LISTS)
+
+
+def _digest(*parts) -> str:
+    return hashlib.blake2b(repr(parts).encode(), digest_size=8).hexdigest()
+
+
+def _render(payload) -> tuple:
+    """(raw, gzipped) JSON bytes; either may be None, never both."""
+    # compact, like jsonify outside debug mode
+    raw = (app.json.dumps(payload, separators=(",", ":")) + "\n").encode()
+    if len(raw) < RESPONSE_GZIP_MIN_BYTES:
+        return raw, None
+    gz = gzip.compress(raw, 6)
+    return (None if len(raw) > _GZIP_ONLY_BYTES else raw), gz
+
+
+def _cached_json(etag, build, cache):
+    """
+    Response for `etag`: 304, a cached body, or build() rendered and cached
+    (build() returning None means 404).
+    """
+    if request.if_none_match.contains(etag):
+        resp = app.response_class(status=304)
+    else:
+        body = cache.get(etag)
+        if body is None:
+            payload = build()
+            if payload is None:
+                return jsonify(ok=False, error="not found"), 404
+            body = _render(payload)
+            cache.put(etag, body)
+        raw, gz = body
+        if gz is not None and "gzip" in request.accept_encodings:
+            resp = app.response_class(gz, mimetype="application/json")
+            resp.headers["Content-Encoding"] = "gzip"
+        else:
+            resp = app.response_class(raw if raw is not None else gzip.decompress(gz),
+                                      mimetype="application/json")
+    resp.set_etag(etag)
+    resp.vary.add("Accept-Encoding")
+    # private: bodies can depend on the session; no-cache: always revalidate
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
 # ---------- patients ----------
 @app.get("/api/patients")
 def list_patients_route():
     user = session.get("user") or {}
     email = user.get("email")
-    pts = sheets.list_patients(current_user_email=email)
-    return jsonify(patients=pts)
+    status = request.args.get("status") or None
+    if status not in (None, "submitted", "pending", "mine"):
+        return jsonify(ok=False, error="status must be submitted, pending or mine"), 400
+    offset = max(0, request.args.get("offset", default=0, type=int))
+    limit = request.args.get("limit", default=None, type=int)
+    if limit is not None and limit < 1:
+        return jsonify(ok=False, error="limit must be at least 1"), 400
+    fields = [f.strip() for f in (request.args.get("fields") or "").split(",") if f.strip()]
+    # Without paging params this is the full list, as before.
+    etag = "patients-" + store.data_version() + "-" + _digest(email, status, offset, limit, fields)
+    return _cached_json(etag, lambda: store.page_patients(
+        current_user_email=email, offset=offset, limit=limit, fields=fields or None, status=status
+    ), _LIST_BODIES)
 
 @app.get("/api/patient")
 def get_patient_route():
@@ -146,17 +328,27 @@ def get_patient_route():
         row = int(request.args.get("row", "0"))
     except Exception:
         return jsonify(ok=False, error="bad row"), 400
-    rec = sheets.get_patient(row)
-    if not rec:
-        return jsonify(ok=False, error="not found"), 404
+    # The validator follows this row only, so edits to other rows keep the
+    # client's copy (and ours) valid.
+    validator, get_rec = store.patient_entry(row)
+    etag = f"patient-{row}-{validator}"
     # Backward compatible: by default return the raw patient record (old behavior).
     include_my = request.args.get("include_my")
     if include_my in {"1", "true", "True"}:
         user = session.get("user") or {}
         email = user.get("email")
-        my = sheets.get_submission(email, row) if email else None
-        return jsonify({"row": row, "record": rec, "my_submission": my})
-    return jsonify(rec)
+        etag += "-" + _digest(email, store.data_version())
+
+        def build():
+            rec = get_rec()
+            if not rec:
+                return None
+            my = store.get_submission(email, row) if email else None
+            return {"row": row, "record": rec, "my_submission": my}
+    else:
+        def build():
+            return get_rec() or None
+    return _cached_json(etag, build, _ROW_BODIES)
 
 # ---------- claim / release ----------
 @app.post("/api/claim")
@@ -194,7 +386,7 @@ def update_prediction_route():
         "confidence": data.get("confidence"),
         "snot22": data.get("snot22"),
     }
-    res = sheets.update_prediction(row, payload)
+    res = store.update_prediction(row, payload)
     if not res.get("ok"):
         return jsonify(res), 400
     return {"ok": True}
@@ -218,20 +410,76 @@ def submit_prediction_route():
         "snot22": data.get("snot22"),
     }
     try:
-        sheets.upsert_submission(user["email"], user["name"], row, payload)
+        store.upsert_submission(user["email"], user["name"], row, payload)
+    except RateLimited:
+        raise
     except Exception as e:
         return jsonify(ok=False, error=str(e)), 400
     return jsonify(ok=True)
 
+# Largest /api/submit_batch body accepted (items per request).
+SUBMIT_BATCH_MAX = int(os.environ.get("SUBMIT_BATCH_MAX", "1000"))
+
+@app.post("/api/submit_batch")
+def submit_batch_route():
+    """Save many predictions at once, e.g. a session recorded offline."""
+    user = session.get("user")
+    if not user:
+        return jsonify(ok=False, error="no user"), 401
+
+    data = request.get_json(silent=True) or {}
+    raw = data.get("items")
+    if not isinstance(raw, list):
+        return jsonify(ok=False, error="items must be a list"), 400
+    if len(raw) > SUBMIT_BATCH_MAX:
+        return jsonify(ok=False, error=f"at most {SUBMIT_BATCH_MAX} items per batch"), 400
+    items = []
+    for i, it in enumerate(raw):
+        try:
+            row = int(it.get("row", 0))
+        except Exception:
+            row = 0
+        if row < 2:
+            return jsonify(ok=False, error=f"bad row in item {i}"), 400
+        items.append({
+            "row": row,
+            "outcome": it.get("outcome"),
+            "confidence": it.get("confidence"),
+            "snot22": it.get("snot22"),
+        })
+    try:
+        written = store.upsert_submissions_bulk(user["email"], user["name"], items)
+    except RateLimited:
+        raise
+    except Exception as e:
+        return jsonify(ok=False, error=str(e)), 400
+    return jsonify(ok=True, written=written)
+
 @app.get("/api/csv")
 def csv_download():
-    csv_str = sheets.get_csv()
-    return send_file(
-        io.BytesIO(csv_str.encode("utf-8")),
-        mimetype="text/csv",
-        as_attachment=True,
-        download_name="expert_predictions.csv",
-    )
+    source = request.args.get("source", "patients")
+    if source not in CSV_SOURCES:
+        return jsonify(ok=False, error=f"source must be one of {', '.join(CSV_SOURCES)}"), 400
+
+    etag = f"csv-{source}-" + store.data_version()
+    if request.if_none_match.contains(etag):
+        resp = app.response_class(status=304)
+        resp.set_etag(etag)
+        return resp
+
+    chunks = store.iter_csv(source)
+    gz = "gzip" in request.accept_encodings
+    body = gzip_chunks(chunks) if gz else (c.encode("utf-8") for c in chunks)
+    filename = "expert_predictions.csv" if source == "patients" else f"expert_{source}.csv"
+    resp = app.response_class(stream_with_context(body), mimetype="text/csv")
+    resp.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    if gz:
+        resp.headers["Content-Encoding"] = "gzip"
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.set_etag(etag)
+    resp.last_modified = store.last_modified()
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
 
 if __name__ == "__main__":
     # Keep use_reloader False to avoid double-registering routes in dev
@@ -0,0 +1,477 @@
+"""
+Benchmark the API against fake_sheets (no Google, no network).
+
+    python bench.py
+    python bench.py --sizes 100,5000 --latency 0.05 --reviewers 8 --requests 400
+
+For each sheet size it seeds a fake spreadsheet, then drives each endpoint
+from --reviewers concurrent clients (Flask test clients, one thread each)
+and prints p50/p95/p99 latency, throughput and Sheets API calls per request.
+Other sheets.py settings (SHEETS_CACHE_TTL, SHEETS_WRITE_BEHIND, ...) are
+taken from the environment as usual.
+
+    python bench.py --sessions --requests 5000
+
+compares the per-request cost of each session backend (sessions.py)
+against a request that opens no session at all.
+
+    python bench.py --startup --sizes 1000,50000 --latency 0.2
+
+starts fresh processes and times importing app.py, its first
+/api/patients page and its first /api/patient record, cold (nothing on
+disk) and warm (restored from the SHEETS_SNAPSHOT_PATH file the cold run
+left behind).
+
+    python bench.py --stress --sizes 1000 --latency 0.05 --jitter 0.05
+
+has every reviewer save the same few --hot-rows from two clients at once
+(a double submit) while caches are dropped at random, then checks the
+Submissions tab holds exactly one row per (reviewer, patient row) and that
+the cached index agrees. It runs once with the usual striped upsert locks
+and once with a single lock, to show what per-key locking buys.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ENDPOINTS = ("next_patient", "submit_prediction", "patients", "csv", "metrics")
+
+
+def _setup_env(args):
+    os.environ.setdefault("SHEET_ID", "fake-sheet")
+    os.environ["STORAGE_BACKEND"] = "sheets"
+    os.environ.setdefault("SHEETS_WATCH_INTERVAL", "0")
+    os.environ.setdefault("SHEETS_READS_PER_MINUTE", "0")
+    os.environ.setdefault("SHEETS_WRITES_PER_MINUTE", "0")
+    os.environ.setdefault("FLASK_SECRET", "bench")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    # session files, journals etc. go to a scratch directory
+    os.chdir(tempfile.mkdtemp(prefix="expert-survey-bench-"))
+
+
+def _fresh_sheet(args, size):
+    import sheets
+
+    gc = _fresh_sheet_client(args, size)
+    sheets.set_client(gc)
+    sheets.ensure_schema()
+    return gc
+
+
+def _login(client, i):
+    client.post("/api/set_user", json={"name": f"Reviewer {i}", "email": f"reviewer{i}@example.org"})
+
+
+def _request(client, endpoint, size, rnd):
+    if endpoint == "next_patient":
+        return client.get("/api/next_patient")
+    if endpoint == "submit_prediction":
+        return client.post("/api/submit_prediction", json={
+            "row": rnd.randint(2, size + 1), "outcome": rnd.choice(("0", "1")),
+            "confidence": "medium", "snot22": rnd.randint(0, 110),
+        })
+    if endpoint == "patients":
+        return client.get("/api/patients")
+    if endpoint == "csv":
+        return client.get("/api/csv")
+    if endpoint == "metrics":
+        return client.get("/api/metrics")
+    raise ValueError(endpoint)
+
+
+def percentile(sorted_vals, p):
+    if not sorted_vals:
+        return 0.0
+    # nearest-rank
+    k = max(0, math.ceil(p / 100 * len(sorted_vals)) - 1)
+    return sorted_vals[k]
+
+
+def run_endpoint(app, gc, endpoint, size, args):
+    clients = []
+    for i in range(args.reviewers):
+        c = app.test_client()
+        _login(c, i)
+        clients.append(c)
+    # one untimed request so the first download isn't charged to a percentile
+    _request(clients[0], endpoint, size, random.Random(0)).get_data()
+
+    per_client = max(1, args.requests // args.reviewers)
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    start = threading.Barrier(args.reviewers + 1)
+
+    def worker(i):
+        rnd = random.Random(i)
+        mine = []
+        start.wait()
+        for _ in range(per_client):
+            t0 = time.perf_counter()
+            resp = _request(clients[i], endpoint, size, rnd)
+            resp.get_data()  # drain streamed bodies
+            mine.append(time.perf_counter() - t0)
+            if resp.status_code >= 400:
+                with lock:
+                    errors.append(resp.status_code)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.reviewers)]
+    for t in threads:
+        t.start()
+    calls0 = gc.total_calls()
+    start.wait()
+    t0 = time.perf_counter()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    calls = gc.total_calls() - calls0
+
+    latencies.sort()
+    n = len(latencies)
+    return {
+        "size": size,
+        "endpoint": endpoint,
+        "requests": n,
+        "errors": len(errors),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "rps": n / wall if wall else 0.0,
+        "sheets_calls_per_req": calls / n if n else 0.0,
+    }
+
+
+def bench_sessions(args):
+    from flask import Flask, session
+    import sessions
+
+    def make_app(backend):
+        app = Flask(f"bench-{backend}")
+        if backend != "none":
+            app.config.update(SECRET_KEY="bench", PERMANENT_SESSION_LIFETIME=14 * 86400)
+            sessions.init_app(app, backend)
+
+        @app.post("/login")
+        def login():
+            session["user"] = {"name": "Reviewer 0", "email": "reviewer0@example.org"}
+            session.permanent = True
+            return "ok"
+
+        @app.get("/whoami")
+        def whoami():
+            if backend == "none":
+                return "nobody"
+            return (session.get("user") or {}).get("email", "")
+
+        return app
+
+    print(f"{'backend':<12} {'n':>6} {'mean us':>9} {'p50 us':>9} {'p99 us':>9} {'overhead us':>12}")
+    base = None
+    for backend in ("none",) + sessions.BACKENDS:
+        client = make_app(backend).test_client()
+        if backend != "none":
+            client.post("/login")
+        for _ in range(50):  # warm up
+            client.get("/whoami")
+        lat = []
+        for _ in range(args.requests):
+            t0 = time.perf_counter()
+            client.get("/whoami").get_data()
+            lat.append(time.perf_counter() - t0)
+        lat.sort()
+        mean = sum(lat) / len(lat) * 1e6
+        if base is None:
+            base = mean
+        print(f"{backend:<12} {len(lat):>6} {mean:>9.1f} {percentile(lat, 50) * 1e6:>9.1f} "
+              f"{percentile(lat, 99) * 1e6:>9.1f} {mean - base:>12.1f}", flush=True)
+
+
+def _startup_child(args):
+    """Runs in a fresh process: import app, serve one page, report timings as JSON."""
+    t0 = time.perf_counter()
+    import sheets
+
+    t_sheets = time.perf_counter() - t0
+    # seeding the fake sheet is setup, not startup: keep it off the clock
+    size = int(args.sizes)
+    gc = _fresh_sheet_client(args, size)
+    sheets.set_client(gc)
+    t1 = time.perf_counter()
+    from app import app
+
+    t_app = time.perf_counter() - t1
+    calls0 = gc.total_calls()
+    t2 = time.perf_counter()
+    resp = app.test_client().get("/api/patients?limit=50")
+    resp.get_data()
+    t_first = time.perf_counter() - t2
+    # a single record goes through the header map, the list page doesn't
+    t3 = time.perf_counter()
+    rec = app.test_client().get(f"/api/patient?row={min(size, 3) + 1}")
+    rec.get_data()
+    t_record = time.perf_counter() - t3
+    calls = gc.total_calls() - calls0
+    # wait until fresh copies are in, then leave them on disk for a warm run
+    sheets.warmup()
+    t_fresh = time.perf_counter() - t2
+    sheets.save_snapshot()
+    print(json.dumps({
+        "status": max(resp.status_code, rec.status_code),
+        "import_ms": (t_sheets + t_app) * 1000,
+        "first_ms": t_first * 1000,
+        "record_ms": t_record * 1000,
+        "fresh_ms": t_fresh * 1000,
+        "calls_before_first": calls,
+        "google_stack_loaded": "oauth2client" in sys.modules,
+    }))
+
+
+def _fresh_sheet_client(args, size):
+    import fake_sheets
+    import sheets
+
+    gc = fake_sheets.FakeClient(latency=args.latency, jitter=args.jitter,
+                                fail_rate=args.fail_rate, seed=size)
+    fake_sheets.seed(gc, patients=size, submissions=int(size * args.reviewers * args.done),
+                     reviewers=args.reviewers, sheet_id=os.environ["SHEET_ID"],
+                     tab=sheets.SHEET_TAB, sub_tab=sheets.SUBMISSIONS_TAB)
+    return gc
+
+
+def _google_stack_ms():
+    code = ("import time; t = time.perf_counter(); import gspread; "
+            "import oauth2client.service_account; print((time.perf_counter() - t) * 1000)")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    return float(out.stdout) if out.returncode == 0 else float("nan")
+
+
+def bench_startup(args, sizes):
+    snap = os.path.abspath("sheets_snapshot.bin")
+    env = dict(os.environ, SHEETS_SNAPSHOT_PATH=snap)
+    print(f"importing gspread + oauth2client (no longer on the import path): "
+          f"{_google_stack_ms():.0f} ms")
+    print(f"{'rows':>7} {'start':<6} {'n':>3} {'import ms':>10} {'first ms':>9} "
+          f"{'record ms':>9} {'fresh ms':>9} {'calls':>6}")
+    for size in sizes:
+        results = {"cold": [], "warm": []}
+        for _ in range(args.runs):
+            if os.path.exists(snap):
+                os.remove(snap)
+            for mode in ("cold", "warm"):
+                cmd = [sys.executable, os.path.abspath(__file__), "--startup-child",
+                       "--sizes", str(size), "--latency", str(args.latency),
+                       "--jitter", str(args.jitter), "--reviewers", str(args.reviewers),
+                       "--done", str(args.done)]
+                out = subprocess.run(cmd, env=env, capture_output=True, text=True)
+                if out.returncode != 0:
+                    sys.exit(f"startup child failed:\n{out.stderr}")
+                results[mode].append(json.loads(out.stdout.strip().splitlines()[-1]))
+        for mode, runs in results.items():
+            med = {k: statistics.median(r[k] for r in runs)
+                   for k in ("import_ms", "first_ms", "record_ms", "fresh_ms",
+                             "calls_before_first")}
+            if args.json:
+                print(json.dumps({"size": size, "start": mode, "runs": len(runs), **med}), flush=True)
+            else:
+                print(f"{size:>7} {mode:<6} {len(runs):>3} {med['import_ms']:>10.1f} "
+                      f"{med['first_ms']:>9.1f} {med['record_ms']:>9.1f} {med['fresh_ms']:>9.1f} "
+                      f"{med['calls_before_first']:>6.0f}", flush=True)
+
+
+def _submission_keys(gc):
+    """{(email, patient row): [sheet rows]} straight from the fake Submissions tab."""
+    import sheets
+    from subindex import norm_email, parse_row
+
+    rows = gc._books[os.environ["SHEET_ID"]]._tabs[sheets.SUBMISSIONS_TAB]._rows
+    col = {name: i for i, name in enumerate(rows[0])}
+    keys = {}
+    for sheet_row, r in enumerate(rows[1:], start=2):
+        key = (norm_email(r[col["user_email"]]), parse_row(r[col["patient_row"]]))
+        keys.setdefault(key, []).append(sheet_row)
+    return keys
+
+
+def run_stress(app, gc, size, args):
+    import sheets
+
+    hot = list(range(2, min(size, args.hot_rows) + 2))
+    clients = []
+    for i in range(args.reviewers):
+        for _ in range(2):  # same reviewer in two tabs: double submits
+            c = app.test_client()
+            _login(c, i)
+            clients.append(c)
+    before = sum(len(v) for v in _submission_keys(gc).values())
+    per_client = max(1, args.requests // len(clients))
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    start = threading.Barrier(len(clients) + 1)
+    done = threading.Event()
+
+    def worker(i):
+        rnd = random.Random(i)
+        mine = []
+        start.wait()
+        for _ in range(per_client):
+            t0 = time.perf_counter()
+            resp = clients[i].post("/api/submit_prediction", json={
+                "row": rnd.choice(hot), "outcome": rnd.choice(("0", "1")),
+                "confidence": "medium", "snot22": rnd.randint(0, 110),
+            })
+            mine.append(time.perf_counter() - t0)
+            if resp.status_code >= 400:
+                with lock:
+                    errors.append(resp.status_code)
+        with lock:
+            latencies.extend(mine)
+
+    def chaos():
+        rnd = random.Random(size)
+        while not done.wait(rnd.uniform(0, 4 * args.latency or 0.01)):
+            sheets.invalidate_cache()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(clients))]
+    for t in threads:
+        t.start()
+    chaos_thread = threading.Thread(target=chaos, daemon=True)
+    chaos_thread.start()
+    start.wait()
+    t0 = time.perf_counter()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    done.set()
+    chaos_thread.join()
+
+    while sheets._WRITE_BEHIND and sheets._WRITE_BEHIND.pending():
+        if not sheets._WRITE_BEHIND.flush_once():
+            time.sleep(0.05)  # the background flusher holds the lease
+    keys = _submission_keys(gc)
+    duplicates = sum(len(v) - 1 for v in keys.values())
+    # the cached index must point at the one row each pair really has
+    idx = sheets._submission_index(stale_ok=False)
+    mismatched = sum(1 for key, (_, sheet_row) in idx.by_key.items()
+                     if keys.get(key, [None])[0] != sheet_row)
+    mismatched += sum(1 for key in keys if key not in idx.by_key)
+    latencies.sort()
+    n = len(latencies)
+    return {
+        "size": size,
+        "locks": len(sheets._UPSERT_LOCKS),
+        "requests": n,
+        "errors": len(errors),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "rps": n / wall if wall else 0.0,
+        "wall_s": wall,
+        "new_rows": sum(len(v) for v in keys.values()) - before,
+        "duplicates": duplicates,
+        "index_mismatches": mismatched,
+    }
+
+
+def bench_stress(args, sizes):
+    import sheets
+
+    _fresh_sheet(args, sizes[0])
+    from app import app
+
+    if not args.json:
+        print(f"{'rows':>7} {'locks':>5} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'req/s':>9} "
+              f"{'wall s':>7} {'new rows':>8} {'dups':>5} {'idx bad':>7} {'errors':>6}")
+    striped = sheets._UPSERT_LOCKS
+    failed = False
+    for size in sizes:
+        for locks in (striped, [threading.Lock()]):
+            sheets._UPSERT_LOCKS = locks
+            gc = _fresh_sheet(args, size)
+            r = run_stress(app, gc, size, args)
+            failed = failed or r["duplicates"] > 0 or r["index_mismatches"] > 0
+            if args.json:
+                print(json.dumps(r), flush=True)
+            else:
+                print(f"{r['size']:>7} {r['locks']:>5} {r['requests']:>6} {r['p50_ms']:>9.1f} "
+                      f"{r['p95_ms']:>9.1f} {r['rps']:>9.1f} {r['wall_s']:>7.2f} "
+                      f"{r['new_rows']:>8} {r['duplicates']:>5} {r['index_mismatches']:>7} "
+                      f"{r['errors']:>6}", flush=True)
+    sheets._UPSERT_LOCKS = striped
+    return 1 if failed else 0
+
+
+def _print_row(r):
+    print(f"{r['size']:>7} {r['endpoint']:<18} {r['requests']:>6} {r['p50_ms']:>9.1f} "
+          f"{r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['rps']:>9.1f} "
+          f"{r['sheets_calls_per_req']:>10.3f} {r['errors']:>6}", flush=True)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="100,1000,10000,50000", help="patient rows per run")
+    ap.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    ap.add_argument("--reviewers", type=int, default=8, help="concurrent clients")
+    ap.add_argument("--requests", type=int, default=200, help="requests per endpoint per size")
+    ap.add_argument("--latency", type=float, default=0.05, help="seconds per fake Sheets call")
+    ap.add_argument("--jitter", type=float, default=0.0, help="extra random seconds per call")
+    ap.add_argument("--fail-rate", type=float, default=0.0,
+                    help="fraction of fake Sheets calls that answer 429")
+    ap.add_argument("--done", type=float, default=0.25,
+                    help="fraction of patients each reviewer has already submitted")
+    ap.add_argument("--json", action="store_true", help="print one JSON object per result")
+    ap.add_argument("--sessions", action="store_true", help="benchmark session backends instead")
+    ap.add_argument("--startup", action="store_true",
+                    help="benchmark process startup, cold vs restored from disk")
+    ap.add_argument("--runs", type=int, default=3, help="processes per size and start mode")
+    ap.add_argument("--startup-child", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--stress", action="store_true",
+                    help="concurrent upserts of the same rows; check for duplicates")
+    ap.add_argument("--hot-rows", type=int, default=16,
+                    help="patient rows the --stress clients all save to")
+    args = ap.parse_args(argv)
+
+    _setup_env(args)
+    if args.startup_child:
+        return _startup_child(args)
+    if args.sessions:
+        return bench_sessions(args)
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    if args.startup:
+        return bench_startup(args, sizes)
+    if args.stress:
+        return bench_stress(args, sizes)
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    for e in endpoints:
+        if e not in ENDPOINTS:
+            ap.error(f"unknown endpoint {e!r} (choose from {', '.join(ENDPOINTS)})")
+
+    # the fake client must be in place before app.py builds the store
+    _fresh_sheet(args, sizes[0])
+    from app import app
+
+    if not args.json:
+        print(f"{'rows':>7} {'endpoint':<18} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+              f"{'req/s':>9} {'calls/req':>10} {'errors':>6}")
+    for size in sizes:
+        for endpoint in endpoints:
+            # every endpoint starts from the same freshly seeded sheet
+            gc = _fresh_sheet(args, size)
+            r = run_endpoint(app, gc, endpoint, size, args)
+            if args.json:
+                print(json.dumps(r), flush=True)
+            else:
+                _print_row(r)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+Column-oriented, dictionary-encoded copy of a tab's get_all_values().
+
+Each column keeps one list of its distinct strings plus an array of small
+integer codes (1, 2 or 4 bytes per cell), so repeated values such as
+statuses, reviewer emails and yes/no flags are stored once per column
+instead of once per cell. It still reads like the list of rows it replaces:
+len(sheet), sheet[i] (a RowView), slicing and iteration all work, and whole
+columns can be scanned without touching other cells.
+"""
+import json
+from array import array
+
+
+class RowView:
+    """One row of a ColumnarSheet; decodes cells on access."""
+
+    __slots__ = ("_sheet", "_i")
+
+    def __init__(self, sheet, i):
+        self._sheet = sheet
+        self._i = i
+
+    def __len__(self):
+        return self._sheet.width
+
+    def __getitem__(self, j):
+        if isinstance(j, slice):
+            return self.tolist()[j]
+        return self._sheet.cell(self._i, j)
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def tolist(self) -> list:
+        i = self._i
+        return [d[c[i]] for d, c in zip(self._sheet._dicts, self._sheet._codes)]
+
+    def __eq__(self, other):
+        return self.tolist() == list(other)
+
+    def __repr__(self):
+        return f"RowView({self.tolist()!r})"
+
+
+class ColumnarSheet:
+    __slots__ = ("width", "_n", "_codes", "_dicts")
+
+    def __init__(self, values):
+        self._n = len(values)
+        self.width = max((len(r) for r in values), default=0)
+        self._codes = []
+        self._dicts = []
+        for j in range(self.width):
+            seen = {"": 0}
+            codes = [
+                seen.setdefault(v, len(seen))
+                for v in (r[j] if j < len(r) else "" for r in values)
+            ]
+            n = len(seen)
+            typecode = "B" if n <= 0xFF else "H" if n <= 0xFFFF else "I"
+            self._codes.append(array(typecode, codes))
+            self._dicts.append(list(seen))
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(self._n)
+            if step == 1:
+                return list(self.rows(start, stop))
+            return [RowView(self, k) for k in range(start, stop, step)]
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError(i)
+        return RowView(self, i)
+
+    def __iter__(self):
+        return self.rows()
+
+    def rows(self, start: int = 0, stop: int | None = None, chunk: int = 1024):
+        """Rows start..stop-1 as tuples, decoded a column chunk at a time."""
+        stop = self._n if stop is None else min(stop, self._n)
+        for a in range(start, stop, chunk):
+            b = min(stop, a + chunk)
+            cols = [map(d.__getitem__, codes[a:b]) for d, codes in zip(self._dicts, self._codes)]
+            if cols:
+                yield from zip(*cols)
+            else:
+                yield from (() for _ in range(a, b))
+
+    def column(self, j):
+        """
+        (codes, strings) for column j: the value of row i is strings[codes[i]].
+        A missing column (j None or past the end) reads as all "".
+        """
+        if j is None or j >= self.width:
+            return bytes(self._n), [""]
+        return self._codes[j], self._dicts[j]
+
+    def cell(self, i: int, j: int) -> str:
+        """Value at 0-based row i, column j ("" past the last column)."""
+        if j < 0:
+            j += self.width
+        if j >= self.width:
+            return ""
+        return self._dicts[j][self._codes[j][i]]
+
+    def rows_where(self, j, pred, start: int = 1) -> list:
+        """
+        0-based indexes of rows >= start whose column j satisfies pred. pred
+        runs once per distinct value, not once per row. j=None matches "".
+        """
+        codes, strings = self.column(j)
+        hits = [bool(pred(v)) for v in strings]
+        return [i for i in range(start, self._n) if hits[codes[i]]]
+
+    def tolist(self) -> list:
+        """Plain list of row lists (for serialization)."""
+        return [list(r) for r in self.rows()]
+
+    def dumps(self) -> bytes:
+        """
+        Compact binary form: a length-prefixed JSON header (row count,
+        distinct strings, code widths) followed by the raw code arrays in
+        native byte order, so it is only meant to be read back on this host.
+        """
+        head = json.dumps(
+            {"n": self._n, "dicts": self._dicts, "types": [c.typecode for c in self._codes]},
+            separators=(",", ":"),
+        ).encode()
+        return b"".join([len(head).to_bytes(4, "big"), head] + [c.tobytes() for c in self._codes])
+
+    @classmethod
+    def loads(cls, data) -> "ColumnarSheet":
+        """Inverse of dumps(); the code arrays are copied straight from `data`."""
+        data = memoryview(data)
+        k = int.from_bytes(data[:4], "big")
+        head = json.loads(bytes(data[4:4 + k]))
+        sheet = cls.__new__(cls)
+        sheet._n = head["n"]
+        sheet._dicts = head["dicts"]
+        sheet.width = len(sheet._dicts)
+        sheet._codes = []
+        pos = 4 + k
+        for typecode in head["types"]:
+            codes = array(typecode)
+            end = pos + codes.itemsize * sheet._n
+            codes.frombytes(data[pos:end])
+            sheet._codes.append(codes)
+            pos = end
+        if pos != len(data):
+            raise ValueError("ColumnarSheet.loads: trailing or missing bytes")
+        return sheet
+
+    def nbytes(self) -> int:
+        """Approximate payload size: codes plus each distinct string once."""
+        return sum(c.itemsize * len(c) for c in self._codes) + sum(
+            len(s) for d in self._dicts for s in d
+        )
@@ -0,0 +1,56 @@
+import csv
+import io
+import zlib
+
+CSV_SOURCES = ("patients", "submissions", "joined")
+
+# Submission columns included in the joined export (patient_row is the key).
+JOINED_SUB_COLS = ["user_email", "user_name", "timestamp", "outcome", "confidence", "snot22"]
+
+
+def csv_chunks(rows, chunk_rows: int = 500):
+    """Encode an iterable of rows as CSV text, yielding one chunk per `chunk_rows` rows."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    n = 0
+    for row in rows:
+        writer.writerow(row)
+        n += 1
+        if n >= chunk_rows:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+            n = 0
+    if n:
+        yield buf.getvalue()
+
+
+def gzip_chunks(chunks, level: int = 6):
+    """Gzip a stream of text chunks (UTF-8) without buffering the whole body."""
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        out = z.compress(chunk.encode("utf-8"))
+        if out:
+            yield out
+    yield z.flush()
+
+
+def joined_rows(header: list, patient_rows, by_row: dict):
+    """
+    Left hash join of submissions onto patient rows.
+
+    patient_rows yields (sheet_row, values); by_row maps a sheet row number
+    to a list of submission record dicts. Each patient row is emitted once
+    per submission, or once with blank submission columns.
+    """
+    width = len(header)
+    yield ["patient_row"] + list(header) + JOINED_SUB_COLS
+    blank = [""] * len(JOINED_SUB_COLS)
+    for r_idx, vals in patient_rows:
+        base = [str(r_idx)] + list(vals[:width]) + [""] * (width - len(vals))
+        subs = by_row.get(r_idx)
+        if not subs:
+            yield base + blank
+            continue
+        for rec in subs:
+            yield base + [rec.get(c, "") for c in JOINED_SUB_COLS]
@@ -0,0 +1,137 @@
+"""
+Server-Sent Events fan-out for progress and metrics.
+
+One background thread watches the store's data version. It wakes when the
+store reports a local write (notify) or every `poll` seconds, and only while
+someone is connected. On a new version it computes metrics once and hands
+the result to every connection; each connection then sends its reviewer's
+own progress and whichever parts actually changed.
+
+Every open stream holds a server thread, so at most `max_streams` run at
+once (0 = no cap); callers turn reviewers beyond that away with a retry
+hint and they fall back to polling.
+"""
+import json
+import queue
+import threading
+import time
+import traceback
+
+from storage import public_metrics
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class Broadcaster:
+    def __init__(self, store, poll: float = 10.0, keepalive: float = 15.0,
+                 max_seconds: float = 300.0, max_streams: int = 0):
+        self.store = store
+        self.poll = poll
+        self.keepalive = keepalive
+        self.max_seconds = max_seconds
+        self.max_streams = max_streams
+        self._open = 0
+        self._subs = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._last = None  # (version, metrics) most recently published
+
+    def notify(self):
+        """Called by the store after a local write."""
+        self._wake.set()
+
+    def acquire(self) -> bool:
+        """Reserve a stream slot; False when max_streams are already open."""
+        with self._lock:
+            if self.max_streams and self._open >= self.max_streams:
+                return False
+            self._open += 1
+            return True
+
+    def release(self):
+        """Give back a slot taken by acquire() once its response is closed."""
+        with self._lock:
+            self._open = max(0, self._open - 1)
+
+    def _subscribe(self) -> queue.Queue:
+        q = queue.Queue(maxsize=4)
+        with self._lock:
+            self._subs.add(q)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sse-changes", daemon=True)
+                self._thread.start()
+        return q
+
+    def _unsubscribe(self, q):
+        with self._lock:
+            self._subs.discard(q)
+
+    def _current(self):
+        last = self._last
+        version = self.store.data_version()
+        if last and last[0] == version:
+            return last
+        last = (version, self.store.progress_metrics())
+        self._last = last
+        return last
+
+    def _run(self):
+        # _current() is also called by new connections, so the shared memo
+        # may already hold a version this loop never pushed
+        sent = None  # version last pushed to subscribers
+        while True:
+            self._wake.wait(self.poll)
+            self._wake.clear()
+            with self._lock:
+                subs = list(self._subs)
+            if not subs:
+                continue
+            try:
+                cur = self._current()
+            except Exception:
+                traceback.print_exc()
+                continue
+            if cur[0] == sent:
+                continue
+            sent = cur[0]
+            for q in subs:
+                try:
+                    q.put_nowait(cur)
+                except queue.Full:
+                    # slow client: drop its oldest pending update
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        pass
+                    q.put_nowait(cur)
+
+    def stream(self, email: str):
+        """Generator of SSE text for one connection."""
+        q = self._subscribe()
+        deadline = time.monotonic() + self.max_seconds
+        try:
+            version, metrics = self._current()
+            metrics = public_metrics(metrics, email)
+            progress = self.store.user_progress(email)
+            yield "retry: 3000\n\n"
+            yield _sse("progress", progress)
+            yield _sse("metrics", metrics)
+            while time.monotonic() < deadline:
+                try:
+                    version, new_metrics = q.get(timeout=self.keepalive)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                new_progress = self.store.user_progress(email)
+                if new_progress != progress:
+                    progress = new_progress
+                    yield _sse("progress", progress)
+                new_metrics = public_metrics(new_metrics, email)
+                if new_metrics != metrics:
+                    metrics = new_metrics
+                    yield _sse("metrics", metrics)
+        finally:
+            self._unsubscribe(q)
@@ -0,0 +1,259 @@
+"""
+In-process stand-in for the parts of gspread that sheets.py uses, for
+benchmarks and local experiments without Google:
+
+    import sheets, fake_sheets
+    gc = fake_sheets.FakeClient(latency=0.05)
+    fake_sheets.seed(gc, patients=1000, submissions=200)
+    sheets.set_client(gc)
+
+Every API call sleeps `latency` seconds (plus up to `jitter`), is counted
+in gc.calls by method name, and can be made to fail with HTTP 429 either
+at random (`fail_rate`) or for the next N calls (fail_next, which can also
+inject other statuses such as 503).
+"""
+import collections
+import random
+import threading
+import time
+
+from gspread.exceptions import APIError
+from gspread.utils import a1_range_to_grid_range, a1_to_rowcol
+
+
+class _Response:
+    """Just enough of requests.Response for gspread's APIError."""
+
+    def __init__(self, status, message="", payload=None):
+        self.status_code = status
+        self.headers = {}
+        self.text = message
+        self._payload = payload
+
+    def json(self):
+        if self._payload is not None:
+            return self._payload
+        return {"error": {"code": self.status_code, "message": self.text, "status": ""}}
+
+
+class FakeClient:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, fail_rate: float = 0.0,
+                 seed: int | None = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.calls = collections.Counter()
+        self._lock = threading.Lock()
+        self._fail_next = 0
+        self._fail_status = 429
+        self._rand = random.Random(seed)
+        self._books = {}
+        self.version = 1  # Drive file version; bumped by every write
+        self.http_client = _FakeHTTP(self)
+
+    def fail_next(self, n: int = 1, status: int = 429):
+        """Make the next `n` API calls fail with HTTP `status`."""
+        with self._lock:
+            self._fail_next += n
+            self._fail_status = status
+
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def _api(self, name: str, write: bool = False):
+        with self._lock:
+            self.calls[name] += 1
+            fail = None
+            if self._fail_next > 0:
+                self._fail_next -= 1
+                fail = self._fail_status
+            elif self.fail_rate and self._rand.random() < self.fail_rate:
+                fail = 429
+            delay = self.latency + (self._rand.random() * self.jitter if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        if fail == 429:
+            raise APIError(_Response(429, "Quota exceeded (fake)"))
+        if fail:
+            raise APIError(_Response(fail, "Backend error (fake)"))
+        if write:
+            with self._lock:
+                self.version += 1
+
+    def open_by_key(self, key):
+        self._api("open_by_key")
+        with self._lock:
+            book = self._books.get(key)
+            if book is None:
+                book = self._books[key] = FakeSpreadsheet(self, key)
+        return book
+
+
+class _FakeHTTP:
+    """Answers the Drive files.get call sheets._drive_revision() makes."""
+
+    def __init__(self, gc):
+        self._gc = gc
+
+    def request(self, method, url, params=None, **kw):
+        self._gc._api("drive_files_get")
+        v = self._gc.version
+        return _Response(200, payload={"version": str(v), "modifiedTime": f"fake-{v}"})
+
+
+class FakeSpreadsheet:
+    def __init__(self, gc, key):
+        self.client = gc
+        self.id = key
+        self._tabs = {}
+
+    def add_worksheet(self, title, rows=None):
+        ws = self._tabs[title] = FakeWorksheet(self.client, title, rows or [])
+        return ws
+
+    def worksheets(self):
+        self.client._api("worksheets")
+        return list(self._tabs.values())
+
+    def worksheet(self, title):
+        self.client._api("worksheet")
+        try:
+            return self._tabs[title]
+        except KeyError:
+            raise APIError(_Response(400, f"no worksheet {title!r}")) from None
+
+
+class FakeWorksheet:
+    def __init__(self, gc, title, rows):
+        self.client = gc
+        self.title = title
+        self._rows = [[str(v) for v in r] for r in rows]
+        self.col_count = max((len(r) for r in self._rows), default=0) + 5
+        self.row_count = len(self._rows) + 100
+
+    # ---- storage helpers (no API cost) ----
+    def _set(self, r, c, v):
+        while len(self._rows) < r:
+            self._rows.append([])
+        row = self._rows[r - 1]
+        while len(row) < c:
+            row.append("")
+        row[c - 1] = "" if v is None else str(v)
+        self.col_count = max(self.col_count, c)
+        self.row_count = max(self.row_count, r)
+
+    def _write_range(self, rng, values):
+        r0, c0 = a1_to_rowcol(rng.split("!")[-1].split(":")[0])
+        for i, vals in enumerate(values):
+            for j, v in enumerate(vals):
+                self._set(r0 + i, c0 + j, v)
+
+    def _read_range(self, rng):
+        g = a1_range_to_grid_range(rng.split("!")[-1])
+        rows = self._rows[g.get("startRowIndex", 0):g.get("endRowIndex", len(self._rows))]
+        out = []
+        for r in rows:
+            vals = r[g.get("startColumnIndex", 0):g.get("endColumnIndex", len(r))]
+            while vals and vals[-1] == "":
+                vals.pop()
+            out.append(vals)
+        while out and not out[-1]:
+            out.pop()
+        return out
+
+    # ---- gspread API ----
+    def get_all_values(self, **kw):
+        self.client._api("get_all_values")
+        with self.client._lock:
+            width = max((len(r) for r in self._rows), default=0)
+            return [r + [""] * (width - len(r)) for r in self._rows]
+
+    def row_values(self, row, **kw):
+        self.client._api("row_values")
+        with self.client._lock:
+            if row - 1 >= len(self._rows):
+                return []
+            vals = list(self._rows[row - 1])
+        while vals and vals[-1] == "":
+            vals.pop()
+        return vals
+
+    def batch_get(self, ranges, **kw):
+        self.client._api("batch_get")
+        with self.client._lock:
+            return [self._read_range(rng) for rng in ranges]
+
+    def update(self, range_name, values=None, **kw):
+        self.client._api("update", write=True)
+        with self.client._lock:
+            self._write_range(range_name, values or [])
+
+    def update_cell(self, row, col, value):
+        self.client._api("update_cell", write=True)
+        with self.client._lock:
+            self._set(row, col, value)
+
+    def batch_update(self, data, **kw):
+        self.client._api("batch_update", write=True)
+        with self.client._lock:
+            for d in data:
+                self._write_range(d["range"], d["values"])
+
+    def append_row(self, values, **kw):
+        return self.append_rows([values], _name="append_row")
+
+    def append_rows(self, values, _name="append_rows", **kw):
+        self.client._api(_name, write=True)
+        with self.client._lock:
+            first = len(self._rows) + 1
+            for vals in values:
+                self._rows.append([str(v) for v in vals])
+            self.row_count = max(self.row_count, len(self._rows))
+            last = len(self._rows)
+        # same shape as the values.append response gspread returns
+        return {"updates": {"updatedRange": f"{self.title}!A{first}:A{last}",
+                            "updatedRows": len(values)}}
+
+    def delete_rows(self, start_index, end_index=None):
+        self.client._api("delete_rows", write=True)
+        with self.client._lock:
+            del self._rows[start_index - 1:end_index or start_index]
+
+    def add_cols(self, cols):
+        self.client._api("add_cols", write=True)
+        self.col_count += cols
+
+
+# ---- fixtures ----
+PATIENT_COLS = ["patient_id", "age", "sex", "polyps", "asthma", "baseline_snot22"]
+
+
+def seed(gc, patients: int, submissions: int = 0, reviewers: int = 10,
+         sheet_id: str = "fake-sheet", tab: str = "Sheet1", sub_tab: str = "Submissions",
+         rand_seed: int = 7) -> FakeSpreadsheet:
+    """
+    Create a spreadsheet with `patients` patient rows and `submissions`
+    Submissions rows spread over `reviewers` reviewers. Required columns
+    are left for sheets.ensure_schema() to add, as on a fresh sheet.
+    """
+    rnd = random.Random(rand_seed)
+    book = gc.open_by_key(sheet_id)
+    rows = [PATIENT_COLS] + [
+        [f"P{i:05d}", rnd.randint(18, 85), rnd.choice("MF"), rnd.choice(("yes", "no")),
+         rnd.choice(("yes", "no")), rnd.randint(0, 110)]
+        for i in range(1, patients + 1)
+    ]
+    book.add_worksheet(tab, rows)
+    sub = [["timestamp", "user_email", "user_name", "patient_row", "outcome", "confidence", "snot22"]]
+    seen = set()
+    while len(sub) - 1 < min(submissions, patients * reviewers):
+        who = rnd.randrange(reviewers)
+        row = rnd.randint(2, patients + 1)
+        if (who, row) in seen:
+            continue
+        seen.add((who, row))
+        sub.append(["2024-01-01T00:00:00+00:00", f"reviewer{who}@example.org", f"Reviewer {who}",
+                    row, rnd.choice(("0", "1")), rnd.choice(("low", "medium", "high")),
+                    rnd.randint(0, 110)])
+    book.add_worksheet(sub_tab, sub)
+    return book
@@ -0,0 +1,138 @@
+"""
+Process-wide Google Sheets client shared by all request threads.
+
+- The client is built once, under a lock, on first use. Threads that
+  arrive meanwhile wait for it instead of authorizing again.
+- All API traffic goes through one keep-alive requests session whose
+  connection pool is sized for the number of threads that call Sheets, so
+  connections (and their TLS handshakes) are reused.
+- The spreadsheet is opened once. Every tab comes from a single metadata
+  read instead of one open_by_key() plus worksheet() per tab.
+- The access token is minted up front and then refreshed on a background
+  thread `refresh_margin` seconds before it expires, so a request never
+  waits on the token endpoint.
+"""
+import threading
+from datetime import datetime, timezone
+
+
+class ClientManager:
+    """
+    credentials: zero-arg function returning oauth2client or google-auth
+    credentials. call(fn, *args) runs one API call (e.g. through the rate
+    limiter) and wrap(ws) decorates each worksheet handed out.
+    """
+
+    def __init__(self, sheet_id: str, credentials, pool_size: int = 16,
+                 refresh_margin: float = 300.0, call=None, wrap=None):
+        self.sheet_id = sheet_id
+        self.pool_size = pool_size
+        self.refresh_margin = refresh_margin
+        self._credentials = credentials
+        self._call = call or (lambda fn, *a, **kw: fn(*a, **kw))
+        self._wrap = wrap or (lambda ws: ws)
+        self._lock = threading.RLock()
+        self._gc = None
+        self._creds = None
+        self._token_request = None
+        self._book = None
+        self._tabs = {}  # title -> wrapped worksheet
+        self._refresher = None
+        self._stop = threading.Event()
+        self.stats = {"token_refreshes": 0, "token_refresh_errors": 0, "metadata_reads": 0}
+
+    # ---- client ----
+    def client(self):
+        gc = self._gc
+        if gc is not None:
+            return gc
+        with self._lock:
+            if self._gc is None:
+                self._gc = self._connect()
+            return self._gc
+
+    def set_client(self, gc):
+        """Use `gc` (e.g. fake_sheets.FakeClient) and forget the current book and tabs."""
+        with self._lock:
+            self._stop.set()
+            self._stop = threading.Event()
+            self._refresher = None
+            self._creds = None
+            self._gc = gc
+            self._book = None
+            self._tabs = {}
+
+    def _connect(self):
+        import gspread
+        import requests
+        from google.auth.transport.requests import AuthorizedSession, Request
+        from gspread.utils import convert_credentials
+        from requests.adapters import HTTPAdapter
+
+        creds = convert_credentials(self._credentials())
+        session = AuthorizedSession(creds)
+        session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size))
+        self._creds = creds
+        self._token_request = Request(requests.Session())
+        self._refresh_token()
+        self._refresher = threading.Thread(
+            target=self._refresh_loop, args=(self._stop,), name="token-refresh", daemon=True
+        )
+        self._refresher.start()
+        return gspread.Client(None, session=session)
+
+    # ---- tokens ----
+    def _refresh_token(self):
+        self._creds.refresh(self._token_request)
+        self.stats["token_refreshes"] += 1
+
+    def _seconds_to_refresh(self) -> float:
+        expiry = getattr(self._creds, "expiry", None)  # naive UTC in google-auth
+        if expiry is None:
+            return 0.0
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return (expiry - now).total_seconds() - self.refresh_margin
+
+    def _refresh_loop(self, stop):
+        delay = max(5.0, self._seconds_to_refresh())
+        while not stop.wait(delay):
+            try:
+                self._refresh_token()
+                delay = max(5.0, self._seconds_to_refresh())
+            except Exception as e:
+                self.stats["token_refresh_errors"] += 1
+                print("access token refresh failed:", e)
+                delay = 30.0
+
+    # ---- spreadsheet and tabs ----
+    def spreadsheet(self):
+        book = self._book
+        if book is not None:
+            return book
+        with self._lock:
+            if self._book is None:
+                self._book = self._call(self.client().open_by_key, self.sheet_id)
+            return self._book
+
+    def worksheet(self, title: str):
+        ws = self._tabs.get(title)
+        if ws is not None:
+            return ws
+        with self._lock:
+            if title not in self._tabs:
+                self._load_tabs(title)
+            return self._tabs[title]
+
+    def _load_tabs(self, title):
+        book = self.spreadsheet()
+        self.stats["metadata_reads"] += 1
+        for ws in self._call(book.worksheets):
+            self._tabs.setdefault(ws.title, self._wrap(ws))
+        if title not in self._tabs:
+            # let the library look it up (the tab may be brand new) and
+            # raise its usual error if it really is missing
+            self._tabs[title] = self._wrap(self._call(book.worksheet, title))
+
+    def close(self):
+        """Stop the token refresher (the client stays usable until the token expires)."""
+        self._stop.set()
@@ -0,0 +1,179 @@
+"""
+Optional per-request timing of Sheets operations (INSTRUMENTATION=true).
+
+app.py calls begin()/end() around every request; the Sheets client wrapper
+calls observe_op() for every worksheet call. Each request's operations come
+back from end() for its Server-Timing header, and everything is folded into
+process-wide histograms per endpoint and per operation, served as JSON
+(stats()) or in Prometheus text format (prometheus_text()).
+
+When disabled nothing is hooked in at all.
+"""
+import os
+import threading
+import time
+
+ENABLED = os.environ.get("INSTRUMENTATION", "false").lower() == "true"
+
+# Upper bounds (seconds) of the histogram buckets; +Inf is implicit.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_PREFIX = "expert_survey"
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def add(self, seconds: float):
+        i = 0
+        while i < len(BUCKETS) and seconds > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q: float):
+        """Upper bound of the bucket holding the q-quantile (None if past the last)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return BUCKETS[i] if i < len(BUCKETS) else None
+        return None
+
+
+_lock = threading.Lock()
+_requests = {}  # endpoint -> Histogram of request durations
+_ops = {}  # op -> Histogram of call durations
+_op_calls = {}  # (endpoint, op) -> call count
+_sources = {}  # name -> fn() returning {kind: number}, e.g. limiter counters
+_local = threading.local()
+
+
+def add_source(name: str, fn):
+    """Include fn()'s counters in stats() and the Prometheus output."""
+    _sources[name] = fn
+
+
+def begin():
+    _local.ops = {}
+    _local.t0 = time.perf_counter()
+
+
+def observe_op(op: str, seconds: float):
+    """Record one Sheets call (from any thread; attributed to the current request, if any)."""
+    ops = getattr(_local, "ops", None)
+    if ops is not None:
+        n, total = ops.get(op, (0, 0.0))
+        ops[op] = (n + 1, total + seconds)
+    with _lock:
+        h = _ops.get(op)
+        if h is None:
+            h = _ops[op] = Histogram()
+        h.add(seconds)
+
+
+def end(endpoint: str):
+    """
+    Finish the current request. Returns (total_seconds, {op: (calls,
+    seconds)}), or None if begin() was not called on this thread.
+    """
+    ops = getattr(_local, "ops", None)
+    if ops is None:
+        return None
+    total = time.perf_counter() - _local.t0
+    _local.ops = None
+    with _lock:
+        h = _requests.get(endpoint)
+        if h is None:
+            h = _requests[endpoint] = Histogram()
+        h.add(total)
+        for op, (n, _s) in ops.items():
+            _op_calls[(endpoint, op)] = _op_calls.get((endpoint, op), 0) + n
+    return total, ops
+
+
+def server_timing(total: float, ops: dict) -> str:
+    """Server-Timing header value: one entry per Sheets operation plus the total."""
+    parts = [f'sheets_{op};dur={s * 1000:.1f};desc="{n} calls"' for op, (n, s) in sorted(ops.items())]
+    parts.append(f"app;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def _summary(h: Histogram) -> dict:
+    # quantiles are bucket upper bounds ("at most"); None = above the last bucket
+    out = {"count": h.count, "mean_ms": round(h.sum / h.count * 1000, 2) if h.count else 0.0}
+    for q in (50, 95, 99):
+        v = h.quantile(q / 100)
+        out[f"p{q}_ms_le"] = None if v is None else v * 1000
+    return out
+
+
+def stats() -> dict:
+    with _lock:
+        requests = {ep: _summary(h) for ep, h in sorted(_requests.items())}
+        ops = {op: _summary(h) for op, h in sorted(_ops.items())}
+        calls = {}
+        for (ep, op), n in sorted(_op_calls.items()):
+            calls.setdefault(ep, {})[op] = n
+    out = {"requests": requests, "sheets_ops": ops, "sheets_calls_by_endpoint": calls}
+    for name, fn in _sources.items():
+        out[name] = fn()
+    return out
+
+
+def _label(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _histogram_lines(name, label, items):
+    lines = [f"# TYPE {name} histogram"]
+    for key, h in items:
+        cum = 0
+        for i, n in enumerate(h.counts):
+            cum += n
+            le = repr(BUCKETS[i]) if i < len(BUCKETS) else "+Inf"
+            lines.append(f'{name}_bucket{{{label}="{_label(key)}",le="{le}"}} {cum}')
+        lines.append(f'{name}_sum{{{label}="{_label(key)}"}} {h.sum}')
+        lines.append(f'{name}_count{{{label}="{_label(key)}"}} {h.count}')
+    return lines
+
+
+def prometheus_text() -> str:
+    with _lock:
+        requests = sorted(_requests.items())
+        ops = sorted(_ops.items())
+        calls = sorted(_op_calls.items())
+        # snapshot the histograms so formatting happens outside the lock
+        requests = [(k, _copy(h)) for k, h in requests]
+        ops = [(k, _copy(h)) for k, h in ops]
+    lines = [f"# HELP {_PREFIX}_request_seconds Request duration by endpoint."]
+    lines += _histogram_lines(f"{_PREFIX}_request_seconds", "endpoint", requests)
+    lines.append(f"# HELP {_PREFIX}_sheets_op_seconds Google Sheets call duration by operation.")
+    lines += _histogram_lines(f"{_PREFIX}_sheets_op_seconds", "op", ops)
+    lines.append(f"# HELP {_PREFIX}_sheets_calls_total Google Sheets calls made while serving each endpoint.")
+    lines.append(f"# TYPE {_PREFIX}_sheets_calls_total counter")
+    for (ep, op), n in calls:
+        lines.append(f'{_PREFIX}_sheets_calls_total{{endpoint="{_label(ep)}",op="{_label(op)}"}} {n}')
+    for name, fn in _sources.items():
+        metric = f"{_PREFIX}_{name}_total"
+        lines.append(f"# TYPE {metric} counter")
+        for kind, n in sorted(fn().items()):
+            lines.append(f'{metric}{{kind="{_label(kind)}"}} {n}')
+    return "\n".join(lines) + "\n"
+
+
+def _copy(h: Histogram) -> Histogram:
+    c = Histogram()
+    c.counts = list(h.counts)
+    c.sum = h.sum
+    c.count = h.count
+    return c
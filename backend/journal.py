@@ -0,0 +1,188 @@
+"""
+Durable write-behind queue.
+
+Records are committed to a local SQLite journal (synchronous=FULL, so the
+commit is fsync'd) before the caller is acknowledged. A background thread
+leases pending entries, coalesces them by key (latest wins) and hands them
+to a flush function in one batch. Entries are deleted only after a
+successful flush; failures back off exponentially with jitter. Leases
+expire, so entries left behind by a crashed process are replayed by the
+next one that starts on the same journal file.
+"""
+import json
+import random
+import threading
+import time
+import traceback
+
+from sqlitedb import ThreadConnections
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL,
+    record TEXT NOT NULL,
+    lease_until REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS pending_by_key ON pending (key);
+"""
+
+
+class Journal:
+    def __init__(self, path: str):
+        self.path = path
+        # synchronous=FULL: a commit is fsync'd before the caller is acknowledged
+        self._db = ThreadConnections(path, synchronous="FULL", isolation_level=None,
+                                     schema=_SCHEMA)
+
+    def append(self, key: str, record: dict) -> int:
+        cur = self._db().execute(
+            "INSERT INTO pending (key, record) VALUES (?, ?)", (key, json.dumps(record))
+        )
+        return cur.lastrowid
+
+    def append_many(self, items: list):
+        """Journal [(key, record)] in one transaction (one fsync)."""
+        db = self._db()
+        db.execute("BEGIN")
+        try:
+            db.executemany(
+                "INSERT INTO pending (key, record) VALUES (?, ?)",
+                [(key, json.dumps(rec)) for key, rec in items],
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def pending(self) -> list:
+        """All unflushed records, oldest first, coalesced by key."""
+        rows = self._db().execute("SELECT key, record FROM pending ORDER BY id").fetchall()
+        latest = {}
+        for key, rec in rows:
+            latest.pop(key, None)
+            latest[key] = json.loads(rec)
+        return list(latest.values())
+
+    def lease(self, seconds: float, limit: int = 500):
+        """
+        Claim up to `limit` unleased entries for `seconds`.
+        Returns (ids, records) with records coalesced by key.
+        """
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            rows = db.execute(
+                "SELECT id, key, record FROM pending WHERE lease_until < ? ORDER BY id LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            if rows:
+                db.executemany(
+                    "UPDATE pending SET lease_until = ? WHERE id = ?",
+                    [(now + seconds, r[0]) for r in rows],
+                )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        latest = {}
+        for _id, key, rec in rows:
+            latest.pop(key, None)
+            latest[key] = json.loads(rec)
+        return [r[0] for r in rows], list(latest.values())
+
+    def ack(self, ids: list):
+        db = self._db()
+        db.execute("BEGIN")
+        db.executemany("DELETE FROM pending WHERE id = ?", [(i,) for i in ids])
+        db.execute("COMMIT")
+
+    def release(self, ids: list):
+        self._db().executemany(
+            "UPDATE pending SET lease_until = 0 WHERE id = ?", [(i,) for i in ids]
+        )
+
+    def count(self) -> int:
+        return self._db().execute("SELECT COUNT(*) FROM pending").fetchone()[0]
+
+
+class WriteBehind:
+    """
+    Background flusher for a Journal.
+
+    flush(records) must write all records or raise; on_flushed() runs after
+    each successful flush (e.g. to invalidate caches).
+    """
+
+    def __init__(self, journal: Journal, flush, on_flushed=None,
+                 interval: float = 0.5, poll: float = 10.0, max_backoff: float = 60.0,
+                 lease: float = 120.0):
+        self.journal = journal
+        self._flush = flush
+        self._on_flushed = on_flushed
+        self.interval = interval
+        self.poll = poll
+        self.max_backoff = max_backoff
+        self.lease_seconds = lease
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="sheets-write-behind", daemon=True
+                )
+                self._thread.start()
+        # replay anything left over from a previous process
+        self._wake.set()
+
+    def submit(self, key: str, record: dict):
+        """Durably journal a record and schedule a flush."""
+        self.journal.append(key, record)
+        self._wake.set()
+
+    def submit_many(self, items: list):
+        """Durably journal [(key, record)] together and schedule a flush."""
+        self.journal.append_many(items)
+        self._wake.set()
+
+    def pending(self) -> list:
+        return self.journal.pending()
+
+    def flush_once(self) -> int:
+        """Flush one leased batch. Returns the number of journal entries written."""
+        ids, records = self.journal.lease(self.lease_seconds)
+        if not ids:
+            return 0
+        try:
+            self._flush(records)
+        except BaseException:
+            self.journal.release(ids)
+            raise
+        self.journal.ack(ids)
+        if self._on_flushed:
+            self._on_flushed()
+        return len(ids)
+
+    def _run(self):
+        backoff = 0.0
+        while True:
+            # Wake on submit (or periodically, to pick up expired leases), then
+            # give concurrent saves a short window to land in the same batch.
+            self._wake.wait(self.poll)
+            self._wake.clear()
+            time.sleep(self.interval)
+            try:
+                while self.flush_once():
+                    pass
+                backoff = 0.0
+            except Exception as e:
+                backoff = min(self.max_backoff, max(1.0, backoff * 2))
+                delay = backoff * random.uniform(0.5, 1.5)
+                print(f"write-behind flush failed (retrying in {delay:.1f}s):", e)
+                traceback.print_exc()
+                time.sleep(delay)
+                self._wake.set()
@@ -0,0 +1,67 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class LRUCache:
+    """Small thread-safe LRU map."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class Prefetcher:
+    """
+    Runs warm-up tasks on a bounded background pool. At most one task per
+    key is queued at a time and at most `max_pending` overall; extra
+    requests are dropped since a prefetch is only ever an optimization.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 64):
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="prefetch")
+        self._pending = set()
+        self._lock = threading.Lock()
+        self.max_pending = max_pending
+
+    def schedule(self, key, fn, *args) -> bool:
+        with self._lock:
+            if key in self._pending or len(self._pending) >= self.max_pending:
+                return False
+            self._pending.add(key)
+        self._pool.submit(self._run, key, fn, args)
+        return True
+
+    def _run(self, key, fn, args):
+        try:
+            fn(*args)
+        except Exception as e:
+            print("prefetch failed:", e)
+        finally:
+            with self._lock:
+                self._pending.discard(key)
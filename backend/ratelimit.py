@@ -0,0 +1,195 @@
+"""
+Quota-aware wrapper for gspread worksheets.
+
+Every call waits for a token from a per-kind (read/write) bucket sized to
+the project's per-minute quota, is retried with exponential backoff and
+full jitter on 429/5xx, and identical reads already in flight on the same
+worksheet are shared instead of being sent twice. Appends are not
+idempotent, so they are only retried on 429 (the request was rejected
+before it ran), never on 5xx.
+"""
+import random
+import threading
+import time
+
+# Worksheet methods that only read; everything else is treated as a write.
+READ_METHODS = frozenset({
+    "get_all_values", "get_all_records", "get_values", "get", "batch_get",
+    "row_values", "col_values", "acell", "cell", "range", "findall", "find",
+})
+NON_IDEMPOTENT = frozenset({"append_row", "append_rows", "insert_row", "insert_rows",
+                            "add_rows", "add_cols"})
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class RateLimited(RuntimeError):
+    """Sheets is over quota (or failing) and retries ran out."""
+
+    def __init__(self, message: str, retry_after: float = 30.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _status(exc):
+    """HTTP status of a gspread APIError (or anything with .response), else None."""
+    code = getattr(exc, "code", None)
+    if isinstance(code, int):
+        return code
+    return getattr(getattr(exc, "response", None), "status_code", None)
+
+
+def _retry_after(exc):
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    `per_minute` tokens per minute with bursts up to `burst` (default: one
+    minute's worth). Callers queue by reserving future tokens; one that
+    would wait longer than `max_wait` gets RateLimited instead.
+    per_minute <= 0 means unlimited.
+    """
+
+    def __init__(self, per_minute: float, burst: float | None = None, max_wait: float = 30.0):
+        self.rate = per_minute / 60.0
+        self.capacity = burst if burst is not None else per_minute
+        self.max_wait = max_wait
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            wait = (1 - self._tokens) / self.rate if self._tokens < 1 else 0.0
+            if wait > self.max_wait:
+                raise RateLimited("Sheets request queue is full", retry_after=wait)
+            self._tokens -= 1
+        if wait:
+            time.sleep(wait)
+
+
+class _Call:
+    __slots__ = ("done", "result", "exc")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exc = None
+
+
+class SheetsLimiter:
+    def __init__(self, reads: TokenBucket, writes: TokenBucket, retries: int = 5,
+                 base_delay: float = 1.0, max_delay: float = 32.0):
+        self.reads = reads
+        self.writes = writes
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._inflight = {}
+        self._lock = threading.Lock()
+        # observe(op_name, seconds) after every worksheet call, if set
+        self.observe = None
+        self.stats = {"calls": 0, "retries": 0, "coalesced": 0, "gave_up": 0}  # approximate
+
+    def call(self, fn, *args, write: bool = False, idempotent: bool = True, **kw):
+        """Run fn(*args, **kw) under the bucket with retries."""
+        bucket = self.writes if write else self.reads
+        attempt = 0
+        while True:
+            bucket.acquire()
+            self.stats["calls"] += 1
+            try:
+                return fn(*args, **kw)
+            except Exception as e:
+                status = _status(e)
+                if status not in RETRY_STATUSES or (not idempotent and status != 429):
+                    raise
+                hint = _retry_after(e)
+                if attempt >= self.retries:
+                    self.stats["gave_up"] += 1
+                    raise RateLimited(
+                        f"Google Sheets returned {status} after {attempt + 1} attempts",
+                        retry_after=hint or self.max_delay,
+                    ) from e
+                delay = hint or random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                attempt += 1
+                self.stats["retries"] += 1
+                time.sleep(delay)
+
+    def coalesced(self, key, fn, *args, **kw):
+        """Like call(), but concurrent callers with the same key share one request."""
+        with self._lock:
+            c = self._inflight.get(key)
+            leader = c is None
+            if leader:
+                c = self._inflight[key] = _Call()
+        if not leader:
+            self.stats["coalesced"] += 1
+            c.done.wait()
+            if c.exc is not None:
+                raise c.exc
+            return c.result
+        try:
+            c.result = self.call(fn, *args, **kw)
+            return c.result
+        except BaseException as e:
+            c.exc = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            c.done.set()
+
+    def wrap(self, ws):
+        return LimitedWorksheet(ws, self)
+
+
+class LimitedWorksheet:
+    """
+    Proxy for a gspread Worksheet that routes method calls through a
+    SheetsLimiter. Attributes (title, col_count, ...) pass straight through.
+    """
+
+    def __init__(self, ws, limiter: SheetsLimiter):
+        self._ws = ws
+        self._limiter = limiter
+        # Bumped by every write, so a read issued after a write never joins
+        # a request that started before it.
+        self._epoch = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self._ws, name)
+        if not callable(attr):
+            return attr
+        limiter = self._limiter
+        if name in READ_METHODS:
+            def call(*args, **kw):
+                key = (id(self._ws), self._epoch, name, repr(args), repr(sorted(kw.items())))
+                return limiter.coalesced(key, attr, *args, **kw)
+        else:
+            def call(*args, **kw):
+                self._epoch += 1
+                try:
+                    return limiter.call(attr, *args, write=True,
+                                        idempotent=name not in NON_IDEMPOTENT, **kw)
+                finally:
+                    self._epoch += 1
+        if limiter.observe is None:
+            return call
+
+        def timed(*args, **kw):
+            t0 = time.perf_counter()
+            try:
+                return call(*args, **kw)
+            finally:
+                limiter.observe(name, time.perf_counter() - t0)
+        return timed
@@ -0,0 +1,54 @@
+"""
+Columns and cell conventions shared by every storage backend (sheets.py,
+sqlite_store.py), kept in one place so the engines cannot drift apart.
+Importable without SHEET_ID or any Google packages.
+"""
+from datetime import datetime, timezone
+
+# We will ensure these columns exist; names must match your sheet header row.
+REQUIRED_COLS = [
+    "expert_prediction",
+    "expert_confidence",
+    "expert_SNOT22score_prediction",
+    "reviewer_name",
+    "reviewer_email",
+    "submission_status",
+    "claimed_by",
+    "claimed_at",
+    "edit_count",
+    "last_edited_at",
+]
+
+SUB_REQUIRED_COLS = [
+    "timestamp",
+    "user_email",
+    "user_name",
+    "patient_row",
+    "outcome",
+    "confidence",
+    "snot22",
+]
+
+# Cell values that count as "yes" in flag columns such as submission_status.
+TRUE_VALUES = ("1", "true", "yes", "y", "submitted", "done")
+
+
+def val_bool(v) -> bool:
+    return str(v).strip().lower() in TRUE_VALUES
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def patient_status(r_idx, submitted, claimed_by, claimed_at, reviewer_is_me, me) -> dict:
+    """One list_patients() entry."""
+    return {
+        "row": r_idx,
+        "submitted": submitted,
+        "available": not submitted and (not claimed_by or claimed_by == me),
+        "locked_by_you": claimed_by == me and not submitted,
+        "claimed_by": claimed_by,
+        "claimed_at": claimed_at,
+        "can_edit": bool(submitted and me and reviewer_is_me),
+    }
@@ -0,0 +1,173 @@
+"""
+Session backends, selected with SESSION_BACKEND:
+
+- cookie (default): Flask's signed cookie. The session is only the
+  reviewer's {name, email}, so nothing needs to be stored server-side.
+  The cookie is re-issued when the session changes or is past half its
+  lifetime, instead of on every response.
+- sqlite: session rows in a local SQLite file (WAL mode) keyed by a signed
+  random id; expired rows are swept at most every SESSION_SWEEP_SECONDS.
+- filesystem: the old Flask-Session file store (one pickle file per
+  session, never compacted).
+"""
+import json
+import os
+import secrets
+import threading
+import time
+
+from flask.sessions import SecureCookieSession, SecureCookieSessionInterface, SessionInterface
+from itsdangerous import BadSignature, Signer
+
+from sqlitedb import ThreadConnections
+
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "cookie").strip().lower()
+SESSION_DB_PATH = os.environ.get("SESSION_DB_PATH", "sessions.db")
+SESSION_SWEEP_SECONDS = float(os.environ.get("SESSION_SWEEP_SECONDS", "3600"))
+
+BACKENDS = ("cookie", "sqlite", "filesystem")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    sid TEXT PRIMARY KEY,
+    data TEXT NOT NULL,               -- JSON object
+    expires REAL NOT NULL             -- epoch seconds
+);
+CREATE INDEX IF NOT EXISTS sessions_by_expiry ON sessions (expires);
+"""
+
+
+class CookieSessionInterface(SecureCookieSessionInterface):
+    def open_session(self, app, request):
+        s = self.get_signing_serializer(app)
+        if s is None:
+            return None
+        val = request.cookies.get(self.get_cookie_name(app))
+        if not val:
+            return self.session_class()
+        max_age = int(app.permanent_session_lifetime.total_seconds())
+        try:
+            data, issued = s.loads(val, max_age=max_age, return_timestamp=True)
+        except BadSignature:
+            return self.session_class()
+        session = self.session_class(data)
+        session.issued = issued.timestamp()
+        return session
+
+    def should_set_cookie(self, app, session):
+        if session.modified:
+            return True
+        if not session.permanent:
+            return False
+        age = time.time() - getattr(session, "issued", 0.0)
+        return age > app.permanent_session_lifetime.total_seconds() / 2
+
+
+class SQLiteSession(SecureCookieSession):
+    def __init__(self, initial=None, sid=None, expires=0.0):
+        super().__init__(initial)
+        self.sid = sid
+        self.expires = expires
+
+
+class SQLiteSessionInterface(SessionInterface):
+    """
+    Server-side sessions in SQLite. The cookie carries only a signed random
+    id. A row is rewritten when the session changes or when less than half
+    of its lifetime is left, not on every request.
+    """
+
+    def __init__(self, path: str, sweep_interval: float = 3600.0):
+        self.path = path
+        self.sweep_interval = sweep_interval
+        self._next_sweep = 0.0
+        self._sweep_lock = threading.Lock()
+        self._db = ThreadConnections(path, schema=_SCHEMA)
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt="expert-survey-session")
+
+    def sweep(self, now=None) -> int:
+        """Delete expired rows; returns how many."""
+        now = time.time() if now is None else now
+        db = self._db()
+        with db:
+            return db.execute("DELETE FROM sessions WHERE expires < ?", (now,)).rowcount
+
+    def _maybe_sweep(self, now):
+        if now < self._next_sweep or not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_sweep = now + self.sweep_interval
+            self.sweep(now)
+        finally:
+            self._sweep_lock.release()
+
+    def open_session(self, app, request):
+        now = time.time()
+        self._maybe_sweep(now)
+        raw = request.cookies.get(self.get_cookie_name(app))
+        if raw:
+            try:
+                sid = self._signer(app).unsign(raw).decode()
+            except BadSignature:
+                sid = None
+            if sid:
+                row = self._db().execute(
+                    "SELECT data, expires FROM sessions WHERE sid = ?", (sid,)
+                ).fetchone()
+                if row and row[1] > now:
+                    return SQLiteSession(json.loads(row[0]), sid, row[1])
+        return SQLiteSession(sid=secrets.token_urlsafe(32))
+
+    def save_session(self, app, session, response):
+        if session.accessed:
+            response.vary.add("Cookie")
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.modified and session.expires:
+                db = self._db()
+                with db:
+                    db.execute("DELETE FROM sessions WHERE sid = ?", (session.sid,))
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        now = time.time()
+        if not session.modified and session.expires - now > lifetime / 2:
+            return
+        expires = now + lifetime
+        db = self._db()
+        with db:
+            db.execute(
+                "INSERT INTO sessions (sid, data, expires) VALUES (?, ?, ?)"
+                " ON CONFLICT (sid) DO UPDATE SET data = excluded.data, expires = excluded.expires",
+                (session.sid, json.dumps(dict(session)), expires),
+            )
+        session.expires = expires
+        response.set_cookie(
+            name,
+            self._signer(app).sign(session.sid).decode(),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+def init_app(app, backend: str = SESSION_BACKEND):
+    """Install the session backend named `backend` on `app`."""
+    if backend == "cookie":
+        app.session_interface = CookieSessionInterface()
+    elif backend == "sqlite":
+        app.session_interface = SQLiteSessionInterface(SESSION_DB_PATH, SESSION_SWEEP_SECONDS)
+    elif backend == "filesystem":
+        from flask_session import Session
+
+        app.config["SESSION_TYPE"] = "filesystem"
+        Session(app)
+    else:
+        raise ValueError(f"unknown SESSION_BACKEND: {backend!r} (choose from {', '.join(BACKENDS)})")
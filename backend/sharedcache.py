@@ -0,0 +1,159 @@
+"""
+Cross-process snapshot store on a Redis-protocol server.
+
+Under gunicorn every worker has its own SnapshotCache; with this store
+behind them, a tab is downloaded from Google once per data version for the
+whole host instead of once per worker. For each cache key it keeps:
+
+- {key}:gen   generation counter, bumped by invalidate() and publish()
+- {key}:meta  "gen seq fetched modified" of the stored copy
+- {key}:data  zlib-compressed JSON of the values
+- {key}:lock  held by the one process currently downloading
+- {key}:seen  last change token passed to invalidate() (dedupes watchers)
+
+A copy is usable when its gen equals the current gen and it is younger than
+the caller's max age. Otherwise one process takes the lock and downloads
+while the others poll for its result; if the lock holder dies, the lock
+expires and the waiters fall back to downloading themselves.
+"""
+import json
+import os
+import time
+import zlib
+
+try:
+    import redis
+except ImportError:  # optional; only needed when SHARED_CACHE_URL is set
+    redis = None
+
+
+class SharedEntry:
+    __slots__ = ("values", "gen", "seq", "fetched", "modified")
+
+    def __init__(self, values, gen, seq, fetched, modified):
+        self.values = values
+        self.gen = gen
+        self.seq = seq  # unique per stored copy; same in every worker
+        self.fetched = fetched  # wall clock of the download it derives from
+        self.modified = modified  # wall clock it was stored
+
+
+class RedisSnapshotStore:
+    def __init__(self, client, prefix: str = "expert-survey:", lock_ttl: float = 30.0,
+                 poll: float = 0.05):
+        self.r = client
+        self.prefix = prefix
+        self.lock_ttl = lock_ttl
+        self.poll = poll
+
+    @classmethod
+    def from_url(cls, url: str, **kw):
+        if redis is None:
+            raise RuntimeError("SHARED_CACHE_URL is set but the 'redis' package is not installed")
+        return cls(redis.Redis.from_url(url), **kw)
+
+    def _k(self, key, part):
+        return f"{self.prefix}{key}:{part}"
+
+    def generation(self, key) -> int:
+        return int(self.r.get(self._k(key, "gen")) or 0)
+
+    def _meta(self, key):
+        raw = self.r.get(self._k(key, "meta"))
+        if not raw:
+            return None
+        gen, seq, fetched, modified = raw.split()
+        return int(gen), int(seq), float(fetched), float(modified)
+
+    def _read(self, key, gen, max_age):
+        meta = self._meta(key)
+        if meta is None or meta[0] != gen or time.time() - meta[2] >= max_age:
+            return None
+        raw = self.r.get(self._k(key, "data"))
+        if raw is None:
+            return None
+        values = json.loads(zlib.decompress(raw))
+        return SharedEntry(values, *meta)
+
+    def _store(self, pipe, key, values, gen, fetched):
+        now = time.time()
+        seq = self.r.incr(self._k("", "seq"))
+        pipe.set(self._k(key, "meta"), f"{gen} {seq} {fetched} {now}")
+        pipe.set(self._k(key, "data"),
+                 zlib.compress(json.dumps(values, separators=(",", ":")).encode(), 1))
+        return SharedEntry(values, gen, seq, fetched, now)
+
+    def fetch(self, key, loader, max_age: float) -> SharedEntry:
+        """The current shared copy of `key`, calling loader() in at most one process."""
+        lock = self._k(key, "lock")
+        token = os.urandom(8).hex()
+        deadline = time.monotonic() + self.lock_ttl
+        while True:
+            gen = self.generation(key)
+            entry = self._read(key, gen, max_age)
+            if entry is not None:
+                return entry
+            if self.r.set(lock, token, nx=True, px=int(self.lock_ttl * 1000)):
+                break
+            if time.monotonic() >= deadline:
+                token = None  # lock holder is stuck; download without it
+                break
+            time.sleep(self.poll)
+        try:
+            fetched = time.time()
+            values = loader()
+            # Tagged with the gen read before the download: if someone
+            # invalidated meanwhile, readers see it as stale and reload.
+            with self.r.pipeline() as pipe:
+                entry = self._store(pipe, key, values, gen, fetched)
+                pipe.execute()
+            return entry
+        finally:
+            if token is not None:
+                self._unlock(lock, token)
+
+    def _unlock(self, lock, token):
+        with self.r.pipeline() as pipe:
+            try:
+                pipe.watch(lock)
+                if pipe.get(lock) == token.encode():
+                    pipe.multi()
+                    pipe.delete(lock)
+                    pipe.execute()
+            except redis.WatchError:
+                pass  # expired and taken over; not ours to delete
+
+    def publish(self, key, values, base_gen: int, fetched: float):
+        """
+        Store locally-patched `values` as the next generation of the copy
+        that had `base_gen`. If the generation moved on (another worker
+        wrote or invalidated), nothing is stored and the key is
+        invalidated instead, since our patch may be missing from theirs.
+        Returns the new SharedEntry or None.
+        """
+        gen_key = self._k(key, "gen")
+        with self.r.pipeline() as pipe:
+            try:
+                pipe.watch(gen_key)
+                if int(pipe.get(gen_key) or 0) == base_gen:
+                    pipe.multi()
+                    pipe.incr(gen_key)
+                    entry = self._store(pipe, key, values, base_gen + 1, fetched)
+                    pipe.execute()
+                    return entry
+            except redis.WatchError:
+                pass
+        self.invalidate(key)
+        return None
+
+    def invalidate(self, key, token=None):
+        """
+        Make every process's copy of `key` stale. With a change token (e.g.
+        a Drive revision), only the first caller per token bumps the
+        generation, so N watchers seeing one edit cause one reload.
+        """
+        if token is not None:
+            prev = self.r.getset(self._k(key, "seen"), token)
+            if prev is not None and prev.decode() == token:
+                return
+        self.r.incr(self._k(key, "gen"))
@@ -1,93 +1,342 @@
-import os, json, csv, io
+import os, json, threading, functools, time, bisect, hashlib, contextlib
 from datetime import datetime, timedelta, timezone
 
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 from dotenv import load_dotenv
 
+import instrument
+import snapfile
+from columnar import ColumnarSheet
+from csvstream import csv_chunks, joined_rows
+from gclient import ClientManager
+from journal import Journal, WriteBehind
+from watcher import ChangeWatcher
+from prefetch import LRUCache, Prefetcher
+from ratelimit import SheetsLimiter, TokenBucket
+from schema import REQUIRED_COLS, SUB_REQUIRED_COLS, now_iso, patient_status, val_bool
+from sharedcache import RedisSnapshotStore
+from snapshot import SnapshotCache
+from subindex import SubmissionIndex, norm_email, parse_row
+
 # ---- configuration / auth ----
 load_dotenv()
 
 SHEET_ID = os.environ["SHEET_ID"]
 SHEET_TAB = os.environ.get("SHEET_TAB", "Sheet1")
 SUBMISSIONS_TAB = os.environ.get("SUBMISSIONS_TAB", "Submissions")
+# Seconds between checks of the spreadsheet's Drive version (0 = off).
+WATCH_INTERVAL = float(os.environ.get("SHEETS_WATCH_INTERVAL", "0"))
+# Seconds a downloaded copy of a tab is reused before re-reading it (0 = off).
+# With the watcher on, snapshots are dropped on real changes, so the TTL is
+# only a safety net and defaults much higher.
+CACHE_TTL_SECONDS = float(
+    os.environ.get("SHEETS_CACHE_TTL", "600" if WATCH_INTERVAL > 0 else "15")
+)
+# Acknowledge submissions once journaled locally; flush to Sheets in the background.
+WRITE_BEHIND = os.environ.get("SHEETS_WRITE_BEHIND", "false").lower() == "true"
+JOURNAL_PATH = os.environ.get("SHEETS_JOURNAL_PATH", "submissions_journal.db")
+# Submission upserts for the same (reviewer, patient row) run one at a time;
+# different pairs only contend when they hash to the same one of these locks.
+UPSERT_LOCK_STRIPES = max(1, int(os.environ.get("SHEETS_UPSERT_LOCK_STRIPES", "64")))
+# After serving a patient, warm the next N unsubmitted rows for that reviewer.
+PREFETCH_DEPTH = int(os.environ.get("SHEETS_PREFETCH_DEPTH", "3"))
+PREFETCH_WORKERS = int(os.environ.get("SHEETS_PREFETCH_WORKERS", "2"))
+RECORD_CACHE_SIZE = int(os.environ.get("SHEETS_RECORD_CACHE_SIZE", "2048"))
+# Redis URL shared by all workers on the host, so each tab is downloaded
+# once per data version rather than once per worker (empty = off).
+SHARED_CACHE_URL = os.environ.get("SHARED_CACHE_URL", "").strip()
+# Append missing required columns to a tab's header row instead of failing.
+AUTO_MIGRATE = os.environ.get("SHEETS_AUTO_MIGRATE", "true").lower() == "true"
+# Sheets API quota per minute for this service account (0 = unlimited), and
+# how many times a 429/5xx is retried before giving up.
+READS_PER_MINUTE = float(os.environ.get("SHEETS_READS_PER_MINUTE", "60"))
+WRITES_PER_MINUTE = float(os.environ.get("SHEETS_WRITES_PER_MINUTE", "60"))
+API_RETRIES = int(os.environ.get("SHEETS_API_RETRIES", "5"))
+# Keep-alive connections kept open to Google (size it to the number of
+# threads that call Sheets), and how many seconds before expiry the access
+# token is refreshed in the background.
+HTTP_POOL_SIZE = int(os.environ.get("SHEETS_HTTP_POOL_SIZE", "16"))
+TOKEN_REFRESH_MARGIN = float(os.environ.get("SHEETS_TOKEN_REFRESH_MARGIN", "300"))
+# Local file keeping the last downloaded copy of both tabs, so a restarted
+# process serves reads at once and revalidates in the background (empty = off).
+SNAPSHOT_PATH = os.environ.get("SHEETS_SNAPSHOT_PATH", "").strip()
 
 _SCOPE = [
     "https://spreadsheets.google.com/feeds",
     "https://www.googleapis.com/auth/drive",
 ]
 
-_GC = None
-_WS = None
-_SUB_WS = None
+# Every Sheets call goes through this: quota buckets, backoff on 429/5xx and
+# sharing of identical in-flight reads (see ratelimit.py).
+_LIMITER = SheetsLimiter(
+    TokenBucket(READS_PER_MINUTE), TokenBucket(WRITES_PER_MINUTE), retries=API_RETRIES
+)
+if instrument.ENABLED:
+    _LIMITER.observe = instrument.observe_op
+    instrument.add_source("sheets_limiter", lambda: dict(_LIMITER.stats))
 
 
-def _gc():
-    global _GC
-    if _GC:
-        return _GC
+def _credentials():
+    # imported here: the Google client stack takes a noticeable share of a
+    # cold start and is not needed to serve a restored snapshot
+    from oauth2client.service_account import ServiceAccountCredentials
+
     if os.environ.get("GCP_SERVICE_ACCOUNT_JSON", "").strip():
         info = json.loads(os.environ["GCP_SERVICE_ACCOUNT_JSON"])
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(info, _SCOPE)
-    else:
-        creds = ServiceAccountCredentials.from_json_keyfile_name(
-            "service_account.json", _SCOPE
-        )
-    _GC = gspread.authorize(creds)
-    return _GC
+        return ServiceAccountCredentials.from_json_keyfile_dict(info, _SCOPE)
+    return ServiceAccountCredentials.from_json_keyfile_name("service_account.json", _SCOPE)
+
+
+# One client, one spreadsheet handle and one pooled HTTP session for every
+# thread; the token is refreshed in the background (see gclient.py).
+_CLIENT = ClientManager(
+    SHEET_ID, _credentials, pool_size=HTTP_POOL_SIZE, refresh_margin=TOKEN_REFRESH_MARGIN,
+    call=_LIMITER.call, wrap=_LIMITER.wrap,
+)
+if instrument.ENABLED:
+    instrument.add_source("sheets_client", lambda: dict(_CLIENT.stats))
+
+
+def _gc():
+    return _CLIENT.client()
+
+
+def set_client(gc):
+    """
+    Use `gc` (a gspread Client, or a stand-in such as fake_sheets.FakeClient)
+    from now on, dropping worksheets, schema and caches tied to the old one.
+    """
+    global _SUB_INDEX
+    _CLIENT.set_client(gc)
+    with _SUB_INDEX_LOCK:
+        _SUB_INDEX = None
+    invalidate_schema()
+    invalidate_cache()
+    _RECORDS.clear()
 
 
 def _ws():
-    global _WS
-    if _WS:
-        return _WS
-    _WS = _gc().open_by_key(SHEET_ID).worksheet(SHEET_TAB)
-    return _WS
+    return _CLIENT.worksheet(SHEET_TAB)
 
 
 def _sub_ws():
-    global _SUB_WS
-    if _SUB_WS:
-        return _SUB_WS
-    _SUB_WS = _gc().open_by_key(SHEET_ID).worksheet(SUBMISSIONS_TAB)
-    return _SUB_WS
+    return _CLIENT.worksheet(SUBMISSIONS_TAB)
+
+
+# ---- snapshot cache ----
+# One cached copy of each tab's get_all_values(). Writers below invalidate
+# the tab they touched so this process always reads its own writes. With
+# SHARED_CACHE_URL the copies (and invalidations) are shared by all workers;
+# derived indexes are still rebuilt per worker, once per shared version.
+# The patient tab is kept column-wise and dictionary-encoded (columnar.py).
+_SHARED = RedisSnapshotStore.from_url(SHARED_CACHE_URL) if SHARED_CACHE_URL else None
+_PATIENTS = SnapshotCache(
+    lambda: _load_patients(), CACHE_TTL_SECONDS, _SHARED, f"{SHEET_ID}:{SHEET_TAB}",
+    transform=ColumnarSheet,
+)
+_SUBMISSIONS = SnapshotCache(
+    lambda: _load_submissions(), CACHE_TTL_SECONDS, _SHARED, f"{SHEET_ID}:{SUBMISSIONS_TAB}"
+)
+
+# Derived index over the Submissions snapshot; see _submission_index().
+_SUB_INDEX = None
+_SUB_INDEX_LOCK = threading.Lock()
+_UPSERT_LOCKS = [threading.Lock() for _ in range(UPSERT_LOCK_STRIPES)]
+
+
+def _load_patients():
+    values = _ws().get_all_values()
+    _persist_soon()
+    return values
+
+
+def _load_submissions():
+    values = _sub_ws().get_all_values()
+    if _WRITE_BEHIND:
+        values = _overlay_pending(values, _WRITE_BEHIND.pending())
+    _persist_soon()
+    return values
+
+
+def _patient_snapshot():
+    return _PATIENTS.get()
+
+
+def _submission_snapshot(stale_ok: bool = True):
+    return _SUBMISSIONS.get(stale_ok)
+
+
+def invalidate_cache(token=None):
+    """
+    Drop cached copies of both tabs (next read re-downloads). `token`
+    identifies the remote change, so workers that all notice the same edit
+    only invalidate the shared copies once.
+    """
+    _PATIENTS.invalidate(token)
+    _SUBMISSIONS.invalidate(token)
+
+
+# Snapshot versions are per-process counters; tag them so two workers never
+# hand out the same token for different data.
+_PROCESS_TAG = os.urandom(4).hex()
+
+
+# ---- remote change detection ----
+_DRIVE_FILES_URL = "https://www.googleapis.com/drive/v3/files/"
+
+
+def _drive_revision() -> str:
+    """Drive's file version + modifiedTime: changes on every edit, no cell reads."""
+    res = _gc().http_client.request(
+        "get",
+        _DRIVE_FILES_URL + SHEET_ID,
+        params={"fields": "version,modifiedTime", "supportsAllDrives": True},
+    )
+    meta = res.json()
+    return f"{meta.get('version')}|{meta.get('modifiedTime')}"
+
+
+def _remote_changed():
+    # One refresh per real change. Our own writes also move the revision, so
+    # they cost at most one extra download per watch interval.
+    invalidate_cache(_WATCHER.token)
+    _notify_change()
+
+
+_WATCHER = ChangeWatcher(_drive_revision, _remote_changed, WATCH_INTERVAL)
+
+
+def remote_revision():
+    """Last Drive revision token seen by the watcher (None if off or not polled yet)."""
+    return _WATCHER.token
+
+
+_CHANGE_LISTENERS = []
+
+
+def add_change_listener(fn):
+    """Call fn() after every write this process makes to either tab."""
+    _CHANGE_LISTENERS.append(fn)
+
+
+def _notify_change():
+    for fn in list(_CHANGE_LISTENERS):
+        try:
+            fn()
+        except Exception as e:
+            print("change listener failed:", e)
+
+
+def data_version() -> str:
+    """Opaque token that changes whenever either tab's snapshot changes."""
+    return _version_token(_patient_snapshot(), _submission_snapshot())
+
+
+def _version_token(psnap, ssnap) -> str:
+    # Copies from the shared store carry a host-wide seq, so every worker
+    # hands out the same token (and honours the same ETags) for them.
+    if psnap.origin and ssnap.origin:
+        return f"shared.{psnap.origin}.{ssnap.origin}"
+    return f"{_PROCESS_TAG}.{psnap.version}.{ssnap.version}"
+
+
+# ---- disk snapshot (fast cold start) ----
+# With SHEETS_SNAPSHOT_PATH, both tabs and their header rows are saved a few
+# seconds after each download or write. A new process restores them before
+# its first request and refreshes from Sheets in the background; writes
+# always wait for a fresh Submissions copy (see _submission_index).
+def _collect_snapshot():
+    psnap, ssnap = _PATIENTS.peek(), _SUBMISSIONS.peek()
+    if psnap is None or ssnap is None:
+        return None
+    return {
+        "sheet_id": SHEET_ID,
+        "tabs": {
+            SHEET_TAB: (psnap.values, psnap.created),
+            SUBMISSIONS_TAB: (ssnap.values, ssnap.created),
+        },
+        "headers": {tab: hit[0] for tab, hit in _SCHEMA.items()},
+    }
+
+
+_SAVER = snapfile.Saver(SNAPSHOT_PATH, _collect_snapshot) if SNAPSHOT_PATH else None
+
+
+def _persist_soon():
+    if _SAVER:
+        _SAVER.touch()
+
+
+if _SAVER:
+    add_change_listener(_persist_soon)
+
+
+def save_snapshot() -> bool:
+    """Write the disk snapshot now (e.g. before a planned shutdown)."""
+    return bool(_SAVER) and _SAVER.save_now()
+
+
+def restore_snapshot() -> bool:
+    """
+    Seed both caches and the header maps from SHEETS_SNAPSHOT_PATH if it
+    holds a copy of this spreadsheet. Returns whether anything was restored.
+    """
+    if not SNAPSHOT_PATH:
+        return False
+    saved = snapfile.load(SNAPSHOT_PATH, SHEET_ID)
+    if saved is None or not {SHEET_TAB, SUBMISSIONS_TAB} <= saved["tabs"].keys():
+        return False
+    patients, p_created = saved["tabs"][SHEET_TAB]
+    subs, s_created = saved["tabs"][SUBMISSIONS_TAB]
+    with _SCHEMA_LOCK:
+        for tab, header in saved["headers"].items():
+            _SCHEMA.setdefault(tab, (header, _name_map(header)))
+    restored = _PATIENTS.restore(patients, p_created)
+    return _SUBMISSIONS.restore(subs.tolist(), s_created) or restored
+
+
+def warmup() -> dict:
+    """
+    Pay up front for what a first request would: authorize, open both tabs,
+    check the header rows and download fresh copies of both (waiting out a
+    restored snapshot's refresh). Returns milliseconds per step.
+    """
+    timings = {}
+    steps = (
+        ("client", _gc),
+        ("worksheets", lambda: (_ws(), _sub_ws())),
+        ("schema", lambda: (_header_and_map(), _sub_header_and_map())),
+        ("patients", lambda: _PATIENTS.get(stale_ok=False)),
+        ("submissions", lambda: _submission_index(stale_ok=False)),
+    )
+    for name, fn in steps:
+        t0 = time.perf_counter()
+        fn()
+        timings[name] = round((time.perf_counter() - t0) * 1000, 1)
+    return timings
 
 
 # ---- header helpers ----
-# We will ensure these columns exist; names must match your sheet header row.
-REQUIRED_COLS = [
-    "expert_prediction",
-    "expert_confidence",
-    "expert_SNOT22score_prediction",
-    "reviewer_name",
-    "reviewer_email",
-    "submission_status",
-    "claimed_by",
-    "claimed_at",
-    "edit_count",
-    "last_edited_at",
-]
+class SchemaError(RuntimeError):
+    """A tab is missing required columns and auto-migration is off."""
 
-SUB_REQUIRED_COLS = [
-    "timestamp",
-    "user_email",
-    "user_name",
-    "patient_row",
-    "outcome",
-    "confidence",
-    "snot22",
-]
 
+# tab name -> (header_list, name->index_map[1-based]); see _schema().
+_SCHEMA = {}
+_SCHEMA_LOCK = threading.Lock()
+
+
+def _load_schema(ws, required, cache):
+    """Read row 1 and, if allowed, append any missing required columns."""
+    from gspread.utils import rowcol_to_a1
 
-def _header_and_map():
-    """Return (header_list, name->index_map[1-based]). Ensures REQUIRED_COLS exist."""
-    ws = _ws()
     header = ws.row_values(1)
-    name_to_idx = {name.strip(): i + 1 for i, name in enumerate(header)}
+    name_to_idx = _name_map(header)
 
     # Add any missing columns at the end of the header row.
-    missing = [c for c in REQUIRED_COLS if c not in name_to_idx]
+    missing = [c for c in required if c not in name_to_idx]
     if missing:
+        if not AUTO_MIGRATE:
+            raise SchemaError(f"{ws.title!r} is missing columns: {', '.join(missing)}")
         start_col = len(header) + 1
         # Ensure the sheet has enough columns
         need_cols = len(header) + len(missing)
@@ -95,46 +344,153 @@ def _header_and_map():
             ws.add_cols(need_cols - ws.col_count)
         # Write the missing headers
         ws.update(
-            gspread.utils.rowcol_to_a1(1, start_col),
+            rowcol_to_a1(1, start_col),
             [missing],
         )
         # Refresh header and index map
         header = ws.row_values(1)
-        name_to_idx = {name.strip(): i + 1 for i, name in enumerate(header)}
+        name_to_idx = _name_map(header)
+        cache.invalidate()
 
     return header, name_to_idx
 
 
+def _name_map(header) -> dict:
+    return {name.strip(): i + 1 for i, name in enumerate(header)}
+
+
+def _schema(tab, ws_fn, required, cache):
+    """
+    Cached (header, map) for a tab. Reloaded only when dropped by
+    invalidate_schema() or when a fresher snapshot shows a different
+    header row (someone edited the columns by hand).
+    """
+    hit = _SCHEMA.get(tab)
+    if hit is not None:
+        snap = cache.peek()
+        if snap is None or not snap.values or _trim_row(snap.values[0]) == hit[0]:
+            return hit
+    with _SCHEMA_LOCK:
+        if _SCHEMA.get(tab) is hit:
+            _SCHEMA[tab] = _load_schema(ws_fn(), required, cache)
+        return _SCHEMA[tab]
+
+
+def _trim_row(row) -> list:
+    """Drop trailing blanks (row_values() omits them, get_all_values() pads)."""
+    row = list(row)
+    while row and row[-1] == "":
+        row.pop()
+    return row
+
+
+def _header_and_map():
+    """Return (header_list, name->index_map[1-based]). Ensures REQUIRED_COLS exist."""
+    return _schema(SHEET_TAB, _ws, REQUIRED_COLS, _PATIENTS)
+
+
 def _sub_header_and_map():
     """Return (header_list, name->index_map[1-based]) for Submissions. Ensures SUB_REQUIRED_COLS exist."""
-    ws = _sub_ws()
-    header = ws.row_values(1)
-    name_to_idx = {name.strip(): i + 1 for i, name in enumerate(header)}
+    return _schema(SUBMISSIONS_TAB, _sub_ws, SUB_REQUIRED_COLS, _SUBMISSIONS)
 
-    # Add any missing columns at the end of the header row.
-    missing = [c for c in SUB_REQUIRED_COLS if c not in name_to_idx]
-    if missing:
-        start_col = len(header) + 1
-        need_cols = len(header) + len(missing)
-        if ws.col_count < need_cols:
-            ws.add_cols(need_cols - ws.col_count)
-        ws.update(
-            gspread.utils.rowcol_to_a1(1, start_col),
-            [missing],
-        )
-        header = ws.row_values(1)
-        name_to_idx = {name.strip(): i + 1 for i, name in enumerate(header)}
 
-    return header, name_to_idx
+def invalidate_schema():
+    """Forget cached header maps; the next call re-reads row 1 of each tab."""
+    with _SCHEMA_LOCK:
+        _SCHEMA.clear()
+
 
+def ensure_schema():
+    """
+    Validate (and with SHEETS_AUTO_MIGRATE, migrate) both tabs' header rows.
+    Each map is swapped in once it has been read, so readers keep using the
+    current (e.g. restored) maps meanwhile instead of waiting on row 1.
+    """
+    for tab, ws_fn, required, cache in (
+        (SHEET_TAB, _ws, REQUIRED_COLS, _PATIENTS),
+        (SUBMISSIONS_TAB, _sub_ws, SUB_REQUIRED_COLS, _SUBMISSIONS),
+    ):
+        fresh = _load_schema(ws_fn(), required, cache)
+        with _SCHEMA_LOCK:
+            _SCHEMA[tab] = fresh
 
-def _val_bool(v):
-    s = str(v).strip().lower()
-    return s in {"1", "true", "yes", "y", "submitted", "done"}
 
+def _is_schema_error(e) -> bool:
+    if isinstance(e, KeyError):
+        return True
+    from gspread.exceptions import APIError
+
+    return isinstance(e, APIError) and e.code == 400
 
-def _now_iso():
-    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+def _schema_retry(fn):
+    """Retry a write once with fresh header maps if it failed on a column mismatch."""
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if not _is_schema_error(e):
+                raise
+        invalidate_schema()
+        return fn(*args, **kwargs)
+
+    return wrapper
+
+
+# ---- row writes ----
+class RowWrite:
+    """
+    Collect column edits for one sheet row and send them as a single
+    batch_update request (adjacent columns are merged into one range).
+
+        RowWrite(ws, row, h).set("outcome", "1").set("snot22", "40").commit()
+    """
+
+    def __init__(self, ws, row_num: int, name_to_idx: dict):
+        self.ws = ws
+        self.row_num = row_num
+        self.h = name_to_idx
+        self.cells = {}  # 1-based col -> value
+
+    def set(self, col_name: str, value):
+        self.cells[self.h[col_name]] = value
+        return self
+
+    def ranges(self) -> list:
+        """batch_update payload: one {range, values} per run of adjacent columns."""
+        out = []
+        run = []
+        for col in sorted(self.cells):
+            if run and col != run[-1] + 1:
+                out.append(self._range(run))
+                run = []
+            run.append(col)
+        if run:
+            out.append(self._range(run))
+        return out
+
+    def _range(self, cols):
+        from gspread.utils import rowcol_to_a1
+
+        a1 = rowcol_to_a1(self.row_num, cols[0])
+        if len(cols) > 1:
+            a1 += ":" + rowcol_to_a1(self.row_num, cols[-1])
+        return {"range": a1, "values": [[self.cells[c] for c in cols]]}
+
+    def commit(self):
+        if not self.cells:
+            return None
+        return self.ws.batch_update(self.ranges(), value_input_option="USER_ENTERED")
+
+
+def _cell(row_vals, h, col_name) -> str:
+    """Value of `col_name` in a row_values() list ('' if absent)."""
+    idx = h.get(col_name)
+    if not idx or idx - 1 >= len(row_vals):
+        return ""
+    return row_vals[idx - 1] or ""
 
 
 def _is_stale(when_iso):
@@ -146,51 +502,156 @@ def _is_stale(when_iso):
 
 
 # ---- public helpers used by app.py ----
+PATIENT_STATUSES = ("submitted", "pending", "mine")
+
+
+def _status_cols(header) -> dict:
+    """0-based positions of the status columns list_patients reads (None if absent)."""
+    h = {name.strip(): i for i, name in enumerate(header)}
+    return {
+        key: h.get(key)
+        for key in ("submission_status", "claimed_by", "claimed_at", "reviewer_email")
+    }
+
+
 def list_patients(current_user_email=None):
-    ws = _ws()
-    header, h = _header_and_map()
-    values = ws.get_all_values()
-    out = []
+    return page_patients(current_user_email)["patients"]
 
-    for r_idx in range(2, len(values) + 1):
-        row_vals = values[r_idx - 1]
-
-        def get(col_name):
-            idx = h.get(col_name)
-            if not idx:
-                return ""
-            if idx - 1 < len(row_vals):
-                return row_vals[idx - 1]
-            return ""
-
-        submitted = _val_bool(get("submission_status"))
-        claimed_by = get("claimed_by") or ""
-        claimed_at = get("claimed_at") or ""
-        available = not submitted and (
-            not claimed_by or claimed_by == (current_user_email or "")
-        )
-        locked_by_you = claimed_by == (current_user_email or "") and not submitted
-        reviewer = get("reviewer_email").strip().lower()
-        can_edit = submitted and current_user_email and (reviewer == (current_user_email or "").strip().lower())
-
-        out.append(
-            {
-                "row": r_idx,
-                "submitted": submitted,
-                "available": bool(available),
-                "locked_by_you": bool(locked_by_you),
-                "claimed_by": claimed_by,
-                "claimed_at": claimed_at,
-                "can_edit": bool(can_edit),
-            }
+
+def page_patients(current_user_email=None, offset=0, limit=None, fields=None, status=None):
+    """
+    One page of list_patients() rows.
+    status: None, "submitted" / "pending" (patients with / without any
+    reviewer's submission: a Submissions row, or the legacy
+    submission_status column set) or "mine" (rows the current user has a
+    submission for).
+    fields: optional list of keys to keep ("row" is always kept).
+    Returns {patients, total, offset, next_cursor}; next_cursor is the offset
+    of the following page, or None on the last one (or an empty one).
+    """
+    values = _patient_snapshot().values
+    cols = _status_cols(values[0] if values else [])
+
+    if status == "mine":
+        last_row = len(values)
+        rows = [r for r in _submission_index().rows_for(current_user_email) if 2 <= r <= last_row]
+    else:
+        rows = range(2, len(values) + 1)
+    if status in ("submitted", "pending"):
+        # submissions live in the Submissions tab; the legacy column only
+        # covers rows written by the old per-patient flow
+        done = set(_submission_index().reviews)
+        # whole-column scan; val_bool runs once per distinct status value
+        done.update(i + 1 for i in values.rows_where(cols["submission_status"], val_bool))
+        want = status == "submitted"
+        rows = [r for r in rows if (r in done) == want]
+
+    total = len(rows)
+    end = total if limit is None else min(total, offset + limit)
+
+    # Status columns are read as (codes, distinct strings); anything derived
+    # from a value (truthiness, "is it me") is computed once per distinct value.
+    me = current_user_email or ""
+    me_norm = me.strip().lower()
+    sub_codes, sub_vals = values.column(cols["submission_status"])
+    sub_vals = [val_bool(v) for v in sub_vals]
+    by_codes, by_vals = values.column(cols["claimed_by"])
+    at_codes, at_vals = values.column(cols["claimed_at"])
+    rev_codes, rev_vals = values.column(cols["reviewer_email"])
+    rev_vals = [v.strip().lower() == me_norm for v in rev_vals]
+    out = []
+    for r_idx in rows[offset:end]:
+        i = r_idx - 1
+        item = patient_status(
+            r_idx,
+            sub_vals[sub_codes[i]],
+            by_vals[by_codes[i]],
+            at_vals[at_codes[i]],
+            rev_vals[rev_codes[i]],
+            me,
         )
-    return out
+        if fields:
+            item = {k: v for k, v in item.items() if k == "row" or k in fields}
+        out.append(item)
+    return {
+        "patients": out,
+        "total": total,
+        "offset": offset,
+        # None unless this page moved forward, so following it always ends
+        "next_cursor": end if offset < end < total else None,
+    }
 
 
 def get_patient(row_num: int):
-    ws = _ws()
+    return _cached_record(_patient_snapshot(), row_num)
+
+
+def patient_entry(row_num: int):
+    """
+    (validator, build) for get_patient(row_num), both from one snapshot.
+    The validator hashes the header and that row's cells, so it only
+    changes when they do, in every worker alike.
+    """
+    snap = _patient_snapshot()
+    values = snap.values
+    digest = hashlib.blake2b(digest_size=10)
+    for part in (values[0] if values else (),
+                 values[row_num - 1] if 0 < row_num <= len(values) else ()):
+        digest.update("\x1f".join(part).encode())
+        digest.update(b"\x1e")
+    return digest.hexdigest(), lambda: _cached_record(snap, row_num)
+
+
+# Built get_patient() dicts keyed by (snapshot version, row). Shared, so
+# callers must not mutate what they get back.
+_RECORDS = LRUCache(RECORD_CACHE_SIZE)
+_PREFETCH = Prefetcher(PREFETCH_WORKERS)
+
+
+def _cached_record(snap, row_num: int) -> dict:
+    key = (snap.version, row_num)
+    rec = _RECORDS.get(key)
+    if rec is None:
+        rec = _patient_record(snap.values, row_num)
+        _RECORDS.put(key, rec)
+    return rec
+
+
+def user_progress(email: str) -> dict:
+    """{completed, total, next_row} for one reviewer, from one pair of snapshots."""
+    return _progress(_submission_index(), len(_patient_snapshot().values), email)
+
+
+def _progress(idx: SubmissionIndex, last_row: int, email: str) -> dict:
+    return {
+        "completed": len(idx.rows_for(email)) if (email or "").strip() else 0,
+        "total": max(0, last_row - 1),
+        "next_row": idx.next_remaining(email, last_row),
+    }
+
+
+def prefetch_after(email: str, row: int):
+    """Warm records (and near-expiry snapshots) for the rows `email` will see after `row`."""
+    if PREFETCH_DEPTH <= 0 or row is None:
+        return
+    _PREFETCH.schedule(norm_email(email), _prefetch, email, row)
+
+
+def _prefetch(email, row):
+    _PATIENTS.refresh_ahead()
+    _SUBMISSIONS.refresh_ahead()
+    snap = _patient_snapshot()
+    rem = _submission_index().remaining_for(email, len(snap.values))
+    i = bisect.bisect_right(rem, row)
+    upcoming = rem[i:i + PREFETCH_DEPTH]
+    upcoming += rem[:PREFETCH_DEPTH - len(upcoming)]  # wrap around
+    for r in upcoming:
+        _cached_record(snap, r)
+
+
+def _patient_record(values, row_num: int) -> dict:
     header, h = _header_and_map()
-    row_vals = ws.row_values(row_num)
+    row_vals = values[row_num - 1].tolist() if 0 < row_num <= len(values) else []
 
     record = {}
     for key in header:
@@ -201,12 +662,13 @@ def get_patient(row_num: int):
         if val != "":
             record[key] = val
 
-    submitted = _val_bool(record.get("submission_status", ""))
+    submitted = val_bool(record.get("submission_status", ""))
     record["submitted"] = submitted
 
     return {"row": row_num, "record": record}
 
 
+@_schema_retry
 def claim_row(row_num: int, email: str, prev_row: int = None):
     ws = _ws()
     header, h = _header_and_map()
@@ -218,9 +680,9 @@ def claim_row(row_num: int, email: str, prev_row: int = None):
     if prev_row and prev_row != row_num:
         _safe_release(ws, h, prev_row, email)
 
-    claimed_by = ws.cell(row_num, h["claimed_by"]).value or ""
-    claimed_at = ws.cell(row_num, h["claimed_at"]).value or ""
-    submitted = _val_bool(ws.cell(row_num, h["submission_status"]).value)
+    row_vals = ws.row_values(row_num)
+    claimed_by = _cell(row_vals, h, "claimed_by")
+    submitted = val_bool(_cell(row_vals, h, "submission_status"))
 
     if submitted:
         return {"ok": False, "error": "already completed"}
@@ -229,20 +691,27 @@ def claim_row(row_num: int, email: str, prev_row: int = None):
         return {"ok": False, "error": "locked by another reviewer"}
 
     # Assign claim to this user
-    ws.update_cell(row_num, h["claimed_by"], email or "")
-    ws.update_cell(row_num, h["claimed_at"], _now_iso())
+    (
+        RowWrite(ws, row_num, h)
+        .set("claimed_by", email or "")
+        .set("claimed_at", now_iso())
+        .commit()
+    )
+    _PATIENTS.invalidate()
+    _notify_change()
     return {"ok": True}
 
 
 def _safe_release(ws, h, row_num, email):
     """Clear claim if the same user holds it and it's not submitted."""
     try:
-        submitted = _val_bool(ws.cell(row_num, h["submission_status"]).value)
-        if submitted:
+        row_vals = ws.row_values(row_num)
+        if val_bool(_cell(row_vals, h, "submission_status")):
             return
-        if (ws.cell(row_num, h["claimed_by"]).value or "") == (email or ""):
-            ws.update_cell(row_num, h["claimed_by"], "")
-            ws.update_cell(row_num, h["claimed_at"], "")
+        if _cell(row_vals, h, "claimed_by") == (email or ""):
+            RowWrite(ws, row_num, h).set("claimed_by", "").set("claimed_at", "").commit()
+            _PATIENTS.invalidate()
+            _notify_change()
     except Exception:
         pass
 
@@ -259,49 +728,52 @@ def release_stale_claims():
     return
 
 
+@_schema_retry
 def submit_prediction(row_num: int, payload: dict) -> bool:
     """Write reviewer + prediction fields, mark as submitted, and clear claim."""
     ws = _ws()
     header, h = _header_and_map()
 
     # Only allow the same user who claimed to submit (if a claim exists)
-    claimed_by = ws.cell(row_num, h["claimed_by"]).value or ""
+    row_vals = ws.row_values(row_num)
+    claimed_by = _cell(row_vals, h, "claimed_by")
     if claimed_by and claimed_by != payload.get("email", ""):
         return False
 
-    ws.update_cell(row_num, h["reviewer_name"], payload.get("name", ""))
-    ws.update_cell(row_num, h["reviewer_email"], payload.get("email", ""))
-    ws.update_cell(row_num, h["expert_prediction"], str(payload.get("outcome", "")))
-    ws.update_cell(row_num, h["expert_confidence"], payload.get("confidence", ""))
-    ws.update_cell(
-        row_num, h["expert_SNOT22score_prediction"], str(payload.get("snot22", ""))
+    (
+        RowWrite(ws, row_num, h)
+        .set("reviewer_name", payload.get("name", ""))
+        .set("reviewer_email", payload.get("email", ""))
+        .set("expert_prediction", str(payload.get("outcome", "")))
+        .set("expert_confidence", payload.get("confidence", ""))
+        .set("expert_SNOT22score_prediction", str(payload.get("snot22", "")))
+        .set("submission_status", "submitted")
+        # Clear claim when submitted
+        .set("claimed_by", "")
+        .set("claimed_at", "")
+        .commit()
     )
-    ws.update_cell(row_num, h["submission_status"], "submitted")
-
-    # Clear claim when submitted
-    ws.update_cell(row_num, h["claimed_by"], "")
-    ws.update_cell(row_num, h["claimed_at"], "")
+    _PATIENTS.invalidate()
+    _notify_change()
     return True
 
 
+@_schema_retry
 def update_prediction(row_num: int, payload: dict) -> dict:
     ws = _ws()
     header, h = _header_and_map()
 
-    # Check row exists
+    if not (h.get("submission_status") and h.get("reviewer_email")):
+        return {"ok": False, "error": "required columns missing"}
+
+    # One read for the existence check, status, reviewer and edit_count
     try:
         row_vals = ws.row_values(row_num)
     except Exception:
         return {"ok": False, "error": "row not found"}
 
-    # Get submission_status and reviewer_email
-    submission_status = ""
-    reviewer_email = ""
-    if h.get("submission_status") and h.get("reviewer_email"):
-        submission_status = ws.cell(row_num, h["submission_status"]).value or ""
-        reviewer_email = ws.cell(row_num, h["reviewer_email"]).value or ""
-    else:
-        return {"ok": False, "error": "required columns missing"}
+    submission_status = _cell(row_vals, h, "submission_status")
+    reviewer_email = _cell(row_vals, h, "reviewer_email")
 
     if submission_status.strip().lower() != "submitted":
         return {"ok": False, "error": "not submitted"}
@@ -310,81 +782,170 @@ def update_prediction(row_num: int, payload: dict) -> dict:
         return {"ok": False, "error": "email mismatch"}
 
     # Update prediction fields
-    ws.update_cell(row_num, h["expert_prediction"], str(payload.get("outcome", "")))
-    ws.update_cell(row_num, h["expert_confidence"], payload.get("confidence", ""))
-    ws.update_cell(
-        row_num, h["expert_SNOT22score_prediction"], str(payload.get("snot22", ""))
+    write = (
+        RowWrite(ws, row_num, h)
+        .set("expert_prediction", str(payload.get("outcome", "")))
+        .set("expert_confidence", payload.get("confidence", ""))
+        .set("expert_SNOT22score_prediction", str(payload.get("snot22", "")))
     )
 
     # Increment edit_count
-    edit_count_val = "0"
-    if h.get("edit_count"):
-        edit_count_val = ws.cell(row_num, h["edit_count"]).value or "0"
     try:
-        edit_count = int(edit_count_val)
+        edit_count = int(_cell(row_vals, h, "edit_count") or "0")
     except Exception:
         edit_count = 0
-    edit_count += 1
     if h.get("edit_count"):
-        ws.update_cell(row_num, h["edit_count"], str(edit_count))
+        write.set("edit_count", str(edit_count + 1))
 
     # Update last_edited_at
     if h.get("last_edited_at"):
-        ws.update_cell(row_num, h["last_edited_at"], _now_iso())
+        write.set("last_edited_at", now_iso())
 
+    write.commit()
+    _PATIENTS.invalidate()
+    _notify_change()
     return {"ok": True}
 
 
 def count_patients() -> int:
     """Total number of patient rows (excluding header)."""
-    ws = _ws()
-    values = ws.get_all_values()
+    values = _patient_snapshot().values
     # subtract header
     return max(0, len(values) - 1)
 
 def all_patient_rows() -> list:
     """Return sheet row numbers (1-based) for all patients (data rows start at 2)."""
-    ws = _ws()
-    values = ws.get_all_values()
+    values = _patient_snapshot().values
     # data rows start at 2
     return list(range(2, len(values) + 1))
 
+def _submission_index(stale_ok: bool = True) -> SubmissionIndex:
+    """
+    Index over the current Submissions snapshot (rebuilt once per version).
+    Writers pass stale_ok=False so rows are never placed against a restored
+    disk snapshot.
+    """
+    global _SUB_INDEX
+    snap = _submission_snapshot(stale_ok)
+    with _SUB_INDEX_LOCK:
+        idx = _SUB_INDEX
+        if idx is None or idx.version != snap.version:
+            idx = SubmissionIndex(snap.values, snap.version)
+            if not idx.ok:
+                # ensure headers exist if missing, then index the fresh tab
+                _sub_header_and_map()
+                snap = _submission_snapshot(stale_ok)
+                idx = SubmissionIndex(snap.values, snap.version)
+            _SUB_INDEX = idx
+    return idx
+
+
+def _record_submission(idx: SubmissionIndex, record: dict, sheet_row: int, seen=None):
+    """Fold a write we just made into the cached snapshot and its index."""
+    _fold_submissions(idx, [(record, sheet_row)], seen)
+    _notify_change()
+
+
+def _fold_submissions(idx: SubmissionIndex, placed: list, seen=None):
+    """
+    Apply [(record, sheet_row)] to the cached snapshot with one copy, then to `idx`.
+
+    `seen` is idx.version when the rows were placed, for write-behind
+    placements guessed from idx.next_sheet_row: if another write moved the
+    index on since then, the guess may be wrong and the cache is dropped
+    instead. Rows written to the sheet are placed exactly (seen=None) and
+    are also replayed onto a load that is in flight, so it cannot land
+    without them.
+    """
+    global _SUB_INDEX
+    with _SUB_INDEX_LOCK:
+        snap = _SUBMISSIONS.peek()
+        if (snap is None or _SUB_INDEX is not idx or idx.version != snap.version
+                or (seen is not None and idx.version != seen)):
+            _SUBMISSIONS.invalidate()
+            return
+        rows = [(sheet_row, idx.row_values(record)) for record, sheet_row in placed]
+
+        def patch(values):
+            values = list(values)
+            for sheet_row, row_vals in rows:
+                # appends from concurrent writers can be folded out of order
+                if sheet_row - 1 > len(values):
+                    values.extend([] for _ in range(sheet_row - 1 - len(values)))
+                if sheet_row - 1 < len(values):
+                    values[sheet_row - 1] = row_vals
+                else:
+                    values.append(row_vals)
+            return values
+
+        new = _SUBMISSIONS.replace(patch(snap.values), snap.version,
+                                   patch if seen is None else None)
+        if new is None:
+            _SUB_INDEX = None
+            return
+        for record, sheet_row in placed:
+            idx.apply(record, sheet_row, new.version)
+
+
+@contextlib.contextmanager
+def _key_locks(email: str, rows):
+    """
+    Hold the upsert locks for (email, row) for each of `rows`. Stripes are
+    taken in index order so bulk upserts cannot deadlock with each other.
+    """
+    key = norm_email(email)
+    stripes = sorted({hash((key, int(r))) % len(_UPSERT_LOCKS) for r in rows})
+    with contextlib.ExitStack() as stack:
+        for i in stripes:
+            stack.enter_context(_UPSERT_LOCKS[i])
+        yield
+
+
+def _appended_row(resp):
+    """First sheet row of an append, from the values.append response (None if unknown)."""
+    from gspread.utils import a1_to_rowcol
+
+    try:
+        rng = resp["updates"]["updatedRange"]
+        return a1_to_rowcol(rng.split("!")[-1].split(":")[0])[0]
+    except (TypeError, KeyError, IndexError, ValueError, AttributeError):
+        return None
+
+
+def _checked_index(ws, h, records) -> SubmissionIndex:
+    """
+    The Submissions index, once the sheet rows it gives for `records` are
+    confirmed (with one batch_get) to still hold those (user_email,
+    patient_row) pairs. The index can be a TTL old and rows may have been
+    deleted or sorted by hand since, so an in-place write could land on
+    someone else's row; on a mismatch the tab is downloaded again.
+    """
+    idx = _submission_index(stale_ok=False)
+    hits = []
+    for rec in records:
+        hit = idx.get(rec["user_email"], rec["patient_row"])
+        if hit:
+            hits.append((hit[1], rec))
+    if not hits:
+        return idx
+    got = ws.batch_get([f"{sheet_row}:{sheet_row}" for sheet_row, _ in hits])
+    for (sheet_row, rec), rows in zip(hits, got):
+        row_vals = rows[0] if rows else []
+        if (norm_email(_cell(row_vals, h, "user_email")) != norm_email(rec["user_email"])
+                or parse_row(_cell(row_vals, h, "patient_row")) != parse_row(rec["patient_row"])):
+            _SUBMISSIONS.invalidate()
+            return _submission_index(stale_ok=False)
+    return idx
+
+
 def list_user_submission_rows(email: str) -> set:
     """
     Return a set of patient_row (ints) the given user has submitted.
-    Scans the Submissions tab.
+    Served from the Submissions index.
     """
     if not (email or "").strip():
         return set()
-    ws = _sub_ws()
-    # get_all_values is efficient enough for modest sheet sizes; avoids per-row API calls
-    values = ws.get_all_values()
-    if not values:
-        return set()
-    header = values[0] if values else []
-    # build indices
-    try:
-        i_email = header.index("user_email")
-        i_row = header.index("patient_row")
-    except ValueError:
-        # ensure headers exist if missing
-        _sub_header_and_map()
-        values = ws.get_all_values()
-        if not values:
-            return set()
-        header = values[0]
-        i_email = header.index("user_email")
-        i_row = header.index("patient_row")
-    out = set()
-    for r in values[1:]:
-        if i_email < len(r) and i_row < len(r):
-            if (r[i_email] or "").strip().lower() == (email or "").strip().lower():
-                try:
-                    out.add(int(str(r[i_row]).strip()))
-                except Exception:
-                    # ignore bad/missing row ids
-                    pass
-    return out
+    return set(_submission_index().rows_for(email))
 
 def get_submission(email: str, row: int):
     """
@@ -393,65 +954,19 @@ def get_submission(email: str, row: int):
     """
     if not (email or "").strip():
         return None
-    ws = _sub_ws()
-    values = ws.get_all_values()
-    if not values:
+    hit = _submission_index().get(email, row)
+    if not hit:
         return None
-    header = values[0]
-    try:
-        i_email = header.index("user_email")
-        i_row = header.index("patient_row")
-        i_outcome = header.index("outcome")
-        i_conf = header.index("confidence")
-        i_snot = header.index("snot22")
-    except ValueError:
-        _sub_header_and_map()
-        values = ws.get_all_values()
-        if not values:
-            return None
-        header = values[0]
-        i_email = header.index("user_email")
-        i_row = header.index("patient_row")
-        i_outcome = header.index("outcome")
-        i_conf = header.index("confidence")
-        i_snot = header.index("snot22")
-    target_email = (email or "").strip().lower()
-    target_row = int(row)
-    for rec in values[1:]:
-        if i_email < len(rec) and i_row < len(rec):
-            if (rec[i_email] or "").strip().lower() == target_email and str(rec[i_row]).strip() == str(target_row):
-                return {
-                    "outcome": (rec[i_outcome] if i_outcome < len(rec) else ""),
-                    "confidence": (rec[i_conf] if i_conf < len(rec) else ""),
-                    "snot22": (rec[i_snot] if i_snot < len(rec) else ""),
-                }
-    return None
+    rec = hit[0]
+    return {
+        "outcome": rec.get("outcome", ""),
+        "confidence": rec.get("confidence", ""),
+        "snot22": rec.get("snot22", ""),
+    }
 
-def upsert_submission(email: str, name: str, row: int, payload: dict):
-    """
-    Insert or update a submission identified by (user_email, patient_row).
-    payload expects keys: outcome, confidence, snot22
-    """
-    ws = _sub_ws()
-    header, h = _sub_header_and_map()
-    # scan for existing
-    data = ws.get_all_values()
-    found_idx = None  # 1-based sheet row index of existing submission
-    if len(data) > 1:
-        # build quick indices
-        name_to_idx = {name.strip(): i for i, name in enumerate(data[0])}
-        i_email = name_to_idx.get("user_email")
-        i_row = name_to_idx.get("patient_row")
-        if i_email is not None and i_row is not None:
-            for i in range(1, len(data)):
-                rec = data[i]
-                if i_email < len(rec) and i_row < len(rec):
-                    if (rec[i_email] or "").strip().lower() == (email or "").strip().lower() and str(rec[i_row]).strip() == str(row):
-                        found_idx = i + 1  # +1 for header row to get sheet row number
-                        break
-    ts = _now_iso()
+def _submission_record(email: str, name: str, row, payload: dict, ts: str) -> dict:
     # Ensure string values
-    out = {
+    return {
         "timestamp": ts,
         "user_email": email or "",
         "user_name": name or "",
@@ -460,45 +975,288 @@ def upsert_submission(email: str, name: str, row: int, payload: dict):
         "confidence": str(payload.get("confidence", "")),
         "snot22": str(payload.get("snot22", "")),
     }
-    if found_idx:
+
+
+@_schema_retry
+def upsert_submission(email: str, name: str, row: int, payload: dict):
+    """
+    Insert or update a submission identified by (user_email, patient_row).
+    payload expects keys: outcome, confidence, snot22
+    """
+    out = _submission_record(email, name, row, payload, now_iso())
+    with _key_locks(email, [row]):
+        _upsert_locked(email, row, out)
+
+
+def _upsert_locked(email: str, row: int, out: dict):
+    # caller holds the upsert lock for (email, row)
+    if _WRITE_BEHIND:
+        # journal durably, show it locally now, write to Sheets later
+        _WRITE_BEHIND.submit(_journal_key(out), out)
+        idx = _submission_index(stale_ok=False)
+        seen = idx.version
+        hit = idx.get(email, row)
+        if hit:
+            _record_submission(idx, dict(hit[0], **out), hit[1], seen)
+        else:
+            _record_submission(idx, out, idx.next_sheet_row, seen)
+        return
+
+    ws = _sub_ws()
+    header, h = _sub_header_and_map()
+    idx = _checked_index(ws, h, [out])
+    hit = idx.get(email, row)
+    if hit:
         # update in place
         # write only the columns we know about to avoid clobbering future extras
+        found_idx = hit[1]
+        write = RowWrite(ws, found_idx, h)
         for key in SUB_REQUIRED_COLS:
-            col = h.get(key)
-            if col:
-                ws.update_cell(found_idx, col, out[key])
+            if h.get(key):
+                write.set(key, out[key])
+        write.commit()
+        record = dict(hit[0], **out)
     else:
-        # append as a new row preserving header order
+        # append as a new row preserving header order; other reviewers (in
+        # this or another worker) may be appending too, so take the row
+        # from the response rather than idx.next_sheet_row
         row_vals = [out.get(col, "") for col in header]
-        ws.append_row(row_vals, value_input_option="USER_ENTERED")
+        found_idx = _appended_row(ws.append_row(row_vals, value_input_option="USER_ENTERED"))
+        record = out
+    if found_idx is None:
+        # no idea where the row went: re-read rather than index a guess
+        _SUBMISSIONS.invalidate()
+        _notify_change()
+        return
+    _record_submission(idx, record, found_idx)
+
+
+def upsert_submissions_bulk(email: str, name: str, items: list) -> int:
+    """
+    Insert or update many of one reviewer's submissions at once (e.g. a
+    session synced from an offline client). items: [{row, outcome,
+    confidence, snot22}, ...]; a later item for the same row wins. Rows
+    are resolved against one Submissions snapshot and written with at most
+    one batch_update and one append_rows. Returns the number of rows written.
+    """
+    ts = now_iso()
+    records = [_submission_record(email, name, int(it["row"]), it, ts) for it in items]
+    if not records:
+        return 0
+    with _key_locks(email, [r["patient_row"] for r in records]):
+        if _WRITE_BEHIND:
+            idx = _submission_index(stale_ok=False)
+            seen = idx.version
+            _WRITE_BEHIND.submit_many([(_journal_key(r), r) for r in records])
+            placed = _place_submissions(idx, records)
+            _fold_submissions(idx, placed, seen)
+        else:
+            ws = _sub_ws()
+            idx = _checked_index(ws, _sub_header_and_map()[1], records)
+            placed, exact = _write_submissions(records, idx, with_exact=True)
+            if exact:
+                _fold_submissions(idx, placed)
+            else:
+                # no idea where the appended rows went: re-read rather
+                # than index guesses
+                _SUBMISSIONS.invalidate()
+    _notify_change()
+    return len(placed)
+
+
+# ---- write-behind ----
+def _journal_key(record: dict) -> str:
+    return f"{norm_email(record.get('user_email'))}|{record.get('patient_row')}"
+
+
+def _overlay_pending(values: list, records: list) -> list:
+    """Apply journaled-but-unflushed records on top of downloaded values."""
+    if not records:
+        return values
+    values = list(values)
+    idx = SubmissionIndex(values, 0)
+    for rec in records:
+        hit = idx.get(rec.get("user_email"), rec.get("patient_row"))
+        merged = dict(hit[0], **rec) if hit else rec
+        sheet_row = hit[1] if hit else idx.next_sheet_row
+        if sheet_row - 1 < len(values):
+            values[sheet_row - 1] = idx.row_values(merged)
+        else:
+            values.append(idx.row_values(merged))
+        idx.apply(merged, sheet_row, 0)
+    return values
+
+
+def _place_submissions(idx: SubmissionIndex, records: list) -> list:
+    """
+    Resolve records against `idx` without changing it: [(merged record,
+    sheet row)], latest record per (user_email, patient_row), new pairs
+    numbered from idx.next_sheet_row in order.
+    """
+    latest = {}
+    for rec in records:
+        key = _journal_key(rec)
+        latest.pop(key, None)
+        latest[key] = rec
+    placed = []
+    next_row = idx.next_sheet_row
+    for rec in latest.values():
+        hit = idx.get(rec.get("user_email"), rec.get("patient_row"))
+        if hit:
+            placed.append((dict(hit[0], **rec), hit[1]))
+        else:
+            placed.append((rec, next_row))
+            next_row += 1
+    return placed
+
+
+@_schema_retry
+def _write_submissions(records: list, idx: SubmissionIndex | None = None,
+                       with_exact: bool = False):
+    """
+    Write many submission records to the Submissions tab: existing
+    (user_email, patient_row) pairs are updated with one batch_update and
+    new ones added with one append_rows. Resolves against `idx`, or a fresh
+    read if none is given. Returns the placements (see _place_submissions),
+    with appended rows renumbered from the append response; with_exact=True
+    returns (placements, whether every row number is known for sure).
+    """
+    ws = _sub_ws()
+    header, h = _sub_header_and_map()
+    if idx is None:
+        idx = SubmissionIndex(ws.get_all_values(), 0)
+    placed = _place_submissions(idx, records)
+    ranges = []
+    appends = []
+    for i, (rec, sheet_row) in enumerate(placed):
+        if sheet_row < idx.next_sheet_row:
+            write = RowWrite(ws, sheet_row, h)
+            for key in SUB_REQUIRED_COLS:
+                if h.get(key) and key in rec:
+                    write.set(key, rec[key])
+            ranges.extend(write.ranges())
+        else:
+            appends.append(i)
+    if ranges:
+        ws.batch_update(ranges, value_input_option="USER_ENTERED")
+    exact = True
+    if appends:
+        try:
+            resp = ws.append_rows([[placed[i][0].get(col, "") for col in header] for i in appends],
+                                  value_input_option="USER_ENTERED")
+        except Exception:
+            # the updates above (and maybe the append) reached the sheet but
+            # won't be folded in: don't keep serving the old values
+            _SUBMISSIONS.invalidate()
+            raise
+        first = _appended_row(resp)
+        if first is None:
+            exact = False
+        else:
+            for n, i in enumerate(appends):
+                placed[i] = (placed[i][0], first + n)
+    return (placed, exact) if with_exact else placed
+
+
+_WRITE_BEHIND = None
+if WRITE_BEHIND:
+    _WRITE_BEHIND = WriteBehind(
+        Journal(JOURNAL_PATH), _write_submissions, on_flushed=_SUBMISSIONS.invalidate
+    )
+
+
+def start_background():
+    """Start the enabled background workers (write-behind replay, Drive watcher)."""
+    if _WRITE_BEHIND:
+        _WRITE_BEHIND.start()
+    _WATCHER.start()
 
 def next_unsubmitted_row(email: str, after: int | None = None):
     """
     Return the next patient row that the user has not submitted yet.
     If 'after' is provided, start searching after that row (wrap around).
     """
-    rows = all_patient_rows()
-    if not rows:
-        return None
-    done = list_user_submission_rows(email)
-    # rotate starting index
-    start_idx = 0
-    if after in rows:
-        start_idx = (rows.index(after) + 1) % len(rows)
-    n = len(rows)
-    for i in range(n):
-        idx = (start_idx + i) % n
-        r = rows[idx]
-        if r not in done:
-            return r
-    return None
+    last_row = len(_patient_snapshot().values)
+    return _submission_index().next_remaining(email, last_row, after)
+
+
+def progress_metrics() -> dict:
+    """
+    Study-wide progress: users started/completed, total patients,
+    per-patient review counts and per-reviewer completion.
+    """
+    last_row = len(_patient_snapshot().values)
+    return _submission_index().metrics(last_row)
+
+
+def iter_csv(source: str = "patients"):
+    """
+    CSV export as an iterator of text chunks, taken from one snapshot.
+    source: "patients", "submissions", or "joined" (submissions hash-joined
+    onto patient rows, one line per submission).
+    """
+    if source == "patients":
+        rows = _patient_snapshot().values
+    elif source == "submissions":
+        rows = _submission_snapshot().values
+    elif source == "joined":
+        values = _patient_snapshot().values
+        hits = sorted(_submission_index().by_key.items(), key=lambda kv: kv[1][1])
+        by_row = {}
+        for (_email, row), (rec, _sheet_row) in hits:
+            by_row.setdefault(row, []).append(rec)
+        header = values[0] if values else []
+        rows = joined_rows(header, enumerate(values.rows(1), start=2), by_row)
+    else:
+        raise ValueError(f"unknown csv source: {source!r}")
+    return csv_chunks(rows)
+
+
+def last_modified() -> float:
+    """Wall-clock time (epoch seconds) the current data version was observed."""
+    return max(_patient_snapshot().created, _submission_snapshot().created)
+
+
+def workspace(email: str, after: int | None = None, timings: dict | None = None) -> dict:
+    """
+    Everything the reviewer UI needs to show the next patient, computed from
+    one pair of snapshots: next row, patient record, my submission, my
+    progress and study metrics. If `timings` is given, per-phase durations
+    (ms) are recorded in it.
+    """
+    t0 = time.perf_counter()
+    psnap = _patient_snapshot()
+    values = psnap.values
+    idx = _submission_index()
+    ssnap = _SUBMISSIONS.peek()
+    if ssnap is None or ssnap.version != idx.version:
+        ssnap = None
+    t1 = time.perf_counter()
+
+    last_row = len(values)
+    nxt = idx.next_remaining(email, last_row, after)
+    my = None
+    if nxt is not None and (email or "").strip():
+        hit = idx.get(email, nxt)
+        if hit:
+            my = {k: hit[0].get(k, "") for k in ("outcome", "confidence", "snot22")}
+    out = {
+        "row": nxt,
+        "complete": nxt is None,
+        "record": _cached_record(psnap, nxt) if nxt is not None else None,
+        "my_submission": my,
+        "progress": _progress(idx, last_row, email),
+        "metrics": idx.metrics(last_row),
+        "version": (
+            _version_token(psnap, ssnap) if ssnap
+            else f"{_PROCESS_TAG}.{psnap.version}.{idx.version}"
+        ),
+    }
+    if timings is not None:
+        timings["snapshot"] = (t1 - t0) * 1000
+        timings["compute"] = (time.perf_counter() - t1) * 1000
+    return out
 
 
 def get_csv() -> str:
-    ws = _ws()
-    data = ws.get_all_values()
-    buf = io.StringIO()
-    writer = csv.writer(buf)
-    for row in data:
-        writer.writerow(row)
-    return buf.getvalue()
\ No newline at end of file
+    return "".join(iter_csv("patients"))
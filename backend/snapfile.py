@@ -0,0 +1,123 @@
+"""
+On-disk copy of the last known snapshots (SHEETS_SNAPSHOT_PATH), so a
+restarted process can answer reads before it has talked to Google.
+
+Layout: MAGIC, a 4-byte length and a JSON header (spreadsheet id, save
+time, header rows, and per tab its blob size, creation time and CRC32),
+then each tab as a ColumnarSheet.dumps() blob. Files are written to a
+temporary name and renamed into place, so a reader never sees half a file.
+Anything unexpected on load (other spreadsheet, bad checksum, old format)
+just means there is nothing to restore.
+"""
+import json
+import os
+import threading
+import time
+import zlib
+
+from columnar import ColumnarSheet
+
+MAGIC = b"expert-survey-snapshot/1\n"
+
+
+def save(path: str, sheet_id: str, tabs: dict, headers: dict):
+    """
+    tabs: {tab name: (values, created)} where values is a list of rows or a
+    ColumnarSheet and created is its wall-clock time; headers: {tab: row 1}.
+    """
+    blobs = []
+    meta = {}
+    for name, (values, created) in tabs.items():
+        sheet = values if isinstance(values, ColumnarSheet) else ColumnarSheet(values)
+        blob = sheet.dumps()
+        blobs.append(blob)
+        meta[name] = {"size": len(blob), "created": created, "crc": zlib.crc32(blob)}
+    head = json.dumps(
+        {"sheet_id": sheet_id, "saved": time.time(), "headers": headers, "tabs": meta}
+    ).encode()
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(head).to_bytes(4, "big"))
+        f.write(head)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp, path)
+
+
+def load(path: str, sheet_id: str):
+    """
+    {"saved", "headers", "tabs": {name: (ColumnarSheet, created)}} from
+    `path`, or None if there is no usable snapshot of `sheet_id` there.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    try:
+        if not data.startswith(MAGIC):
+            return None
+        pos = len(MAGIC)
+        k = int.from_bytes(data[pos:pos + 4], "big")
+        head = json.loads(data[pos + 4:pos + 4 + k])
+        if head.get("sheet_id") != sheet_id:
+            return None
+        pos += 4 + k
+        view = memoryview(data)
+        tabs = {}
+        for name, m in head["tabs"].items():
+            blob = view[pos:pos + m["size"]]
+            pos += m["size"]
+            if zlib.crc32(blob) != m["crc"]:
+                return None
+            tabs[name] = (ColumnarSheet.loads(blob), m["created"])
+    except (ValueError, KeyError, TypeError) as e:
+        print("ignoring unreadable snapshot file:", e)
+        return None
+    return {"saved": head["saved"], "headers": head["headers"], "tabs": tabs}
+
+
+class Saver:
+    """
+    Calls save(path, **collect()) on a background thread at most once per
+    `delay` seconds after touch(). collect() returns None when there is
+    nothing complete to write yet.
+    """
+
+    def __init__(self, path: str, collect, delay: float = 5.0):
+        self.path = path
+        self.delay = delay
+        self._collect = collect
+        self._pending = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def touch(self):
+        self._pending.set()
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="snapshot-saver", daemon=True
+                    )
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            self._pending.wait()
+            time.sleep(self.delay)  # let both tabs (and bursts of writes) land
+            self._pending.clear()
+            try:
+                self.save_now()
+            except Exception as e:
+                print("snapshot save failed:", e)
+
+    def save_now(self) -> bool:
+        """Write the current state now; False if there was nothing to write."""
+        with self._lock:
+            state = self._collect()
+            if state is None:
+                return False
+            save(self.path, **state)
+            return True
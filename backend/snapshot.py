@@ -0,0 +1,209 @@
+import itertools
+import threading
+import time
+
+# Every snapshot taken in this process gets a unique, increasing version so
+# derived views (indexes, aggregates, response bodies) can key off it.
+_VERSIONS = itertools.count(1)
+
+
+def next_version() -> int:
+    return next(_VERSIONS)
+
+
+class Snapshot:
+    """Immutable view of one worksheet's values at a point in time."""
+
+    __slots__ = ("values", "version", "fetched_at", "created", "origin", "gen")
+
+    def __init__(self, values, version, fetched_at, created=None, origin=None, gen=None):
+        self.values = values
+        self.version = version
+        self.fetched_at = fetched_at  # monotonic, for TTL
+        self.created = created or time.time()  # wall clock, for Last-Modified
+        self.origin = origin  # shared-store seq (same in every worker), if any
+        self.gen = gen  # shared-store generation this copy belongs to
+
+
+class SnapshotCache:
+    """
+    Read-through cache around a zero-arg loader (e.g. ws.get_all_values).
+
+    - Entries expire after `ttl` seconds (ttl <= 0 disables caching).
+    - Refresh is single-flight: concurrent callers wait for one fetch.
+    - invalidate() drops the current entry; a fetch that was already in
+      flight when invalidate() ran is handed to its callers but not reused.
+    - With a `shared` store (see sharedcache.py) under `key`, loads go
+      through it so one process downloads per data version, and a local
+      entry is only reused while its generation is still the shared one.
+    - `transform`, if given, converts loaded values to the form kept in
+      memory (e.g. columnar.ColumnarSheet); the shared store holds the raw
+      rows.
+    - restore() seeds the cache with a copy saved by an earlier process;
+      until the first real load lands, get() serves it and revalidates in
+      the background (get(stale_ok=False) waits for the real load).
+    """
+
+    def __init__(self, loader, ttl: float, shared=None, key: str = "", transform=None):
+        self._loader = loader
+        self._transform = transform
+        self.ttl = ttl
+        self._shared = shared if ttl > 0 else None
+        self._key = key
+        self._cond = threading.Condition()
+        self._snap = None
+        self._loading = False
+        self._gen = 0
+        self._restored = False
+        self._patches = []  # replace() patches made while a load is in flight
+
+    def _fresh(self, snap):
+        if snap is None:
+            return False
+        if self.ttl <= 0:
+            return False
+        return time.monotonic() - snap.fetched_at < self.ttl
+
+    def peek(self):
+        """Return the current snapshot (possibly stale) without fetching."""
+        return self._snap
+
+    def get(self, stale_ok: bool = True) -> Snapshot:
+        shared_gen = self._shared.generation(self._key) if self._shared else None
+        with self._cond:
+            while True:
+                snap = self._snap
+                if self._fresh(snap) and (shared_gen is None or snap.gen == shared_gen):
+                    return snap
+                if self._restored and stale_ok:
+                    if not self._loading:
+                        threading.Thread(
+                            target=self._revalidate, args=(self._start_load(),), daemon=True
+                        ).start()
+                    return snap
+                if not self._loading:
+                    gen = self._start_load()
+                    break
+                self._cond.wait()
+        return self._load(gen)
+
+    def restore(self, values, created: float) -> bool:
+        """
+        Install `values` (already in the in-memory form) saved by an earlier
+        process, created at wall-clock `created`. Only fills an empty cache;
+        returns whether it did.
+        """
+        with self._cond:
+            if self._snap is not None or self.ttl <= 0:
+                return False
+            self._snap = Snapshot(values, next_version(), float("-inf"), created)
+            self._restored = True
+            return True
+
+    def _revalidate(self, gen):
+        try:
+            self._load(gen)
+        except Exception as e:
+            print("background refresh of restored snapshot failed:", e)
+
+    def refresh_ahead(self, fraction: float = 0.75):
+        """
+        Refetch now (in the caller's thread) if the entry is older than
+        `fraction` of the TTL, so readers never block on an expired entry.
+        Readers keep getting the current snapshot meanwhile.
+        """
+        with self._cond:
+            snap = self._snap
+            if snap is None or self._loading or self.ttl <= 0:
+                return
+            if time.monotonic() - snap.fetched_at < self.ttl * fraction:
+                return
+            gen = self._start_load()
+        self._load(gen, self.ttl * fraction)
+
+    def _start_load(self) -> int:
+        # caller holds self._cond
+        self._loading = True
+        self._patches = []
+        return self._gen
+
+    def _load(self, gen, max_age=None) -> Snapshot:
+        try:
+            if self._shared:
+                e = self._shared.fetch(self._key, self._loader, max_age or self.ttl)
+                age = max(0.0, time.time() - e.fetched)
+                raw = e.values
+                snap = Snapshot(self._convert(raw), next_version(), time.monotonic() - age,
+                                e.modified, e.seq, e.gen)
+            else:
+                raw = self._loader()
+                snap = Snapshot(self._convert(raw), next_version(), time.monotonic())
+        except BaseException:
+            with self._cond:
+                self._loading = False
+                self._cond.notify_all()
+            raise
+
+        with self._cond:
+            self._loading = False
+            if gen == self._gen and self.ttl > 0:
+                if self._patches:
+                    # local writes made while this load was in flight may
+                    # not be in it; replay them so they aren't lost
+                    for patch in self._patches:
+                        raw = patch(raw)
+                    snap = Snapshot(self._convert(raw), snap.version, snap.fetched_at,
+                                    snap.created, None, snap.gen)
+                self._snap = snap
+                self._restored = False
+            self._patches = []
+            self._cond.notify_all()
+        return snap
+
+    def _convert(self, values):
+        return self._transform(values) if self._transform else values
+
+    def replace(self, values, base_version, patch=None):
+        """
+        Swap in locally-patched `values` (raw rows, as the loader returns
+        them) as a new version of the snapshot
+        that had `base_version`. Returns the new Snapshot, or None if the
+        cache moved on meanwhile (the entry is then dropped instead).
+        `patch(raw) -> raw` makes the same change to other rows; if a load
+        is in flight it is replayed on that load's result before it lands.
+        """
+        with self._cond:
+            cur = self._snap
+            if cur is None or cur.version != base_version:
+                self._gen += 1
+                self._snap = None
+                self._restored = False
+                if self._shared:
+                    self._shared.invalidate(self._key)
+                return None
+            e = None
+            if self._shared and cur.gen is not None:
+                age = max(0.0, time.monotonic() - cur.fetched_at)
+                e = self._shared.publish(self._key, values, cur.gen, time.time() - age)
+            elif self._shared:
+                self._shared.invalidate(self._key)
+            if patch is not None and self._loading:
+                self._patches.append(patch)
+            values = self._convert(values)
+            if e is not None:
+                snap = Snapshot(values, next_version(), cur.fetched_at, e.modified, e.seq, e.gen)
+            else:
+                # not shared (or another worker got there first): keep it
+                # local; with a store, the next get() reloads the shared copy
+                snap = Snapshot(values, next_version(), cur.fetched_at)
+            self._snap = snap
+            return snap
+
+    def invalidate(self, token=None):
+        """Drop the entry here and, with a shared store, in every worker."""
+        with self._cond:
+            self._gen += 1
+            self._snap = None
+            self._restored = False
+        if self._shared:
+            self._shared.invalidate(self._key, token)
@@ -0,0 +1,321 @@
+"""
+Local SQLite backend (WAL mode) implementing the same API as the Google
+Sheets functions. Used for local development and hermetic load tests.
+
+Seed it from a CSV export of the patient sheet:
+
+    python sqlite_store.py import patients.csv
+"""
+import csv
+import itertools
+import json
+import sys
+import time
+
+from csvstream import csv_chunks, joined_rows
+from schema import REQUIRED_COLS, SUB_REQUIRED_COLS, TRUE_VALUES, now_iso, patient_status, val_bool
+from sqlitedb import ThreadConnections
+from storage import Storage, SQLITE_PATH
+from subindex import norm_email
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS columns (
+    pos INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS patients (
+    row INTEGER PRIMARY KEY,          -- sheet row number (data starts at 2)
+    data TEXT NOT NULL                -- JSON object: column name -> value
+);
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    user_email TEXT NOT NULL,
+    email_norm TEXT NOT NULL,
+    user_name TEXT NOT NULL,
+    patient_row INTEGER NOT NULL,
+    outcome TEXT NOT NULL,
+    confidence TEXT NOT NULL,
+    snot22 TEXT NOT NULL,
+    UNIQUE (email_norm, patient_row)
+);
+CREATE INDEX IF NOT EXISTS submissions_by_row ON submissions (patient_row);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('modified', 0);
+"""
+
+_TRUE_SQL = ", ".join(f"'{v}'" for v in TRUE_VALUES)
+
+
+class SQLiteStorage(Storage):
+    def __init__(self, path: str = SQLITE_PATH):
+        super().__init__()
+        self.path = path
+        self._db = ThreadConnections(path, schema=_SCHEMA)
+
+    def _bump(self, db):
+        """Advance the data version; call inside every write transaction."""
+        db.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+        db.execute("UPDATE meta SET value = ? WHERE key = 'modified'", (int(time.time()),))
+
+    def data_version(self):
+        r = self._db().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return str(r[0])
+
+    def last_modified(self):
+        r = self._db().execute("SELECT value FROM meta WHERE key = 'modified'").fetchone()
+        return float(r[0])
+
+    # ---- patients ----
+    def header(self) -> list:
+        return [r[0] for r in self._db().execute("SELECT name FROM columns ORDER BY pos")]
+
+    def import_patients(self, values: list):
+        """Replace the patient table with get_all_values()-style rows (header first)."""
+        header = [h.strip() for h in values[0]] if values else []
+        header += [c for c in REQUIRED_COLS if c not in header]
+        db = self._db()
+        with db:
+            db.execute("DELETE FROM columns")
+            db.execute("DELETE FROM patients")
+            db.executemany(
+                "INSERT INTO columns (pos, name) VALUES (?, ?)",
+                [(i, name) for i, name in enumerate(header) if name],
+            )
+            db.executemany(
+                "INSERT INTO patients (row, data) VALUES (?, ?)",
+                [
+                    (r_idx, json.dumps(dict(zip(header, vals))))
+                    for r_idx, vals in enumerate(values[1:], start=2)
+                ],
+            )
+            self._bump(db)
+        self._notify_change()
+
+    def _patient_data(self, row_num: int) -> dict:
+        r = self._db().execute("SELECT data FROM patients WHERE row = ?", (row_num,)).fetchone()
+        return json.loads(r[0]) if r else {}
+
+    def count_patients(self):
+        return self._db().execute("SELECT COUNT(*) FROM patients").fetchone()[0]
+
+    def _status(self, row, d, current_user_email) -> dict:
+        me = current_user_email or ""
+        reviewer = norm_email(d.get("reviewer_email"))
+        return patient_status(row, val_bool(d.get("submission_status", "")),
+                              d.get("claimed_by") or "", d.get("claimed_at") or "",
+                              reviewer == norm_email(me), me)
+
+    def list_patients(self, current_user_email=None):
+        return self.page_patients(current_user_email)["patients"]
+
+    def page_patients(self, current_user_email=None, offset=0, limit=None, fields=None,
+                      status=None):
+        where, args = "1", []
+        if status in ("submitted", "pending"):
+            # any reviewer's submission, or the legacy submission_status column
+            where = (
+                "(row IN (SELECT patient_row FROM submissions)"
+                " OR lower(trim(coalesce(json_extract(data, '$.submission_status'), '')))"
+                f" IN ({_TRUE_SQL}))"
+            )
+            if status == "pending":
+                where = f"NOT {where}"
+        elif status == "mine":
+            where = "row IN (SELECT patient_row FROM submissions WHERE email_norm = ?)"
+            args = [norm_email(current_user_email)]
+        db = self._db()
+        total = db.execute(f"SELECT COUNT(*) FROM patients WHERE {where}", args).fetchone()[0]
+        cur = db.execute(
+            f"SELECT row, data FROM patients WHERE {where} ORDER BY row LIMIT ? OFFSET ?",
+            args + [-1 if limit is None else limit, offset],
+        )
+        out = []
+        for row, data in cur:
+            item = self._status(row, json.loads(data), current_user_email)
+            if fields:
+                item = {k: v for k, v in item.items() if k == "row" or k in fields}
+            out.append(item)
+        end = offset + len(out)
+        return {
+            "patients": out,
+            "total": total,
+            "offset": offset,
+            # None unless this page moved forward, so following it always ends
+        "next_cursor": end if offset < end < total else None,
+        }
+
+    def get_patient(self, row_num):
+        data = self._patient_data(row_num)
+        record = {k: v for k, v in data.items() if v != ""}
+        record["submitted"] = val_bool(record.get("submission_status", ""))
+        return {"row": row_num, "record": record}
+
+    def update_prediction(self, row_num, payload):
+        db = self._db()
+        with db:
+            r = db.execute("SELECT data FROM patients WHERE row = ?", (row_num,)).fetchone()
+            if not r:
+                return {"ok": False, "error": "row not found"}
+            d = json.loads(r[0])
+            if (d.get("submission_status") or "").strip().lower() != "submitted":
+                return {"ok": False, "error": "not submitted"}
+            if norm_email(d.get("reviewer_email")) != norm_email(payload.get("email")):
+                return {"ok": False, "error": "email mismatch"}
+            try:
+                edit_count = int(d.get("edit_count") or "0")
+            except Exception:
+                edit_count = 0
+            d.update(
+                expert_prediction=str(payload.get("outcome", "")),
+                expert_confidence=str(payload.get("confidence", "")),
+                expert_SNOT22score_prediction=str(payload.get("snot22", "")),
+                edit_count=str(edit_count + 1),
+                last_edited_at=now_iso(),
+            )
+            db.execute("UPDATE patients SET data = ? WHERE row = ?", (json.dumps(d), row_num))
+            self._bump(db)
+        self._notify_change()
+        return {"ok": True}
+
+    # ---- submissions ----
+    def list_user_submission_rows(self, email):
+        if not (email or "").strip():
+            return set()
+        cur = self._db().execute(
+            "SELECT patient_row FROM submissions WHERE email_norm = ?", (norm_email(email),)
+        )
+        return {r[0] for r in cur}
+
+    def get_submission(self, email, row):
+        if not (email or "").strip():
+            return None
+        r = self._db().execute(
+            "SELECT outcome, confidence, snot22 FROM submissions"
+            " WHERE email_norm = ? AND patient_row = ?",
+            (norm_email(email), int(row)),
+        ).fetchone()
+        if not r:
+            return None
+        return {"outcome": r[0], "confidence": r[1], "snot22": r[2]}
+
+    _UPSERT_SQL = (
+        "INSERT INTO submissions"
+        " (timestamp, user_email, email_norm, user_name, patient_row, outcome, confidence, snot22)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+        " ON CONFLICT (email_norm, patient_row) DO UPDATE SET"
+        " timestamp = excluded.timestamp, user_email = excluded.user_email,"
+        " user_name = excluded.user_name, outcome = excluded.outcome,"
+        " confidence = excluded.confidence, snot22 = excluded.snot22"
+    )
+
+    @staticmethod
+    def _submission_params(ts, email, name, row, payload):
+        return (
+            ts,
+            email or "",
+            norm_email(email),
+            name or "",
+            int(row),
+            str(payload.get("outcome", "")),
+            str(payload.get("confidence", "")),
+            str(payload.get("snot22", "")),
+        )
+
+    def upsert_submission(self, email, name, row, payload):
+        db = self._db()
+        with db:
+            db.execute(self._UPSERT_SQL, self._submission_params(now_iso(), email, name, row, payload))
+            self._bump(db)
+        self._notify_change()
+
+    def upsert_submissions_bulk(self, email, name, items):
+        ts = now_iso()
+        params = [self._submission_params(ts, email, name, it["row"], it) for it in items]
+        if not params:
+            return 0
+        db = self._db()
+        with db:
+            # later items for the same row overwrite earlier ones via ON CONFLICT
+            db.executemany(self._UPSERT_SQL, params)
+            self._bump(db)
+        self._notify_change()
+        return len({p[4] for p in params})
+
+    def next_unsubmitted_row(self, email, after=None):
+        q = (
+            "SELECT row FROM patients WHERE row > ? AND row NOT IN"
+            " (SELECT patient_row FROM submissions WHERE email_norm = ?)"
+            " ORDER BY row LIMIT 1"
+        )
+        db = self._db()
+        e = norm_email(email)
+        r = None
+        if after is not None:
+            r = db.execute(q, (after, e)).fetchone()
+        if r is None:
+            # wrap around to the first row
+            r = db.execute(q, (1, e)).fetchone()
+        return r[0] if r else None
+
+    def progress_metrics(self):
+        db = self._db()
+        total = self.count_patients()
+        in_range = "patient_row IN (SELECT row FROM patients)"
+        reviewers = [
+            {"email": email, "name": name or "", "completed": done, "remaining": total - done}
+            for email, name, done in db.execute(
+                "SELECT email_norm, MAX(user_name), COUNT(*) FROM submissions"
+                f" WHERE {in_range} GROUP BY email_norm ORDER BY COUNT(*) DESC, email_norm"
+            )
+        ]
+        reviews = db.execute(
+            "SELECT patient_row, COUNT(*) FROM submissions"
+            f" WHERE {in_range} GROUP BY patient_row ORDER BY patient_row"
+        ).fetchall()
+        return {
+            "users_started": len(reviewers),
+            "users_completed": sum(1 for r in reviewers if total and r["remaining"] == 0),
+            "total_patients": total,
+            "total_submissions": sum(r["completed"] for r in reviewers),
+            "reviews_per_patient": {str(row): n for row, n in reviews},
+            "reviewers": reviewers,
+        }
+
+    def _patient_rows(self, header):
+        for row, data in self._db().execute("SELECT row, data FROM patients ORDER BY row"):
+            d = json.loads(data)
+            yield row, [d.get(name, "") for name in header]
+
+    def iter_csv(self, source="patients"):
+        db = self._db()
+        if source == "patients":
+            header = self.header()
+            rows = itertools.chain([header], (vals for _, vals in self._patient_rows(header)))
+        elif source == "submissions":
+            rows = itertools.chain(
+                [SUB_REQUIRED_COLS],
+                db.execute(f"SELECT {', '.join(SUB_REQUIRED_COLS)} FROM submissions ORDER BY id"),
+            )
+        elif source == "joined":
+            header = self.header()
+            by_row = {}
+            for rec in db.execute(f"SELECT {', '.join(SUB_REQUIRED_COLS)} FROM submissions ORDER BY id"):
+                rec = dict(zip(SUB_REQUIRED_COLS, rec))
+                by_row.setdefault(rec["patient_row"], []).append(rec)
+            rows = joined_rows(header, self._patient_rows(header), by_row)
+        else:
+            raise ValueError(f"unknown csv source: {source!r}")
+        return csv_chunks(rows)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "import":
+        sys.exit("usage: python sqlite_store.py import patients.csv")
+    with open(sys.argv[2], newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    SQLiteStorage(SQLITE_PATH).import_patients(rows)
+    print(f"imported {max(0, len(rows) - 1)} patients into {SQLITE_PATH}")
@@ -0,0 +1,34 @@
+"""
+Per-thread SQLite connections in WAL mode, shared by the write-behind
+journal, the SQLite session store and the SQLite storage backend.
+"""
+import sqlite3
+import threading
+
+
+class ThreadConnections:
+    """
+    Call to get this thread's connection to `path` (sqlite3 connections
+    are not shareable across threads). Every connection uses WAL with the
+    given `synchronous` level; `schema`, if given, is run once up front.
+    """
+
+    def __init__(self, path: str, synchronous: str = "NORMAL", isolation_level="",
+                 schema: str | None = None):
+        self.path = path
+        self.synchronous = synchronous
+        self.isolation_level = isolation_level
+        self._local = threading.local()
+        if schema:
+            db = self()
+            db.executescript(schema)
+            db.commit()
+
+    def __call__(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=self.isolation_level)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(f"PRAGMA synchronous={self.synchronous}")
+            self._local.db = db
+        return db
@@ -0,0 +1,281 @@
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+
+# Which engine app.py talks to: "sheets" (Google Sheets, default) or "sqlite".
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "sheets").strip().lower()
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "expert_survey.db")
+
+
+def public_metrics(metrics: dict, email: str | None = None) -> dict:
+    """
+    progress_metrics() as sent to a client. Anonymous callers get only the
+    aggregates; a signed-in reviewer also gets the per-reviewer list, with
+    names and counts but no email addresses (their own entry is marked
+    "me").
+    """
+    out = {k: v for k, v in metrics.items() if k != "reviewers"}
+    if email and "reviewers" in metrics:
+        me = (email or "").strip().lower()
+        out["reviewers"] = [
+            dict({k: v for k, v in r.items() if k != "email"}, me=r.get("email") == me)
+            for r in metrics["reviewers"]
+        ]
+    return out
+
+
+class Storage(ABC):
+    """
+    The persistence API app.py uses. Every backend implements all of it and
+    returns the same shapes the Google Sheets functions always have.
+    """
+
+    def __init__(self):
+        self._listeners = []
+
+    @abstractmethod
+    def count_patients(self) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_patients(self, current_user_email=None) -> list:
+        raise NotImplementedError
+
+    @abstractmethod
+    def page_patients(self, current_user_email=None, offset=0, limit=None, fields=None,
+                      status=None) -> dict:
+        """{patients, total, offset, next_cursor}; see sheets.page_patients."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_patient(self, row_num: int) -> dict:
+        raise NotImplementedError
+
+    def patient_entry(self, row_num: int):
+        """
+        (validator, build) for one patient: validator is a string that
+        changes whenever get_patient(row_num) may have, and build() returns
+        that record. Backends that can tell rows apart override this so an
+        edit to one row leaves the others' validators alone.
+        """
+        return self.data_version(), lambda: self.get_patient(row_num)
+
+    @abstractmethod
+    def update_prediction(self, row_num: int, payload: dict) -> dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_user_submission_rows(self, email: str) -> set:
+        raise NotImplementedError
+
+    def user_progress(self, email: str) -> dict:
+        """{completed, total, next_row} for one reviewer."""
+        return {
+            "completed": len(self.list_user_submission_rows(email)),
+            "total": self.count_patients(),
+            "next_row": self.next_unsubmitted_row(email),
+        }
+
+    @abstractmethod
+    def get_submission(self, email: str, row: int):
+        raise NotImplementedError
+
+    @abstractmethod
+    def upsert_submission(self, email: str, name: str, row: int, payload: dict):
+        raise NotImplementedError
+
+    def upsert_submissions_bulk(self, email: str, name: str, items: list) -> int:
+        """
+        Many upserts for one reviewer; items are {row, outcome, confidence,
+        snot22} and a later item for the same row wins. Returns rows written.
+        """
+        latest = {}
+        for it in items:
+            latest.pop(int(it["row"]), None)
+            latest[int(it["row"])] = it
+        for row, it in latest.items():
+            self.upsert_submission(email, name, row, it)
+        return len(latest)
+
+    @abstractmethod
+    def next_unsubmitted_row(self, email: str, after: int | None = None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def progress_metrics(self) -> dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    def data_version(self) -> str:
+        """Opaque token that changes whenever stored data changes (for ETags)."""
+        raise NotImplementedError
+
+    def workspace(self, email: str, after: int | None = None, timings: dict | None = None) -> dict:
+        """
+        Next row, patient record, my submission, progress and metrics in one
+        call. Backends with snapshots override this to read them once.
+        """
+        t0 = time.perf_counter()
+        nxt = self.next_unsubmitted_row(email, after=after)
+        out = {
+            "row": nxt,
+            "complete": nxt is None,
+            "record": self.get_patient(nxt) if nxt is not None else None,
+            "my_submission": self.get_submission(email, nxt) if nxt is not None else None,
+            "progress": self.user_progress(email),
+            "metrics": self.progress_metrics(),
+            "version": self.data_version(),
+        }
+        if timings is not None:
+            timings["compute"] = (time.perf_counter() - t0) * 1000
+        return out
+
+    def add_change_listener(self, fn):
+        """Call fn() after every write made through this process."""
+        self._listeners.append(fn)
+
+    def _notify_change(self):
+        for fn in list(self._listeners):
+            try:
+                fn()
+            except Exception as e:
+                print("change listener failed:", e)
+
+    def prefetch_after(self, email: str, row: int):
+        """Hint that `email` was just shown `row`; backends may warm what comes next."""
+        return None
+
+    def warmup(self) -> dict:
+        """
+        Load whatever a first request would otherwise wait for (clients,
+        connections, caches). Returns milliseconds per step.
+        """
+        return {}
+
+    @abstractmethod
+    def last_modified(self) -> float:
+        """Epoch seconds of the current data version (for Last-Modified)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_csv(self, source: str = "patients"):
+        """CSV text chunks for source 'patients', 'submissions' or 'joined'."""
+        raise NotImplementedError
+
+    def get_csv(self) -> str:
+        return "".join(self.iter_csv("patients"))
+
+
+class SheetsStorage(Storage):
+    """Google Sheets backend; thin delegation to the sheets module."""
+
+    def __init__(self):
+        super().__init__()
+        import sheets  # needs SHEET_ID, so only import when selected
+
+        self.sheets = sheets
+        if sheets.restore_snapshot():
+            # serve the copy saved by the last process right away; check the
+            # sheet and fetch fresh copies without holding up startup
+            threading.Thread(target=self._warm, name="sheets-warmup", daemon=True).start()
+        else:
+            self._check_schema()
+        sheets.start_background()
+
+    def _check_schema(self):
+        # Validate/migrate both header rows once; later calls use the cache.
+        try:
+            self.sheets.ensure_schema()
+        except Exception as e:
+            print("WARNING: could not validate sheet schema at startup:", e)
+
+    def _warm(self):
+        self._check_schema()
+        try:
+            self.sheets.warmup()
+        except Exception as e:
+            print("WARNING: background warmup failed:", e)
+
+    def count_patients(self):
+        return self.sheets.count_patients()
+
+    def list_patients(self, current_user_email=None):
+        return self.sheets.list_patients(current_user_email=current_user_email)
+
+    def page_patients(self, current_user_email=None, offset=0, limit=None, fields=None,
+                      status=None):
+        return self.sheets.page_patients(current_user_email, offset, limit, fields, status)
+
+    def get_patient(self, row_num):
+        return self.sheets.get_patient(row_num)
+
+    def patient_entry(self, row_num):
+        return self.sheets.patient_entry(row_num)
+
+    def update_prediction(self, row_num, payload):
+        return self.sheets.update_prediction(row_num, payload)
+
+    def list_user_submission_rows(self, email):
+        return self.sheets.list_user_submission_rows(email)
+
+    def user_progress(self, email):
+        return self.sheets.user_progress(email)
+
+    def add_change_listener(self, fn):
+        self.sheets.add_change_listener(fn)
+
+    def get_submission(self, email, row):
+        return self.sheets.get_submission(email, row)
+
+    def upsert_submission(self, email, name, row, payload):
+        return self.sheets.upsert_submission(email, name, row, payload)
+
+    def upsert_submissions_bulk(self, email, name, items):
+        return self.sheets.upsert_submissions_bulk(email, name, items)
+
+    def next_unsubmitted_row(self, email, after=None):
+        return self.sheets.next_unsubmitted_row(email, after=after)
+
+    def progress_metrics(self):
+        return self.sheets.progress_metrics()
+
+    def data_version(self):
+        return self.sheets.data_version()
+
+    def workspace(self, email, after=None, timings=None):
+        return self.sheets.workspace(email, after=after, timings=timings)
+
+    def prefetch_after(self, email, row):
+        return self.sheets.prefetch_after(email, row)
+
+    def warmup(self):
+        return self.sheets.warmup()
+
+    def last_modified(self):
+        return self.sheets.last_modified()
+
+    def iter_csv(self, source="patients"):
+        return self.sheets.iter_csv(source)
+
+
+_STORAGE = None
+_STORAGE_LOCK = threading.Lock()
+
+
+def get_storage() -> Storage:
+    """Process-wide backend selected by STORAGE_BACKEND."""
+    global _STORAGE
+    if _STORAGE:
+        return _STORAGE
+    with _STORAGE_LOCK:
+        if _STORAGE is None:
+            if STORAGE_BACKEND == "sqlite":
+                from sqlite_store import SQLiteStorage
+
+                _STORAGE = SQLiteStorage(SQLITE_PATH)
+            elif STORAGE_BACKEND == "sheets":
+                _STORAGE = SheetsStorage()
+            else:
+                raise ValueError(f"unknown STORAGE_BACKEND: {STORAGE_BACKEND!r}")
+    return _STORAGE
@@ -0,0 +1,162 @@
+import bisect
+
+
+def norm_email(email) -> str:
+    return (email or "").strip().lower()
+
+
+def parse_row(v):
+    try:
+        return int(str(v).strip())
+    except Exception:
+        return None
+
+
+class SubmissionIndex:
+    """
+    In-memory index over one snapshot of the Submissions tab.
+
+    - by_key:  (normalized email, patient_row) -> (record dict, sheet row)
+    - by_user: normalized email -> sorted list of submitted patient rows
+    - reviews: patient_row -> number of reviewers who submitted it
+    - names:   normalized email -> latest user_name seen
+    - remaining (lazy): normalized email -> sorted patient rows not yet
+      submitted, for a given last patient row
+
+    The first occurrence of a (email, row) pair wins, matching the old
+    linear scans. apply() folds a local write into the index so it stays
+    valid without re-reading the tab.
+    """
+
+    def __init__(self, values, version):
+        self.version = version
+        self.header = list(values[0]) if values else []
+        self.col = {name.strip(): i for i, name in enumerate(self.header)}
+        self.ok = "user_email" in self.col and "patient_row" in self.col
+        self.by_key = {}
+        self.by_user = {}
+        self.reviews = {}
+        self.names = {}
+        self._remaining = {}
+        self._metrics = None
+        self.next_sheet_row = max(len(values), 1) + 1
+        if not self.ok:
+            return
+
+        i_email = self.col["user_email"]
+        i_row = self.col["patient_row"]
+        user_rows = {}
+        for sheet_row, rec in enumerate(values[1:], start=2):
+            if i_email >= len(rec) or i_row >= len(rec):
+                continue
+            row = parse_row(rec[i_row])
+            if row is None:
+                # ignore bad/missing row ids
+                continue
+            key = (norm_email(rec[i_email]), row)
+            if key in self.by_key:
+                continue
+            record = self._record(rec)
+            self.by_key[key] = (record, sheet_row)
+            user_rows.setdefault(key[0], set()).add(row)
+            self.reviews[row] = self.reviews.get(row, 0) + 1
+            self.names[key[0]] = record.get("user_name", "")
+        self.by_user = {email: sorted(rows) for email, rows in user_rows.items()}
+
+    def _record(self, rec) -> dict:
+        return {
+            name: (rec[i] if i < len(rec) else "") for name, i in self.col.items()
+        }
+
+    def get(self, email, row):
+        """Return (record, sheet_row) for (email, row), or None."""
+        return self.by_key.get((norm_email(email), int(row)))
+
+    def rows_for(self, email) -> list:
+        """Sorted patient rows submitted by `email` (do not mutate)."""
+        return self.by_user.get(norm_email(email), [])
+
+    def remaining_for(self, email, last_row: int) -> list:
+        """Sorted patient rows 2..last_row that `email` has not submitted (do not mutate)."""
+        key = norm_email(email)
+        hit = self._remaining.get(key)
+        if hit and hit[0] == last_row:
+            return hit[1]
+        done = set(self.by_user.get(key, ()))
+        rem = [r for r in range(2, last_row + 1) if r not in done]
+        self._remaining[key] = (last_row, rem)
+        return rem
+
+    def next_remaining(self, email, last_row: int, after=None):
+        """First unsubmitted row after `after`, wrapping around; None when done."""
+        rem = self.remaining_for(email, last_row)
+        if not rem:
+            return None
+        i = bisect.bisect_right(rem, after) if after is not None else 0
+        return rem[i] if i < len(rem) else rem[0]
+
+    def row_values(self, record: dict) -> list:
+        """Header-ordered cell values for a record."""
+        return [record.get(name.strip(), "") for name in self.header]
+
+    def apply(self, record: dict, sheet_row: int, version: int):
+        """Record a write of `record` at `sheet_row` and move to `version`."""
+        email = norm_email(record.get("user_email"))
+        row = parse_row(record.get("patient_row"))
+        if row is not None:
+            if (email, row) not in self.by_key:
+                self.reviews[row] = self.reviews.get(row, 0) + 1
+            self.by_key[(email, row)] = (dict(record), sheet_row)
+            self.names[email] = record.get("user_name", "")
+            rows = self.by_user.get(email, [])
+            i = bisect.bisect_left(rows, row)
+            if i == len(rows) or rows[i] != row:
+                # copy-on-write so readers iterating the old list are unaffected
+                self.by_user[email] = rows[:i] + [row] + rows[i:]
+            hit = self._remaining.get(email)
+            if hit:
+                last_row, rem = hit
+                i = bisect.bisect_left(rem, row)
+                if i < len(rem) and rem[i] == row:
+                    self._remaining[email] = (last_row, rem[:i] + rem[i + 1:])
+        if sheet_row >= self.next_sheet_row:
+            self.next_sheet_row = sheet_row + 1
+        self.version = version
+        self._metrics = None
+
+    def metrics(self, last_row: int) -> dict:
+        """
+        Progress aggregate for patient rows 2..last_row, assembled from the
+        counters above and memoized until the next apply().
+        """
+        cached = self._metrics
+        if cached and cached[0] == last_row:
+            return cached[1]
+        total = max(0, last_row - 1)
+        reviewers = []
+        for email, rows in list(self.by_user.items()):
+            done = bisect.bisect_right(rows, last_row) - bisect.bisect_left(rows, 2)
+            if not done:
+                # only rows outside the patient range
+                continue
+            reviewers.append(
+                {
+                    "email": email,
+                    "name": self.names.get(email, ""),
+                    "completed": done,
+                    "remaining": total - done,
+                }
+            )
+        reviewers.sort(key=lambda r: (-r["completed"], r["email"]))
+        data = {
+            "users_started": len(reviewers),
+            "users_completed": sum(1 for r in reviewers if total and r["remaining"] == 0),
+            "total_patients": total,
+            "total_submissions": sum(r["completed"] for r in reviewers),
+            "reviews_per_patient": {
+                str(row): n for row, n in sorted(list(self.reviews.items())) if 2 <= row <= last_row
+            },
+            "reviewers": reviewers,
+        }
+        self._metrics = (last_row, data)
+        return data
@@ -0,0 +1,51 @@
+"""
+Shared fixtures. sheets.py reads its settings at import time, so the
+environment is pinned here before any test imports it, and every Sheets
+call goes to fake_sheets.
+
+    cd backend && pip install -r requirements-dev.txt && python -m pytest -q
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.update(
+    SHEET_ID="fake-sheet",
+    STORAGE_BACKEND="sheets",
+    SHEETS_CACHE_TTL="15",
+    SHEETS_WATCH_INTERVAL="0",
+    SHEETS_WRITE_BEHIND="false",
+    SHEETS_SNAPSHOT_PATH="",
+    SHARED_CACHE_URL="",
+    SHEETS_READS_PER_MINUTE="0",
+    SHEETS_WRITES_PER_MINUTE="0",
+    SHEETS_API_RETRIES="0",
+)
+
+
+@pytest.fixture
+def fake_gc():
+    """A freshly seeded fake spreadsheet (20 patients, no submissions) behind sheets.py."""
+    import fake_sheets
+    import sheets
+
+    gc = fake_sheets.FakeClient()
+    fake_sheets.seed(gc, patients=20, sheet_id=sheets.SHEET_ID, tab=sheets.SHEET_TAB,
+                     sub_tab=sheets.SUBMISSIONS_TAB)
+    sheets.set_client(gc)
+    sheets.ensure_schema()
+    yield gc
+    sheets.invalidate_cache()
+
+
+
+@pytest.fixture
+def client(fake_gc):
+    """Flask test client for app.py on top of fake_gc, with empty response caches."""
+    import app
+
+    app._ROW_BODIES.clear()
+    app._LIST_BODIES.clear()
+    return app.app.test_client()
@@ -0,0 +1,116 @@
+import gzip
+import json
+
+import sheets
+
+
+def _patient_tab(gc):
+    return gc._books[sheets.SHEET_ID]._tabs[sheets.SHEET_TAB]
+
+
+def test_patient_answers_304_for_its_etag(client):
+    first = client.get("/api/patient?row=3")
+    assert first.status_code == 200 and first.get_json()["row"] == 3
+    etag = first.headers["ETag"]
+    again = client.get("/api/patient?row=3", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.data == b""
+    assert again.headers["ETag"] == etag
+
+
+def test_patient_validator_follows_only_its_own_row(client, fake_gc):
+    etags = {row: client.get(f"/api/patient?row={row}").headers["ETag"] for row in (3, 4)}
+    _patient_tab(fake_gc)._set(4, 2, "99")  # edit row 4 only
+    sheets.invalidate_cache()
+    assert client.get("/api/patient?row=3", headers={"If-None-Match": etags[3]}).status_code == 304
+    resp = client.get("/api/patient?row=4", headers={"If-None-Match": etags[4]})
+    assert resp.status_code == 200
+    assert resp.get_json()["record"]["age"] == "99"
+
+
+def test_patients_are_gzipped_when_asked_and_compact(client):
+    plain = client.get("/api/patients")
+    assert plain.status_code == 200 and "Content-Encoding" not in plain.headers
+    assert b", " not in plain.data and b'": ' not in plain.data
+    gz = client.get("/api/patients", headers={"Accept-Encoding": "gzip"})
+    assert gz.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(gz.data) == plain.data
+    assert json.loads(plain.data)["total"] == 20
+    assert "Accept-Encoding" in gz.headers["Vary"]
+    assert gz.headers["ETag"] == plain.headers["ETag"]
+
+
+def test_patients_etag_changes_with_the_data(client):
+    etag = client.get("/api/patients").headers["ETag"]
+    assert client.get("/api/patients", headers={"If-None-Match": etag}).status_code == 304
+    sheets.upsert_submission("a@x.org", "A", 3, {"outcome": "1"})
+    assert client.get("/api/patients", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_patients_paging_always_ends(client):
+    assert client.get("/api/patients?limit=0").status_code == 400
+    assert client.get("/api/patients?limit=-5").status_code == 400
+    seen, cursor = [], 0
+    while cursor is not None:
+        page = client.get(f"/api/patients?offset={cursor}&limit=7&fields=row").get_json()
+        seen += [p["row"] for p in page["patients"]]
+        cursor = page["next_cursor"]
+    assert seen == list(range(2, 22))
+    assert sheets.page_patients(offset=3, limit=0)["next_cursor"] is None
+
+
+def _csv(resp):
+    import csv
+    import io
+
+    data = gzip.decompress(resp.data) if resp.headers.get("Content-Encoding") == "gzip" else resp.data
+    return list(csv.reader(io.StringIO(data.decode("utf-8"))))
+
+
+def test_csv_sources(client):
+    sheets.upsert_submission("a@x.org", "A", 3, {"outcome": "1"})
+    sheets.upsert_submission("b@x.org", "B", 3, {"outcome": "0"})
+    patients = _csv(client.get("/api/csv"))
+    assert patients[0][0] == "patient_id" and len(patients) == 21
+    subs = _csv(client.get("/api/csv?source=submissions"))
+    assert [r[1] for r in subs[1:]] == ["a@x.org", "b@x.org"]
+    joined = _csv(client.get("/api/csv?source=joined"))
+    assert joined[0][:2] == ["patient_row", "patient_id"]
+    assert len(joined) == 1 + 20 + 1  # row 3 appears once per reviewer
+    assert [r[0] for r in joined[1:4]] == ["2", "3", "3"]
+    assert client.get("/api/csv?source=nope").status_code == 400
+
+
+def test_csv_gzip_and_etag(client):
+    plain = client.get("/api/csv?source=joined")
+    gz = client.get("/api/csv?source=joined", headers={"Accept-Encoding": "gzip"})
+    assert gz.headers["Content-Encoding"] == "gzip"
+    assert _csv(gz) == _csv(plain)
+    etag = plain.headers["ETag"]
+    assert client.get("/api/csv?source=joined", headers={"If-None-Match": etag}).status_code == 304
+    sheets.upsert_submission("a@x.org", "A", 3, {"outcome": "1"})
+    assert client.get("/api/csv?source=joined", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_joined_csv_streams_from_the_columnar_snapshot(fake_gc, monkeypatch):
+    from columnar import ColumnarSheet
+
+    getitem = ColumnarSheet.__getitem__
+
+    def no_slices(self, i):
+        # a slice builds every row up front
+        assert not isinstance(i, slice), "joined export copied the patient tab"
+        return getitem(self, i)
+
+    monkeypatch.setattr(ColumnarSheet, "__getitem__", no_slices)
+    chunks = sheets.iter_csv("joined")
+    assert next(chunks).startswith("patient_row,patient_id")
+
+
+def test_workspace_progress_matches_user_progress(client):
+    sheets.upsert_submission("a@x.org", "A", 2, {"outcome": "1"})
+    client.post("/api/set_user", json={"name": "A", "email": "a@x.org"})
+    ws = client.get("/api/workspace?after=2").get_json()
+    progress = client.get("/api/user_progress").get_json()
+    assert ws["progress"] == {k: v for k, v in progress.items() if k != "ok"}
+    assert ws["progress"] == {"completed": 1, "total": 20, "next_row": 3}
+    assert ws["row"] == 3
@@ -0,0 +1,53 @@
+import snapfile
+from columnar import ColumnarSheet
+
+VALUES = [
+    ["patient_id", "age", "submission_status"],
+    ["P1", "40", "submitted"],
+    ["P2", "51"],
+    ["P3", "40", ""],
+]
+
+
+def test_reads_like_the_rows_it_replaces():
+    sheet = ColumnarSheet(VALUES)
+    assert len(sheet) == 4
+    assert sheet[2].tolist() == ["P2", "51", ""]
+    assert sheet[-1][0] == "P3"
+    assert sheet[1:3] == [("P1", "40", "submitted"), ("P2", "51", "")]
+    assert sheet.cell(1, 5) == ""
+    assert sheet.rows_where(1, lambda v: v == "40") == [1, 3]
+    codes, strings = sheet.column(None)
+    assert list(codes) == [0, 0, 0, 0] and strings == [""]
+
+
+def test_dumps_loads_round_trip():
+    values = VALUES + [[f"P{i}", str(i % 300), "x" * (i % 3)] for i in range(4, 700)]
+    sheet = ColumnarSheet(values)
+    back = ColumnarSheet.loads(sheet.dumps())
+    assert back.tolist() == sheet.tolist()
+    assert back.width == sheet.width
+    assert back.nbytes() == sheet.nbytes()
+
+
+def test_snapfile_round_trip(tmp_path):
+    path = str(tmp_path / "snap.bin")
+    snapfile.save(path, "sheet-1", {"Sheet1": (VALUES, 100.0), "Subs": (ColumnarSheet([["a"]]), 200.0)},
+                  {"Sheet1": VALUES[0]})
+    saved = snapfile.load(path, "sheet-1")
+    sheet, created = saved["tabs"]["Sheet1"]
+    assert created == 100.0
+    assert sheet.tolist() == [r + [""] * (3 - len(r)) for r in VALUES]
+    assert saved["tabs"]["Subs"][0].tolist() == [["a"]]
+    assert saved["headers"] == {"Sheet1": VALUES[0]}
+
+
+def test_snapfile_rejects_other_sheets_and_corruption(tmp_path):
+    path = tmp_path / "snap.bin"
+    assert snapfile.load(str(path), "sheet-1") is None  # missing
+    snapfile.save(str(path), "sheet-1", {"Sheet1": (VALUES, 1.0)}, {})
+    assert snapfile.load(str(path), "sheet-2") is None
+    data = bytearray(path.read_bytes())
+    data[-1] ^= 0xFF
+    path.write_bytes(bytes(data))
+    assert snapfile.load(str(path), "sheet-1") is None
@@ -0,0 +1,57 @@
+import threading
+
+from events import Broadcaster
+
+
+class StubStore:
+    def __init__(self):
+        self.version = 1
+
+    def data_version(self):
+        return str(self.version)
+
+    def progress_metrics(self):
+        return {"users_started": self.version}
+
+    def user_progress(self, email):
+        return {"submitted": self.version}
+
+
+def _next_event(stream):
+    """Next data event from an SSE generator, skipping keepalives."""
+    for chunk in stream:
+        if chunk.startswith("event:"):
+            return chunk
+
+
+def test_change_reaches_subscribers_when_a_new_connection_saw_it_first():
+    store = StubStore()
+    b = Broadcaster(store, poll=60, keepalive=0.05, max_seconds=5)
+    first = b.stream("a@x.org")
+    assert next(first) == "retry: 3000\n\n"
+    assert '"submitted":1' in _next_event(first)
+    assert '"users_started":1' in _next_event(first)
+
+    store.version = 2
+    # connects (and reads the new version) before the fan-out thread wakes
+    second = b.stream("b@x.org")
+    next(second)
+    assert '"submitted":2' in _next_event(second)
+    b.notify()
+
+    got = []
+    t = threading.Thread(target=lambda: got.extend([_next_event(first), _next_event(first)]))
+    t.start()
+    t.join(5)
+    assert any('"submitted":2' in g for g in got)
+    assert any('"users_started":2' in g for g in got)
+    first.close()
+    second.close()
+
+
+def test_acquire_caps_open_streams():
+    b = Broadcaster(StubStore(), max_streams=2)
+    assert b.acquire() and b.acquire()
+    assert not b.acquire()
+    b.release()
+    assert b.acquire()
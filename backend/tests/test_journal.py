@@ -0,0 +1,61 @@
+import time
+
+from journal import Journal, WriteBehind
+
+
+def _journal(tmp_path):
+    return Journal(str(tmp_path / "journal.db"))
+
+
+def test_lease_coalesces_by_key_and_hides_leased_entries(tmp_path):
+    j = _journal(tmp_path)
+    j.append("a|3", {"v": 1})
+    j.append_many([("b|4", {"v": 2}), ("a|3", {"v": 3})])
+    ids, records = j.lease(60)
+    assert len(ids) == 3
+    assert records == [{"v": 2}, {"v": 3}]
+    assert j.lease(60) == ([], [])  # all leased
+    j.ack(ids)
+    assert j.count() == 0
+
+
+def test_release_makes_entries_leasable_again(tmp_path):
+    j = _journal(tmp_path)
+    j.append("a|3", {"v": 1})
+    ids, _ = j.lease(60)
+    j.release(ids)
+    assert j.lease(60)[1] == [{"v": 1}]
+
+
+def test_expired_leases_are_replayed_by_a_new_process(tmp_path):
+    j = _journal(tmp_path)
+    j.append("a|3", {"v": 1})
+    j.lease(0.01)  # a process that leased and then died
+    time.sleep(0.02)
+    again = Journal(j.path)
+    assert again.pending() == [{"v": 1}]
+    assert again.lease(60)[1] == [{"v": 1}]
+
+
+def test_flush_once_acks_only_after_a_successful_flush(tmp_path):
+    j = _journal(tmp_path)
+    flushed = []
+    fail = [True]
+
+    def flush(records):
+        if fail[0]:
+            raise RuntimeError("sheets down")
+        flushed.extend(records)
+
+    invalidated = []
+    wb = WriteBehind(j, flush, on_flushed=lambda: invalidated.append(1))
+    wb.submit("a|3", {"v": 1})
+    try:
+        wb.flush_once()
+    except RuntimeError:
+        pass
+    assert j.count() == 1 and not invalidated
+    fail[0] = False
+    assert wb.flush_once() == 1
+    assert flushed == [{"v": 1}] and invalidated == [1]
+    assert j.count() == 0
@@ -0,0 +1,11 @@
+import sheets
+
+
+def test_status_filters_follow_submissions(fake_gc):
+    sheets.upsert_submission("a@x.org", "A", 3, {"outcome": "1"})
+    sheets.upsert_submission("b@x.org", "B", 7, {"outcome": "1"})
+    done = sheets.page_patients(status="submitted")
+    assert [p["row"] for p in done["patients"]] == [3, 7]
+    assert sheets.page_patients(status="pending")["total"] == 20 - 2
+    mine = sheets.page_patients("b@x.org", status="mine")
+    assert [p["row"] for p in mine["patients"]] == [7]
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+from gspread.exceptions import APIError
+
+import fake_sheets
+import sheets
+from ratelimit import RateLimited, SheetsLimiter, TokenBucket
+
+
+@pytest.fixture
+def gc():
+    gc = fake_sheets.FakeClient()
+    fake_sheets.seed(gc, patients=5)
+    return gc
+
+
+def _limited(gc, retries=3):
+    limiter = SheetsLimiter(TokenBucket(0), TokenBucket(0), retries=retries, base_delay=0.001)
+    return limiter, limiter.wrap(gc.open_by_key("fake-sheet").worksheet("Sheet1"))
+
+
+def test_429_is_retried_until_it_succeeds(gc):
+    limiter, ws = _limited(gc)
+    gc.fail_next(2)
+    assert len(ws.get_all_values()) == 6
+    assert gc.calls["get_all_values"] == 3
+    assert limiter.stats["retries"] == 2
+
+
+def test_append_is_retried_on_429_but_not_on_5xx(gc):
+    limiter, ws = _limited(gc)
+    gc.fail_next(1)
+    ws.append_row(["P6"])
+    assert gc.calls["append_row"] == 2
+
+    gc.fail_next(1, status=503)
+    with pytest.raises(APIError):
+        ws.append_row(["P7"])
+    assert gc.calls["append_row"] == 3  # may have run: never sent twice
+    gc.fail_next(1, status=503)
+    ws.update("A2", [["x"]])  # other writes are idempotent
+    assert gc.calls["update"] == 2
+
+
+def test_rate_limited_once_retries_run_out(gc):
+    limiter, ws = _limited(gc, retries=2)
+    gc.fail_next(3)
+    with pytest.raises(RateLimited):
+        ws.get_all_values()
+    assert gc.calls["get_all_values"] == 3
+    assert limiter.stats["gave_up"] == 1
+
+
+def test_rate_limited_becomes_503_with_retry_after(client, fake_gc):
+    sheets.invalidate_cache()
+    fake_gc.fail_next(1 + sheets.API_RETRIES)
+    resp = client.get("/api/patients")
+    assert resp.status_code == 503
+    assert int(resp.headers["Retry-After"]) >= 1
+    assert resp.get_json()["ok"] is False
+
+
+def test_concurrent_identical_reads_share_one_call(gc, monkeypatch):
+    limiter, ws = _limited(gc)
+    raw = ws._ws
+    orig = raw.get_all_values
+    release = threading.Event()
+
+    def held(**kw):
+        assert release.wait(5)
+        return orig(**kw)
+
+    monkeypatch.setattr(raw, "get_all_values", held)
+    got = []
+    threads = [threading.Thread(target=lambda: got.append(ws.get_all_values())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    deadline = time.monotonic() + 5
+    while limiter.stats["coalesced"] < 7 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert gc.calls["get_all_values"] == 1
+    assert len(got) == 8 and all(v == got[0] for v in got)
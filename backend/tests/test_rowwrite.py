@@ -0,0 +1,32 @@
+from sheets import RowWrite
+
+H = {"a": 1, "b": 2, "c": 3, "e": 5, "f": 6, "z": 26}
+
+
+class RecordingWorksheet:
+    def __init__(self):
+        self.calls = []
+
+    def batch_update(self, data, **kw):
+        self.calls.append(data)
+
+
+def test_adjacent_columns_merge_into_one_range():
+    w = RowWrite(None, 7, H).set("b", "2").set("a", "1").set("c", "3")
+    assert w.ranges() == [{"range": "A7:C7", "values": [["1", "2", "3"]]}]
+
+
+def test_gaps_split_ranges_in_column_order():
+    w = RowWrite(None, 4, H).set("z", "last").set("e", 5).set("a", 1).set("f", 6)
+    assert w.ranges() == [
+        {"range": "A4", "values": [[1]]},
+        {"range": "E4:F4", "values": [[5, 6]]},
+        {"range": "Z4", "values": [["last"]]},
+    ]
+
+
+def test_commit_sends_one_request_and_nothing_when_empty():
+    ws = RecordingWorksheet()
+    assert RowWrite(ws, 2, H).commit() is None
+    RowWrite(ws, 2, H).set("a", 1).set("c", 3).commit()
+    assert len(ws.calls) == 1 and len(ws.calls[0]) == 2
@@ -0,0 +1,123 @@
+import time
+from datetime import timedelta
+
+import pytest
+from flask import Flask, session
+
+import sessions
+
+
+def _app(interface):
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY="test", PERMANENT_SESSION_LIFETIME=timedelta(days=14))
+    app.session_interface = interface
+
+    @app.post("/login")
+    def login():
+        session["user"] = {"name": "A", "email": "a@x.org"}
+        session.permanent = True
+        return "ok"
+
+    @app.get("/me")
+    def me():
+        return {"user": session.get("user")}
+
+    @app.post("/logout")
+    def logout():
+        session.clear()
+        return "ok"
+
+    return app
+
+
+def _sets_cookie(resp) -> bool:
+    return any(h.startswith("session=") for h in resp.headers.getlist("Set-Cookie"))
+
+
+# ---- cookie ----
+def test_cookie_is_reissued_only_past_half_its_lifetime():
+    app = _app(sessions.CookieSessionInterface())
+    client = app.test_client()
+    assert _sets_cookie(client.post("/login"))
+    resp = client.get("/me")
+    assert resp.json["user"]["email"] == "a@x.org"
+    assert not _sets_cookie(resp)
+
+    iface = app.session_interface
+    s = iface.session_class({"user": {}, "_permanent": True})
+    s.issued = time.time() - timedelta(days=6).total_seconds()
+    assert not iface.should_set_cookie(app, s)
+    s.issued = time.time() - timedelta(days=8).total_seconds()
+    assert iface.should_set_cookie(app, s)
+    s["user"] = {"name": "B"}
+    assert iface.should_set_cookie(app, s)  # modified
+    s = iface.session_class({"user": {}})
+    s.issued = 0.0
+    assert not iface.should_set_cookie(app, s)  # not permanent: browser-session cookie
+
+
+@pytest.mark.parametrize("make", [
+    lambda tmp_path: sessions.CookieSessionInterface(),
+    lambda tmp_path: sessions.SQLiteSessionInterface(str(tmp_path / "s.db")),
+], ids=["cookie", "sqlite"])
+def test_bad_signature_gives_an_empty_session(tmp_path, make):
+    app = _app(make(tmp_path))
+    client = app.test_client()
+    client.post("/login")
+    value = client.get_cookie("session").value
+    client.set_cookie("session", value[:-2] + ("AA" if not value.endswith("AA") else "BB"))
+    assert client.get("/me").json["user"] is None
+
+
+# ---- sqlite ----
+@pytest.fixture
+def sqlite_iface(tmp_path):
+    return sessions.SQLiteSessionInterface(str(tmp_path / "s.db"), sweep_interval=60)
+
+
+def _rows(iface):
+    return iface._db().execute("SELECT sid, expires FROM sessions").fetchall()
+
+
+def test_sqlite_session_round_trip_and_expiry(sqlite_iface):
+    client = _app(sqlite_iface).test_client()
+    client.post("/login")
+    assert client.get("/me").json["user"]["name"] == "A"
+    assert len(_rows(sqlite_iface)) == 1
+    # still valid: the row is not rewritten on every request
+    before = _rows(sqlite_iface)
+    assert not _sets_cookie(client.get("/me"))
+    assert _rows(sqlite_iface) == before
+
+    db = sqlite_iface._db()
+    with db:
+        db.execute("UPDATE sessions SET expires = ?", (time.time() - 1,))
+    assert client.get("/me").json["user"] is None
+
+
+def test_sqlite_sweep_runs_at_most_once_per_interval(sqlite_iface):
+    db = sqlite_iface._db()
+
+    def expired_row(sid):
+        with db:
+            db.execute("INSERT INTO sessions (sid, data, expires) VALUES (?, '{}', ?)", (sid, 1.0))
+
+    now = time.time()
+    expired_row("old1")
+    sqlite_iface._maybe_sweep(now)
+    assert _rows(sqlite_iface) == []
+    expired_row("old2")
+    sqlite_iface._maybe_sweep(now + 30)
+    assert [r[0] for r in _rows(sqlite_iface)] == ["old2"]
+    sqlite_iface._maybe_sweep(now + 61)
+    assert _rows(sqlite_iface) == []
+
+
+def test_sqlite_emptied_session_is_deleted(sqlite_iface):
+    client = _app(sqlite_iface).test_client()
+    client.post("/login")
+    assert len(_rows(sqlite_iface)) == 1
+    resp = client.post("/logout")
+    assert _rows(sqlite_iface) == []
+    assert any("session=;" in h for h in resp.headers.getlist("Set-Cookie"))
+    assert client.get("/me").json["user"] is None
@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from sharedcache import RedisSnapshotStore  # noqa: E402
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+def _store(server):
+    return RedisSnapshotStore(fakeredis.FakeRedis(server=server), poll=0.01)
+
+
+def test_one_download_per_generation_across_workers(server):
+    calls = []
+    gate = threading.Event()
+
+    def loader():
+        calls.append(1)
+        gate.wait(5)
+        return [["h"], ["a"]]
+
+    stores = [_store(server) for _ in range(4)]
+    got = []
+    threads = [threading.Thread(target=lambda s=s: got.append(s.fetch("subs", loader, 60)))
+               for s in stores]
+    for t in threads:
+        t.start()
+    gate.set()
+    for t in threads:
+        t.join(5)
+    assert len(calls) == 1
+    assert {e.seq for e in got} == {got[0].seq}
+    assert got[0].values == [["h"], ["a"]]
+
+
+def test_invalidate_forces_a_reload_everywhere(server):
+    a, b = _store(server), _store(server)
+    n = []
+    a.fetch("subs", lambda: n.append(1) or [["v1"]], 60)
+    b.invalidate("subs")
+    assert b.fetch("subs", lambda: n.append(1) or [["v2"]], 60).values == [["v2"]]
+    assert a.fetch("subs", lambda: n.append(1) or [["v3"]], 60).values == [["v2"]]
+    assert len(n) == 2
+
+
+def test_invalidate_with_a_token_bumps_once(server):
+    a, b = _store(server), _store(server)
+    gen = a.generation("subs")
+    a.invalidate("subs", token="rev-7")
+    b.invalidate("subs", token="rev-7")
+    assert a.generation("subs") == gen + 1
+
+
+def test_publish_only_on_top_of_the_current_generation(server):
+    a, b = _store(server), _store(server)
+    e = a.fetch("subs", lambda: [["h"]], 60)
+    pub = a.publish("subs", [["h"], ["mine"]], e.gen, e.fetched)
+    assert pub is not None and pub.gen == e.gen + 1
+    assert b.fetch("subs", lambda: [["unused"]], 60).values == [["h"], ["mine"]]
+    # a second patch based on the old generation must not overwrite it
+    assert b.publish("subs", [["h"], ["stale"]], e.gen, e.fetched) is None
+    assert b.fetch("subs", lambda: [["h"], ["reloaded"]], 60).values == [["h"], ["reloaded"]]
@@ -0,0 +1,130 @@
+import threading
+import time
+
+from snapshot import SnapshotCache
+
+
+class GatedLoader:
+    """Loader whose calls can be held open until release() is called."""
+
+    def __init__(self, values, hold: bool = False):
+        self.values = values
+        self.calls = 0
+        self.started = threading.Event()
+        self.gate = threading.Event()
+        if not hold:
+            self.gate.set()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        assert self.gate.wait(5)
+        return [list(r) for r in self.values]
+
+    def hold(self):
+        self.started.clear()
+        self.gate.clear()
+
+    def release(self):
+        self.gate.set()
+
+
+def test_concurrent_gets_share_one_load():
+    loader = GatedLoader([["h"], ["a"]], hold=True)
+    cache = SnapshotCache(loader, ttl=60)
+    got = []
+    threads = [threading.Thread(target=lambda: got.append(cache.get())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    assert loader.started.wait(5)
+    time.sleep(0.05)  # let the others queue up behind the load
+    loader.release()
+    for t in threads:
+        t.join(5)
+    assert loader.calls == 1
+    assert len({id(s) for s in got}) == 1
+
+
+def test_ttl_zero_never_caches():
+    loader = GatedLoader([["h"]])
+    cache = SnapshotCache(loader, ttl=0)
+    cache.get()
+    cache.get()
+    assert loader.calls == 2
+
+
+def test_replace_installs_new_version():
+    cache = SnapshotCache(GatedLoader([["h"], ["a"]]), ttl=60)
+    snap = cache.get()
+    new = cache.replace(snap.values + [["b"]], snap.version)
+    assert new is not None and new.version > snap.version
+    assert cache.get() is new
+
+
+def test_replace_against_stale_version_drops_the_entry():
+    loader = GatedLoader([["h"], ["a"]])
+    cache = SnapshotCache(loader, ttl=60)
+    old = cache.get()
+    cache.replace(old.values + [["b"]], old.version)
+    assert cache.replace(old.values + [["c"]], old.version) is None
+    assert cache.peek() is None
+    assert cache.get().values == [["h"], ["a"]]
+    assert loader.calls == 2
+
+
+def test_load_in_flight_during_invalidate_is_not_reused():
+    loader = GatedLoader([["h"], ["old"]])
+    cache = SnapshotCache(loader, ttl=60)
+    cache.get()
+    cache.invalidate()
+    loader.hold()
+    t = threading.Thread(target=cache.get)
+    t.start()
+    assert loader.started.wait(5)
+    cache.invalidate()  # a write landed while the load was in flight
+    loader.values = [["h"], ["new"]]
+    loader.release()
+    t.join(5)
+    assert cache.peek() is None
+    assert cache.get().values == [["h"], ["new"]]
+
+
+def test_restored_copy_is_served_then_revalidated():
+    loader = GatedLoader([["h"], ["fresh"]], hold=True)
+    cache = SnapshotCache(loader, ttl=60)
+    assert cache.restore([["h"], ["disk"]], created=1.0)
+    assert cache.get().values == [["h"], ["disk"]]
+    assert loader.started.wait(5)  # background revalidation started
+    loader.release()
+    assert cache.get(stale_ok=False).values == [["h"], ["fresh"]]
+    assert not cache.restore([["h"]], created=2.0)  # only fills an empty cache
+
+
+def test_patch_is_replayed_onto_a_load_in_flight():
+    loader = GatedLoader([["h"], ["a"]])
+    cache = SnapshotCache(loader, ttl=60)
+    snap = cache.get()
+    # force a refresh-ahead load and hold it open
+    cache._snap.fetched_at -= 59
+    loader.hold()
+    t = threading.Thread(target=cache.refresh_ahead)
+    t.start()
+    assert loader.started.wait(5)
+
+    def patch(values):
+        return list(values) + [["b"]]
+
+    assert cache.replace(patch(snap.values), snap.version, patch) is not None
+    # the load began before the write reached the sheet, so it lacks row "b"
+    loader.release()
+    t.join(5)
+    assert cache.get().values == [["h"], ["a"], ["b"]]
+
+
+def test_patches_are_not_replayed_onto_later_loads():
+    loader = GatedLoader([["h"], ["a"]])
+    cache = SnapshotCache(loader, ttl=60)
+    snap = cache.get()
+    cache.replace(snap.values + [["b"]], snap.version, lambda v: list(v) + [["b"]])
+    cache.invalidate()
+    assert cache.get().values == [["h"], ["a"]]
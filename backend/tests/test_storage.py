@@ -0,0 +1,90 @@
+"""
+The SQLite backend against the Sheets backend (on fake_sheets): the same
+operations on the same data must give the same answers.
+"""
+import pytest
+
+import sheets
+from sqlite_store import SQLiteStorage
+from storage import SheetsStorage, Storage
+
+ME = "me@x.org"
+SUBMISSIONS = [
+    ("Me@X.org ", "Me", 3), (ME, "Me", 4), (ME, "Me", 20),
+    ("b@x.org", "B", 4), ("b@x.org", "B", 9),
+    ("c@x.org", "C", 99),  # not a patient row
+]
+
+
+@pytest.fixture
+def backends(fake_gc, tmp_path):
+    ws = fake_gc._books[sheets.SHEET_ID]._tabs[sheets.SHEET_TAB]
+    # a row marked submitted the old way, with no Submissions entry
+    ws._set(6, ws._rows[0].index("submission_status") + 1, "Submitted")
+    sheets.invalidate_cache()
+    sqlite = SQLiteStorage(str(tmp_path / "store.db"))
+    sqlite.import_patients(ws.get_all_values())
+    both = (SheetsStorage(), sqlite)
+    for store in both:
+        for email, name, row in SUBMISSIONS:
+            store.upsert_submission(email, name, row, {"outcome": "1", "confidence": "low"})
+    return both
+
+
+def test_an_incomplete_backend_cannot_be_built():
+    class Partial(Storage):
+        def count_patients(self):
+            return 0
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+@pytest.mark.parametrize("status", [None, "submitted", "pending", "mine"])
+def test_status_filters_and_paging_agree(backends, status):
+    sheets_store, sqlite = backends
+    for offset, limit in ((0, None), (0, 3), (3, 3), (25, 5)):
+        args = dict(current_user_email=ME, offset=offset, limit=limit, status=status)
+        assert sheets_store.page_patients(**args) == sqlite.page_patients(**args)
+    assert [p["row"] for p in sqlite.page_patients(status="submitted")["patients"]] == [3, 4, 6, 9, 20]
+
+
+def test_next_unsubmitted_row_wraps_around_the_same_way(backends):
+    sheets_store, sqlite = backends
+    for email in (ME, "b@x.org", "new@x.org"):
+        for after in (None, 1, 2, 3, 19, 20, 21, 40):
+            assert (sheets_store.next_unsubmitted_row(email, after=after)
+                    == sqlite.next_unsubmitted_row(email, after=after)), (email, after)
+    assert sqlite.next_unsubmitted_row(ME, after=19) == 21
+    assert sqlite.next_unsubmitted_row(ME, after=21) == 2
+
+
+def test_upserts_and_bulk_upserts_agree(backends):
+    for store in backends:
+        store.upsert_submission("ME@x.org", "Me", 4, {"outcome": "0", "snot22": "12"})
+        assert store.upsert_submissions_bulk(ME, "Me", [
+            {"row": 5, "outcome": "1"}, {"row": 3, "outcome": "0"}, {"row": 5, "outcome": "0"},
+        ]) == 2
+    sheets_store, sqlite = backends
+    for row in (3, 4, 5, 6):
+        assert sheets_store.get_submission(ME, row) == sqlite.get_submission(ME, row)
+    assert sqlite.get_submission(ME, 5)["outcome"] == "0"  # the later item won
+    assert sqlite.get_submission(ME, 4) == {"outcome": "0", "confidence": "", "snot22": "12"}
+    assert sheets_store.list_user_submission_rows(ME) == sqlite.list_user_submission_rows(ME)
+    assert sqlite.list_user_submission_rows(ME) == {3, 4, 5, 20}
+
+
+def test_progress_metrics_agree(backends):
+    sheets_store, sqlite = backends
+    assert sheets_store.progress_metrics() == sqlite.progress_metrics()
+    sqlite.upsert_submissions_bulk("b@x.org", "B", [{"row": r} for r in range(2, 22)])
+    sheets_store.upsert_submissions_bulk("b@x.org", "B", [{"row": r} for r in range(2, 22)])
+    m = sqlite.progress_metrics()
+    assert m == sheets_store.progress_metrics()
+    assert (m["users_started"], m["users_completed"]) == (2, 1)
+
+
+def test_an_empty_page_has_no_next_cursor(backends):
+    for store in backends:
+        assert store.page_patients(offset=2, limit=0)["next_cursor"] is None
+        assert store.page_patients(offset=2, limit=5)["next_cursor"] == 7
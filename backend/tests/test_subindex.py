@@ -0,0 +1,69 @@
+from subindex import SubmissionIndex
+
+HEADER = ["timestamp", "user_email", "user_name", "patient_row", "outcome", "confidence", "snot22"]
+
+
+def _row(email, row, outcome="1"):
+    return ["2024-01-01T00:00:00+00:00", email, email.split("@")[0], str(row), outcome, "low", "10"]
+
+
+def test_index_keys_rows_and_first_occurrence_wins():
+    values = [HEADER, _row("A@x.org", 3), _row("a@x.org ", 3, "0"), _row("b@x.org", 5), ["bad"]]
+    idx = SubmissionIndex(values, 1)
+    assert idx.ok
+    rec, sheet_row = idx.get("a@x.org", 3)
+    assert (rec["outcome"], sheet_row) == ("1", 2)
+    assert idx.rows_for("A@X.ORG") == [3]
+    assert idx.reviews == {3: 1, 5: 1}
+    assert idx.next_sheet_row == 6
+
+
+def test_apply_updates_in_place_and_appends():
+    idx = SubmissionIndex([HEADER, _row("a@x.org", 3)], 1)
+    idx.apply(dict(idx.get("a@x.org", 3)[0], outcome="0"), 2, 2)
+    assert idx.get("a@x.org", 3)[0]["outcome"] == "0"
+    assert idx.reviews[3] == 1
+
+    idx.apply({"user_email": "a@x.org", "patient_row": "7", "user_name": "a"}, 3, 3)
+    assert idx.rows_for("a@x.org") == [3, 7]
+    assert idx.get("a@x.org", 7)[1] == 3
+    assert idx.next_sheet_row == 4
+    assert idx.version == 3
+
+
+def test_next_remaining_wraps_around():
+    idx = SubmissionIndex([HEADER, _row("a@x.org", 3), _row("a@x.org", 5)], 1)
+    # patient rows 2..6; a has done 3 and 5
+    assert idx.remaining_for("a@x.org", 6) == [2, 4, 6]
+    assert idx.next_remaining("a@x.org", 6) == 2
+    assert idx.next_remaining("a@x.org", 6, after=4) == 6
+    assert idx.next_remaining("a@x.org", 6, after=6) == 2  # wraps
+    assert idx.next_remaining("nobody@x.org", 6, after=9) == 2
+
+
+def test_apply_drops_row_from_memoized_remaining():
+    idx = SubmissionIndex([HEADER, _row("a@x.org", 3)], 1)
+    before = idx.remaining_for("a@x.org", 5)
+    assert before == [2, 4, 5]
+    idx.apply({"user_email": "a@x.org", "patient_row": "4"}, 3, 2)
+    assert idx.remaining_for("a@x.org", 5) == [2, 5]
+    assert before == [2, 4, 5]  # readers holding the old list are unaffected
+    idx.apply({"user_email": "a@x.org", "patient_row": "2"}, 4, 3)
+    idx.apply({"user_email": "a@x.org", "patient_row": "5"}, 5, 4)
+    assert idx.next_remaining("a@x.org", 5) is None
+
+
+def test_metrics_follow_apply():
+    idx = SubmissionIndex([HEADER, _row("a@x.org", 2)], 1)
+    assert idx.metrics(3)["total_submissions"] == 1
+    idx.apply({"user_email": "b@x.org", "patient_row": "2", "user_name": "b"}, 3, 2)
+    m = idx.metrics(3)
+    assert m["users_started"] == 2
+    assert m["reviews_per_patient"] == {"2": 2}
+
+
+def test_metrics_leave_out_reviewers_with_no_rows_in_range():
+    idx = SubmissionIndex([HEADER, _row("a@x.org", 2), _row("b@x.org", 9)], 1)
+    m = idx.metrics(3)
+    assert [r["email"] for r in m["reviewers"]] == ["a@x.org"]
+    assert (m["users_started"], m["total_submissions"]) == (1, 1)
@@ -0,0 +1,200 @@
+"""
+Submission upserts against fake_sheets. Hooks inside the fake worksheet's
+append_rows hold writers at the exact point where a race would happen, so
+these tests are deterministic rather than load-dependent (bench.py
+--stress is the load version).
+"""
+import threading
+
+import pytest
+
+import sheets
+from subindex import norm_email
+
+
+def _subs_tab(gc):
+    return gc._books[sheets.SHEET_ID]._tabs[sheets.SUBMISSIONS_TAB]
+
+
+def _sheet_keys(gc) -> dict:
+    """{(email, patient row): [sheet rows]} as actually stored."""
+    rows = _subs_tab(gc)._rows
+    col = {name: i for i, name in enumerate(rows[0])}
+    keys = {}
+    for sheet_row, r in enumerate(rows[1:], start=2):
+        key = (norm_email(r[col["user_email"]]), int(r[col["patient_row"]]))
+        keys.setdefault(key, []).append(sheet_row)
+    return keys
+
+
+def _assert_index_matches_sheet(gc, complete: bool = True):
+    """
+    No duplicate rows, and every indexed key points at its real row. Rows
+    another worker appended may be missing from the index until the next
+    reload (complete=False).
+    """
+    keys = _sheet_keys(gc)
+    assert all(len(v) == 1 for v in keys.values()), keys
+    indexed = {k: hit[1] for k, hit in sheets._submission_index(stale_ok=False).by_key.items()}
+    actual = {k: v[0] for k, v in keys.items()}
+    if complete:
+        assert indexed == actual
+    else:
+        assert indexed == {k: actual.get(k) for k in indexed}
+
+
+def _hold_appends(monkeypatch, gc, until):
+    """
+    Make append_rows return only once until(number of appends so far) is
+    true (or after 2 s), so no writer folds its row in before the others
+    have appended theirs.
+    """
+    ws = _subs_tab(gc)
+    orig = ws.append_rows
+    entered = []
+    cond = threading.Condition()
+
+    def append_rows(values, **kw):
+        resp = orig(values, **kw)
+        with cond:
+            entered.append(values)
+            cond.notify_all()
+            cond.wait_for(lambda: until(len(entered)), timeout=2)
+        return resp
+
+    monkeypatch.setattr(ws, "append_rows", append_rows, raising=False)
+    return entered
+
+
+def _run(*fns):
+    errors = []
+
+    def wrap(fn):
+        try:
+            fn()
+        except BaseException as e:  # surface thread failures in the test
+            errors.append(e)
+
+    threads = [threading.Thread(target=wrap, args=(fn,)) for fn in fns]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    assert not errors, errors
+
+
+def test_double_submit_of_one_row_writes_one_row(fake_gc, monkeypatch):
+    # Without the per-key lock the second save would miss the index while
+    # the hook holds the first one's append, and append a second row.
+    entered = _hold_appends(monkeypatch, fake_gc, until=lambda n: n >= 2)
+    _run(
+        lambda: sheets.upsert_submission("a@x.org", "A", 5, {"outcome": "0"}),
+        lambda: sheets.upsert_submission("A@x.org", "A", 5, {"outcome": "1"}),
+    )
+    assert len(entered) == 1  # the second save updated the row in place
+    assert len(_sheet_keys(fake_gc)[("a@x.org", 5)]) == 1
+    _assert_index_matches_sheet(fake_gc)
+
+
+def _emails_on_different_stripes(n):
+    out, stripes = [], set()
+    for i in range(1000):
+        email = f"r{i}@x.org"
+        s = hash((email, 5)) % len(sheets._UPSERT_LOCKS)
+        if s not in stripes:
+            stripes.add(s)
+            out.append(email)
+        if len(out) == n:
+            return out
+    pytest.skip("not enough distinct lock stripes")
+
+
+def test_concurrent_appends_by_different_reviewers_get_their_own_rows(fake_gc, monkeypatch):
+    a, b = _emails_on_different_stripes(2)
+    # both appends are in flight together, so a guessed next_sheet_row
+    # would give both the same row
+    entered = _hold_appends(monkeypatch, fake_gc, until=lambda n: n >= 2)
+    _run(
+        lambda: sheets.upsert_submission(a, "A", 5, {"outcome": "0"}),
+        lambda: sheets.upsert_submission(b, "B", 5, {"outcome": "1"}),
+    )
+    assert len(entered) == 2
+    _assert_index_matches_sheet(fake_gc)
+
+    # an in-place edit by one reviewer leaves the other's row alone
+    sheets.upsert_submission(b, "B", 5, {"outcome": "0", "snot22": "42"})
+    assert sheets.get_submission(a, 5)["outcome"] == "0"
+    assert sheets.get_submission(b, 5)["snot22"] == "42"
+    sheets.invalidate_cache()
+    assert sheets.get_submission(a, 5)["snot22"] == ""
+    _assert_index_matches_sheet(fake_gc)
+
+
+def test_unknown_append_row_is_reread_not_guessed(fake_gc, monkeypatch):
+    monkeypatch.setattr(sheets, "_appended_row", lambda resp: None)
+    sheets.upsert_submission("a@x.org", "A", 3, {"outcome": "1"})
+    # another worker appends behind our back
+    _subs_tab(fake_gc).append_rows([["t", "z@x.org", "Z", "9", "0", "", ""]])
+    sheets.upsert_submission("b@x.org", "B", 4, {"outcome": "1"})
+    sheets.upsert_submissions_bulk("a@x.org", "A", [{"row": 6, "outcome": "0"},
+                                                    {"row": 3, "outcome": "0"}])
+    _assert_index_matches_sheet(fake_gc)
+    assert sheets.get_submission("a@x.org", 3)["outcome"] == "0"
+
+
+def test_bulk_upsert_places_appended_rows_from_the_response(fake_gc):
+    sheets.upsert_submission("a@x.org", "A", 3, {"outcome": "1"})
+    _subs_tab(fake_gc).append_rows([["t", "z@x.org", "Z", "9", "0", "", ""]])
+    # the cached index still thinks the next free row is 3
+    assert sheets.upsert_submissions_bulk(
+        "a@x.org", "A", [{"row": r, "outcome": "0"} for r in (3, 4, 5)]) == 3
+    _assert_index_matches_sheet(fake_gc, complete=False)
+
+
+def test_failed_bulk_append_drops_the_cache(fake_gc, monkeypatch):
+    sheets.upsert_submission("a@x.org", "A", 3, {"outcome": "1"})
+
+    def boom(values, **kw):
+        raise RuntimeError("503 from Sheets")
+
+    monkeypatch.setattr(_subs_tab(fake_gc), "append_rows", boom, raising=False)
+    with pytest.raises(RuntimeError):
+        sheets.upsert_submissions_bulk("a@x.org", "A", [{"row": 3, "outcome": "0"},
+                                                        {"row": 8, "outcome": "0"}])
+    # row 3 was updated on the sheet before the append failed
+    assert sheets.get_submission("a@x.org", 3)["outcome"] == "0"
+
+
+def _delete_first_submission_of(gc, email):
+    """Delete a reviewer's row by hand, shifting the rows below it up."""
+    ws = _subs_tab(gc)
+    ws.delete_rows(min(_sheet_keys(gc)[k][0] for k in _sheet_keys(gc) if k[0] == email))
+
+
+def test_edit_after_a_row_was_deleted_by_hand_does_not_overwrite_another_row(fake_gc):
+    for email, row in (("a@x.org", 3), ("b@x.org", 4), ("c@x.org", 5)):
+        sheets.upsert_submission(email, email[0].upper(), row, {"outcome": "1"})
+    # within the cache TTL the index still has b at row 3, which now holds c
+    _delete_first_submission_of(fake_gc, "a@x.org")
+    sheets.upsert_submission("b@x.org", "B", 4, {"outcome": "0"})
+    assert set(_sheet_keys(fake_gc)) == {("b@x.org", 4), ("c@x.org", 5)}
+    _assert_index_matches_sheet(fake_gc)
+    sheets.invalidate_cache()
+    assert sheets.get_submission("b@x.org", 4)["outcome"] == "0"
+    assert sheets.get_submission("c@x.org", 5)["outcome"] == "1"
+
+
+def test_bulk_edit_after_a_row_was_deleted_by_hand_does_not_overwrite_another_row(fake_gc):
+    for email, row in (("a@x.org", 3), ("b@x.org", 4), ("c@x.org", 5), ("b@x.org", 6)):
+        sheets.upsert_submission(email, email[0].upper(), row, {"outcome": "1"})
+    _delete_first_submission_of(fake_gc, "a@x.org")
+    calls = fake_gc.calls["batch_get"]
+    assert sheets.upsert_submissions_bulk("b@x.org", "B", [{"row": 4, "outcome": "0"},
+                                                           {"row": 6, "outcome": "0"},
+                                                           {"row": 7, "outcome": "0"}]) == 3
+    assert fake_gc.calls["batch_get"] == calls + 1  # one check for both rows
+    assert set(_sheet_keys(fake_gc)) == {("b@x.org", 4), ("c@x.org", 5), ("b@x.org", 6),
+                                         ("b@x.org", 7)}
+    _assert_index_matches_sheet(fake_gc)
+    sheets.invalidate_cache()
+    assert sheets.get_submission("c@x.org", 5)["outcome"] == "1"
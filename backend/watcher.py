@@ -0,0 +1,44 @@
+import threading
+import time
+import traceback
+
+
+class ChangeWatcher:
+    """
+    Polls a cheap "has it changed?" token (e.g. Drive file version) every
+    `interval` seconds and calls on_change() when it differs from the last
+    one seen. The first token only sets the baseline.
+    """
+
+    def __init__(self, fetch_token, on_change, interval: float):
+        self._fetch = fetch_token
+        self._on_change = on_change
+        self.interval = interval
+        self.token = None
+        self.checked_at = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None and self.interval > 0:
+                self._thread = threading.Thread(target=self._run, name="sheet-watcher", daemon=True)
+                self._thread.start()
+
+    def check(self) -> bool:
+        """Poll once; returns True if a change was detected."""
+        token = self._fetch()
+        self.checked_at = time.time()
+        prev, self.token = self.token, token
+        if prev is not None and token != prev:
+            self._on_change()
+            return True
+        return False
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception:
+                traceback.print_exc()
+            time.sleep(self.interval)